@@ -0,0 +1,517 @@
+"""
+Нагрузочный прогон проектов ya_news и ya_note.
+
+Запросы подаются прямо в WSGI-приложение проекта (yanews.wsgi или
+yanote.wsgi) без сети: в текущем процессе или в нескольких рабочих
+процессах. База — отдельный файл SQLite, который наполняется командой
+seed проекта. Результат — JSON с перцентилями задержки, запросами
+в секунду и SQL-запросами на запрос для каждого URL.
+
+Примеры:
+
+    python loadtest.py news --requests 5000 --workers 4
+    python loadtest.py note --mix author=3,anonymous=1 --output run.json
+    python loadtest.py news --baseline baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from http.cookies import SimpleCookie
+from importlib import import_module
+from io import StringIO
+from itertools import accumulate
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+PROJECTS = {
+    'news': {
+        'path': BASE_DIR / 'ya_news',
+        'settings': 'yanews.settings',
+        'wsgi': 'yanews.wsgi',
+        'mix': 'reader=9,commenter=1',
+    },
+    'note': {
+        'path': BASE_DIR / 'ya_note',
+        'settings': 'yanote.settings',
+        'wsgi': 'yanote.wsgi',
+        'mix': 'author=4,anonymous=1',
+    },
+}
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return None
+    return values[max(math.ceil(rank / 100 * len(values)) - 1, 0)]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class WSGIClient:
+    """
+    Клиент, вызывающий WSGI-приложение напрямую.
+
+    Окружение запроса собирает RequestFactory, cookies ответа
+    запоминаются, как в браузере. CSRF-токен создаётся заранее,
+    поэтому POST-запросы не требуют предварительного GET.
+    """
+
+    def __init__(self, application, cookies=None):
+        from django.conf import settings
+        from django.http import HttpRequest
+        from django.middleware.csrf import get_token
+        from django.test import RequestFactory
+
+        self.application = application
+        self.factory = RequestFactory()
+        request = HttpRequest()
+        self.csrf_token = get_token(request)
+        self.cookies = {
+            settings.CSRF_COOKIE_NAME: request.META['CSRF_COOKIE'],
+            **(cookies or {}),
+        }
+
+    def request(self, method, path, data=None):
+        """Выполняет запрос и возвращает код ответа."""
+        extra = {'HTTP_COOKIE': '; '.join(
+            f'{name}={value}' for name, value in self.cookies.items()
+        )}
+        if method == 'POST':
+            data = {**(data or {}), 'csrfmiddlewaretoken': self.csrf_token}
+            request = self.factory.post(path, data, **extra)
+        else:
+            request = self.factory.get(path, data or {}, **extra)
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split()[0]))
+            for name, value in headers:
+                if name.lower() == 'set-cookie':
+                    self._store_cookie(value)
+
+        body = self.application(request.environ, start_response)
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return status[0]
+
+    def _store_cookie(self, header):
+        for name, morsel in SimpleCookie(header).items():
+            if morsel['max-age'] == '0':
+                self.cookies.pop(name, None)
+            else:
+                self.cookies[name] = morsel.value
+
+
+def session_cookies(user):
+    """Cookie сессии вошедшего пользователя без проверки пароля."""
+    from django.conf import settings
+    from django.contrib.auth import (
+        BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    )
+
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return {settings.SESSION_COOKIE_NAME: session.session_key}
+
+
+def zipf_cum_weights(total, exponent=1.1):
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, total + 1)
+    ))
+
+
+# Сценарии ya_news
+
+def prepare_news(options):
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from news.models import News
+    from news.pagination import AFTER, KeysetPaginator
+
+    if options.seed:
+        call_command(
+            'seed', users=options.users, news=options.rows,
+            comments=options.rows * 10, stdout=StringIO(),
+        )
+    # Популярность новости пропорциональна числу её комментариев.
+    news_ids = list(
+        News.objects.order_by('-comment_count').values_list('pk', flat=True)
+    )
+    paginator = KeysetPaginator(
+        News.objects.all(), News._meta.ordering,
+        settings.NEWS_COUNT_ON_HOME_PAGE,
+    )
+    queryset = News.objects.order_by(*News._meta.ordering)
+    cursors = [
+        paginator.encode(AFTER, queryset[offset])
+        for offset in range(
+            settings.NEWS_COUNT_ON_HOME_PAGE - 1,
+            min(len(news_ids), settings.NEWS_COUNT_ON_HOME_PAGE * 50),
+            settings.NEWS_COUNT_ON_HOME_PAGE * 5,
+        )
+    ]
+    words = [
+        title.split()[0]
+        for title in News.objects.values_list('title', flat=True)[:200]
+    ]
+    users = get_user_model().objects.order_by('pk')[:options.sessions]
+    return {
+        'news_ids': news_ids,
+        'weights': zipf_cum_weights(len(news_ids)),
+        'cursors': cursors,
+        'words': words,
+        'sessions': [session_cookies(user) for user in users],
+    }
+
+
+def popular_news(data, rng):
+    return rng.choices(data['news_ids'], cum_weights=data['weights'])[0]
+
+
+def news_reader(client, data, rng):
+    from django.urls import reverse
+
+    action = rng.random()
+    if action < 0.4:
+        cursor = rng.choice([None, *data['cursors']])
+        return 'news:home', client.request(
+            'GET', reverse('news:home'), {'cursor': cursor} if cursor else {}
+        )
+    pk = popular_news(data, rng)
+    if action < 0.85:
+        return 'news:detail', client.request(
+            'GET', reverse('news:detail', args=(pk,))
+        )
+    if action < 0.9:
+        return 'news:comments', client.request(
+            'GET', reverse('news:comments', args=(pk,))
+        )
+    return 'news:search', client.request(
+        'GET', reverse('news:search'), {'q': rng.choice(data['words'])}
+    )
+
+
+def news_commenter(client, data, rng):
+    from django.urls import reverse
+
+    pk = popular_news(data, rng)
+    if rng.random() < 0.7:
+        return 'news:detail', client.request(
+            'GET', reverse('news:detail', args=(pk,))
+        )
+    return 'news:detail POST', client.request(
+        'POST', reverse('news:detail', args=(pk,)),
+        {'text': f'Комментарий {rng.random()}'},
+    )
+
+
+# Сценарии ya_note
+
+def prepare_note(options):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from notes.models import Note
+
+    if options.seed:
+        call_command(
+            'seed', users=options.users, notes=options.rows,
+            stdout=StringIO(),
+        )
+    authors = []
+    for user in get_user_model().objects.order_by('pk')[:options.sessions]:
+        slugs = list(
+            Note.objects.filter(author=user).values_list('slug', flat=True)
+            [:100]
+        )
+        if slugs:
+            authors.append({'cookies': session_cookies(user), 'slugs': slugs})
+    return {'sessions': authors}
+
+
+def note_author(client, data, rng):
+    from django.urls import reverse
+
+    action = rng.random()
+    if action < 0.4:
+        return 'notes:list', client.request('GET', reverse('notes:list'))
+    slug = rng.choice(client.slugs)
+    if action < 0.8:
+        return 'notes:detail', client.request(
+            'GET', reverse('notes:detail', args=(slug,))
+        )
+    if action < 0.9:
+        return 'notes:add POST', client.request(
+            'POST', reverse('notes:add'),
+            {'title': f'Заметка {rng.getrandbits(64)}', 'text': 'Текст.'},
+        )
+    return 'notes:edit POST', client.request(
+        'POST', reverse('notes:edit', args=(slug,)),
+        {'title': 'Обновлённая заметка', 'text': 'Текст.', 'slug': slug},
+    )
+
+
+def note_anonymous(client, data, rng):
+    from django.urls import reverse
+
+    return 'notes:home', client.request('GET', reverse('notes:home'))
+
+
+USER_TYPES = {
+    'news': {
+        'reader': (news_reader, False),
+        'commenter': (news_commenter, True),
+    },
+    'note': {
+        'author': (note_author, True),
+        'anonymous': (note_anonymous, False),
+    },
+}
+PREPARE = {'news': prepare_news, 'note': prepare_note}
+
+
+def make_client(application, project, data, logged_in, rng):
+    if not logged_in:
+        return WSGIClient(application)
+    session = rng.choice(data['sessions'])
+    if project == 'note':
+        client = WSGIClient(application, session['cookies'])
+        client.slugs = session['slugs']
+        return client
+    return WSGIClient(application, session)
+
+
+def run_worker(args):
+    """
+    Прогон одного процесса.
+
+    Возвращает список (URL, мс, код ответа, SQL-запросов) и время
+    прогона без учёта разогрева.
+    """
+    project, mix, data, requests, warmup, worker = args
+    from django.db import connection
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    rng = random.Random(worker)
+    user_types = USER_TYPES[project]
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    clients = {}
+    samples = []
+    counter = [0]
+
+    def count_queries(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    started_at = None
+    for index in range(warmup + requests):
+        if index == warmup:
+            started_at = time.perf_counter()
+        user_type = rng.choices(names, weights)[0]
+        scenario, logged_in = user_types[user_type]
+        key = (user_type, rng.randrange(8))
+        if key not in clients:
+            clients[key] = make_client(
+                application, project, data, logged_in, rng
+            )
+        counter[0] = 0
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            label, status = scenario(clients[key], data, rng)
+        elapsed = (time.perf_counter() - started) * 1000
+        if index >= warmup:
+            samples.append((label, elapsed, status, counter[0]))
+    return samples, time.perf_counter() - started_at
+
+
+def summarize(results):
+    """
+    Сводка по каждому URL и по всему прогону.
+
+    Процессы работают параллельно, поэтому общее число запросов
+    в секунду — сумма по процессам.
+    """
+    samples = [sample for result, _ in results for sample in result]
+    rps = sum(len(result) / duration for result, duration in results)
+    duration = max(duration for _, duration in results)
+    per_label = defaultdict(list)
+    for sample in samples:
+        per_label[sample[0]].append(sample)
+    views = {}
+    for label, rows in sorted(per_label.items()):
+        timings = sorted(row[1] for row in rows)
+        views[label] = {
+            'count': len(rows),
+            'errors': sum(1 for row in rows if row[2] >= 400),
+            'statuses': dict(sorted(Counter(row[2] for row in rows).items())),
+            **{
+                f'p{rank}_ms': round(percentile(timings, rank), 3)
+                for rank in PERCENTILES
+            },
+            'rps': round(rps * len(rows) / len(samples), 1),
+            'queries_per_request': round(
+                sum(row[3] for row in rows) / len(rows), 2
+            ),
+        }
+    timings = sorted(sample[1] for sample in samples)
+    return {
+        'requests': len(samples),
+        'duration_s': round(duration, 3),
+        'rps': round(rps, 1),
+        **{
+            f'p{rank}_ms': round(percentile(timings, rank), 3)
+            for rank in PERCENTILES
+        },
+        'views': views,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """
+    Регрессии относительно сохранённого прогона.
+
+    Регрессией считается рост p95 или числа SQL-запросов на запрос
+    больше чем на tolerance, а также падение общего числа запросов
+    в секунду на ту же долю.
+    """
+    regressions = []
+    if report['rps'] < baseline['rps'] * (1 - tolerance):
+        regressions.append(
+            f'rps: {report["rps"]} против {baseline["rps"]} в базовом прогоне'
+        )
+    for label, current in report['views'].items():
+        previous = baseline['views'].get(label)
+        if previous is None:
+            continue
+        for metric in ('p95_ms', 'queries_per_request'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    f'{label} {metric}: {current[metric]} '
+                    f'против {previous[metric]}'
+                )
+    return regressions
+
+
+def setup_django(project, database):
+    """Настраивает Django проекта на отдельную базу и без DEBUG."""
+    config = PROJECTS[project]
+    sys.path.insert(0, str(config['path']))
+    os.environ['DJANGO_SETTINGS_MODULE'] = config['settings']
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = str(database)
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['testserver']
+    import django
+
+    django.setup()
+    # Модуль wsgi проекта создаёт приложение тем же способом,
+    # что и рабочий сервер.
+    import_module(config['wsgi'])
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('project', choices=sorted(PROJECTS))
+    parser.add_argument(
+        '--mix',
+        help='Доли типов пользователей, например reader=9,commenter=1.',
+    )
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument(
+        '--database',
+        type=Path,
+        help='Файл SQLite; без него создаётся и наполняется временный.',
+    )
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument(
+        '--rows',
+        type=int,
+        default=5000,
+        help='Сколько новостей (комментариев в 10 раз больше) '
+             'или заметок создать.',
+    )
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--output', type=Path)
+    parser.add_argument('--baseline', type=Path)
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    mix = parse_mix(options.mix or PROJECTS[options.project]['mix'])
+    unknown = set(mix) - set(USER_TYPES[options.project])
+    if unknown:
+        sys.exit(f'Неизвестные типы пользователей: {", ".join(unknown)}')
+    with tempfile.TemporaryDirectory() as directory:
+        database = options.database or Path(directory) / 'loadtest.sqlite3'
+        options.seed = not database.exists()
+        setup_django(options.project, database)
+        from django.core.management import call_command
+        from django.db import connections
+
+        call_command('migrate', verbosity=0)
+        data = PREPARE[options.project](options)
+        connections.close_all()
+        per_worker = options.requests // options.workers
+        jobs = [
+            (options.project, mix, data, per_worker, options.warmup, worker)
+            for worker in range(options.workers)
+        ]
+        if options.workers == 1:
+            results = [run_worker(jobs[0])]
+        else:
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options.workers) as pool:
+                results = pool.map(run_worker, jobs)
+    report = summarize(results)
+    report.update(
+        project=options.project, mix=mix, workers=options.workers
+    )
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        options.output.write_text(text, encoding='utf-8')
+    print(text)
+    if options.baseline:
+        regressions = compare(
+            report,
+            json.loads(options.baseline.read_text(encoding='utf-8')),
+            options.tolerance,
+        )
+        for regression in regressions:
+            print(f'Регрессия: {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Сценарии нагрузочных замеров для команды benchmark.
+
+Каждый сценарий получает объект команды (для вывода) и опции,
+сам наполняет временную базу и печатает результаты.
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+
+from .models import News
+from .moderation import WordMatcher
+from .search import SearchResults
+from .pagination import AFTER, KeysetPaginator
+
+BATCH_SIZE = 10_000
+
+
+def measure(func, repeat):
+    """Медиана времени выполнения func в миллисекундах."""
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def create_news(total, news_per_day=50):
+    """Быстро создаёт total новостей, по news_per_day на каждый день."""
+    today = date.today()
+    for start in range(0, total, BATCH_SIZE):
+        News.objects.bulk_create([
+            News(
+                title=f'Новость {index}',
+                text='Просто текст.',
+                date=today - timedelta(days=index // news_per_day),
+            )
+            for index in range(start, min(start + BATCH_SIZE, total))
+        ], batch_size=BATCH_SIZE)
+
+
+def bench_feed(command, options):
+    """Лента новостей: курсор против OFFSET на глубоких страницах."""
+    rows = options['rows'] or 1_000_000
+    per_page = settings.NEWS_COUNT_ON_HOME_PAGE
+    command.stdout.write(f'Создаём {rows} новостей...')
+    create_news(rows)
+    queryset = News.objects.all()
+    ordering = News._meta.ordering
+    paginator = KeysetPaginator(queryset, ordering, per_page)
+    command.stdout.write(
+        f'{"страница":>10} {"курсор, мс":>12} {"OFFSET, мс":>12}'
+    )
+    page_number = 1
+    while (page_number - 1) * per_page < rows:
+        offset = (page_number - 1) * per_page
+        cursor = None
+        if offset:
+            previous = queryset.order_by(*ordering)[offset - 1]
+            cursor = paginator.encode(AFTER, previous)
+
+        def keyset():
+            page = paginator.page(cursor)
+            list(page)
+            page.has_next
+
+        def by_offset():
+            list(queryset.order_by(*ordering)[offset:offset + per_page])
+
+        command.stdout.write(
+            f'{page_number:>10} {measure(keyset, options["repeat"]):>12.3f} '
+            f'{measure(by_offset, options["repeat"]):>12.3f}'
+        )
+        page_number *= 10
+
+
+def random_words(rng, total, alphabet='абвгдеёжзийклмнопрстуфхцчшщъыьэюя'):
+    return [
+        ''.join(rng.choices(alphabet, k=rng.randint(5, 10)))
+        for _ in range(total)
+    ]
+
+
+def bench_matcher(command, options):
+    """Проверка комментария: перебор слов против автомата."""
+    rng = random.Random(0)
+    text = ' '.join(random_words(rng, options['rows'] or 300)).lower()
+    command.stdout.write(f'Длина комментария: {len(text)} символов')
+    command.stdout.write(
+        f'{"слов":>8} {"перебор, мс":>13} {"автомат, мс":>13} '
+        f'{"сборка, мс":>12}'
+    )
+    for total in (10, 1_000, 50_000):
+        words = random_words(rng, total)
+        started = time.perf_counter()
+        matcher = WordMatcher(words)
+        build = (time.perf_counter() - started) * 1000
+
+        def loop():
+            for word in words:
+                if word in text:
+                    return word
+
+        def automaton():
+            return matcher.search(text)
+
+        command.stdout.write(
+            f'{total:>8} {measure(loop, options["repeat"]):>13.3f} '
+            f'{measure(automaton, options["repeat"]):>13.3f} {build:>12.1f}'
+        )
+
+
+def zipf_weights(total, exponent=1.1):
+    """Накопленные веса распределения Ципфа для random.choices."""
+    weights = []
+    accumulated = 0.0
+    for rank in range(1, total + 1):
+        accumulated += 1 / rank ** exponent
+        weights.append(accumulated)
+    return weights
+
+
+def bench_search(command, options):
+    """Поиск: FTS5 с курсором против LIKE на большом архиве."""
+    rows = options['rows'] or 1_000_000
+    per_page = settings.NEWS_COUNT_ON_HOME_PAGE
+    rng = random.Random(0)
+    vocabulary = random_words(rng, 50_000)
+    weights = zipf_weights(len(vocabulary))
+    command.stdout.write(f'Создаём {rows} новостей...')
+    today = date.today()
+    for start in range(0, rows, BATCH_SIZE):
+        News.objects.bulk_create([
+            News(
+                title=' '.join(rng.choices(
+                    vocabulary, cum_weights=weights, k=5
+                )),
+                text=' '.join(rng.choices(
+                    vocabulary, cum_weights=weights, k=40
+                )),
+                date=today - timedelta(days=index // 50),
+            )
+            for index in range(start, min(start + BATCH_SIZE, rows))
+        ], batch_size=BATCH_SIZE)
+    queries = {
+        'частое слово': vocabulary[20],
+        'среднее слово': vocabulary[2_000],
+        'редкое слово': vocabulary[40_000],
+        'два слова': f'{vocabulary[20]} {vocabulary[300]}',
+    }
+    command.stdout.write(
+        f'{"запрос":>14} {"стр. 1, мс":>11} {"стр. 10, мс":>12} '
+        f'{"LIKE, мс":>10}'
+    )
+    for label, query in queries.items():
+        cursor = None
+        for _ in range(9):
+            cursor = SearchResults(query, per_page, cursor).next_cursor
+            if cursor is None:
+                break
+
+        def first_page():
+            list(SearchResults(query, per_page))
+
+        def tenth_page():
+            list(SearchResults(query, per_page, cursor))
+
+        def like():
+            word = query.split()[0]
+            list(News.objects.filter(text__contains=word)[:per_page])
+
+        tenth = measure(tenth_page, options['repeat']) if cursor else 0
+        command.stdout.write(
+            f'{label:>14} {measure(first_page, options["repeat"]):>11.2f} '
+            f'{tenth:>12.2f} {measure(like, options["repeat"]):>10.2f}'
+        )
+
+
+SCENARIOS = {
+    'feed': bench_feed,
+    'matcher': bench_matcher,
+    'search': bench_search,
+}
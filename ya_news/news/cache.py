@@ -0,0 +1,92 @@
+"""
+Кеш отрендеренных карточек новостей для главной страницы.
+
+Каждая карточка кешируется под ключом с версией новости. Версия —
+случайная метка, которую сигналы меняют при сохранении и удалении
+новости и её комментариев. Старые карточки при этом не удаляются,
+а просто перестают запрашиваться и вытесняются кешем со временем.
+Версии лежат в кеше по умолчанию, поэтому при нескольких процессах
+он должен быть общим (см. CACHES в настройках).
+"""
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+ITEM_TEMPLATE = 'news/includes/news_item.html'
+VERSION_KEY = 'news:item-version:{pk}'
+FRAGMENT_KEY = 'news:item:{pk}:{version}'
+
+# Попадания и промахи с момента запуска процесса.
+stats = Counter()
+# Отправляется после каждого чтения карточек с аргументами hits и misses.
+fragments_fetched = Signal()
+
+
+def new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def bump_versions(news_ids):
+    """
+    Делает устаревшими закешированные карточки новостей.
+
+    Версия меняется сразу и ещё раз после фиксации транзакции: иначе
+    карточка, которую параллельный запрос успел отрендерить по старым
+    данным до фиксации, осталась бы в кеше под новой версией.
+    """
+    def bump():
+        cache.set_many(
+            {VERSION_KEY.format(pk=pk): new_version() for pk in news_ids},
+            timeout=None,
+        )
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_versions(news_ids):
+    keys = {pk: VERSION_KEY.format(pk=pk) for pk in news_ids}
+    found = cache.get_many(keys.values())
+    versions = {}
+    missing = {}
+    for pk, key in keys.items():
+        if key in found:
+            versions[pk] = found[key]
+        else:
+            versions[pk] = missing[key] = new_version()
+    if missing:
+        cache.set_many(missing, timeout=None)
+    return versions
+
+
+def render_news_items(news_list):
+    """
+    HTML карточек новостей по порядку, число попаданий и промахов.
+
+    Версии и карточки читаются из кеша двумя пакетными запросами,
+    рендерятся только отсутствующие карточки.
+    """
+    news_list = list(news_list)
+    versions = get_versions([news.pk for news in news_list])
+    keys = [
+        FRAGMENT_KEY.format(pk=news.pk, version=versions[news.pk])
+        for news in news_list
+    ]
+    fragments = cache.get_many(keys)
+    rendered = {}
+    for news, key in zip(news_list, keys):
+        if key not in fragments:
+            rendered[key] = render_to_string(ITEM_TEMPLATE, {'news': news})
+    if rendered:
+        cache.set_many(rendered, settings.NEWS_FRAGMENT_CACHE_TIMEOUT)
+    hits, misses = len(keys) - len(rendered), len(rendered)
+    stats.update(hits=hits, misses=misses)
+    fragments_fetched.send(render_news_items, hits=hits, misses=misses)
+    fragments.update(rendered)
+    return [mark_safe(fragments[key]) for key in keys], hits, misses
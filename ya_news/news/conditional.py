@@ -0,0 +1,93 @@
+"""
+Валидаторы условных GET-запросов для ленты и страницы новости.
+
+ETag и Last-Modified считаются до вызова представления одним
+небольшим запросом, поэтому ответ 304 обходится без загрузки
+объектов и рендеринга шаблона. Время изменения новости сдвигается
+и при правке её комментариев (см. signals.touch_news).
+
+Лента отдаёт только ETag: удаление новости не сдвигает ничьё время
+изменения, и по If-Modified-Since клиент получил бы 304 и продолжал
+показывать удалённую новость. В ETag же входят ключи записей
+страницы, поэтому он меняется и при удалении.
+
+Страницы отличаются для разных пользователей: в шапке имя
+пользователя, на странице новости — форма и ссылки на правку своих
+комментариев. Поэтому в ETag входит пользователь и его CSRF-cookie
+(токен в форме привязан к ней), а Last-Modified отдаётся только
+анонимам: по одной дате нельзя понять, что читатель за это время
+вошёл на сайт.
+"""
+import hashlib
+
+from django.conf import settings
+from django.http import Http404
+from django.views.decorators.http import condition
+
+from .models import News
+from .pagination import KeysetPaginator
+
+
+def viewer_key(request):
+    """Часть ETag, зависящая от того, кто смотрит страницу."""
+    if not request.user.is_authenticated:
+        return 'anon'
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return f'{request.user.pk}:{csrf}'
+
+
+def make_etag(request, *parts):
+    raw = '|'.join(str(part) for part in (viewer_key(request), *parts))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def feed_etag(request):
+    """
+    Значение ETag для текущей страницы ленты.
+
+    Берутся ключи и время изменения записей страницы и одной следующей
+    за ней записи, чтобы заметить и появление ссылки «дальше».
+    """
+    paginator = KeysetPaginator(
+        News.objects.all(),
+        News._meta.ordering,
+        settings.NEWS_COUNT_ON_HOME_PAGE + 1,
+    )
+    rows = paginator.page(request.GET.get('cursor')).object_list.values_list(
+        'pk', 'modified'
+    )
+    return make_etag(request, *rows)
+
+
+def detail_validators(request, pk):
+    """
+    Валидаторы страницы новости: ETag и время изменения.
+
+    Новость загружается целиком тем же запросом по первичному ключу
+    и сохраняется в request.news, чтобы при ответе 200 представление
+    не читало её повторно.
+    """
+    if not hasattr(request, 'news'):
+        request.news = News.objects.filter(pk=pk).first()
+    if request.news is None:
+        raise Http404('Новость не найдена.')
+    return (
+        make_etag(request, pk, request.news.modified),
+        request.news.modified,
+    )
+
+
+def anonymous_only(last_modified, request):
+    return None if request.user.is_authenticated else last_modified
+
+
+feed_condition = condition(
+    etag_func=lambda request, **kwargs: feed_etag(request),
+)
+
+detail_condition = condition(
+    etag_func=lambda request, pk: detail_validators(request, pk)[0],
+    last_modified_func=lambda request, pk: anonymous_only(
+        detail_validators(request, pk)[1], request
+    ),
+)
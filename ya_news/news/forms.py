@@ -1,7 +1,9 @@
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
+from django.dispatch import Signal
 
 from .models import Comment
+from .moderation import get_matcher
 
 BAD_WORDS = (
     'редиска',
@@ -10,6 +12,9 @@ BAD_WORDS = (
 )
 WARNING = 'Не ругайтесь!'
 
+# Отправляется при отклонении комментария с аргументом reason.
+comment_rejected = Signal()
+
 
 class CommentForm(ModelForm):
 
@@ -20,8 +25,7 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        if get_matcher(BAD_WORDS).search(text):
+            comment_rejected.send(CommentForm, reason='bad_words')
+            raise ValidationError(WARNING)
         return text
@@ -0,0 +1,189 @@
+"""
+Потоковая загрузка новостей из выгрузок.
+
+Выгрузка читается по одной записи: фикстура Django (JSON-массив
+объектов с model и fields), JSON Lines или CSV с колонками title, text,
+date. Записи пишутся порциями через bulk_create, а дубли по хешу
+(title, date) отбрасываются, поэтому память не зависит от размера
+выгрузки.
+"""
+import csv
+import json
+from collections import Counter
+from datetime import date
+from itertools import islice
+
+from django.db import transaction
+
+from .models import News
+
+FIXTURE = 'fixture'
+JSON_LINES = 'jsonl'
+CSV = 'csv'
+FORMATS = (FIXTURE, JSON_LINES, CSV)
+EXTENSIONS = {
+    '.json': FIXTURE,
+    '.jsonl': JSON_LINES,
+    '.ndjson': JSON_LINES,
+    '.csv': CSV,
+}
+CHUNK_SIZE = 64 * 1024
+TITLE_MAX_LENGTH = News._meta.get_field('title').max_length
+
+
+class IngestError(Exception):
+    """Выгрузку невозможно прочитать."""
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """
+    Элементы JSON-массива верхнего уровня по одному.
+
+    Файл читается кусками, и в памяти держится только ещё не
+    разобранный хвост, а не весь документ, как в json.load. Если
+    элемент не поместился в прочитанное, дочитывается кусок не меньше
+    уже накопленного, чтобы длинный элемент не разбирался заново
+    слишком много раз.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        error = None
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise IngestError('Ожидался JSON-массив.')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as decode_error:
+                error = decode_error
+            else:
+                yield item
+                continue
+        buffer = buffer[position:]
+        position = 0
+        chunk = file.read(max(chunk_size, len(buffer)))
+        if not chunk:
+            raise IngestError(f'Некорректный JSON: {error or "нет конца"}')
+        buffer += chunk
+
+
+def read_fixture(file):
+    for item in iter_json_array(file):
+        if isinstance(item, dict) and item.get('model') == 'news.news':
+            yield item.get('fields', {})
+
+
+def read_json_lines(file):
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise IngestError(f'Строка {number}: {error}') from error
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+READERS = {
+    FIXTURE: read_fixture,
+    JSON_LINES: read_json_lines,
+    CSV: read_csv,
+}
+
+
+def clean_record(record):
+    """Новость из записи выгрузки или None, если запись негодна."""
+    if not isinstance(record, dict):
+        return None
+    title = record.get('title')
+    text = record.get('text')
+    if not isinstance(title, str) or not isinstance(text, str):
+        return None
+    title = title.strip()
+    if not title or len(title) > TITLE_MAX_LENGTH:
+        return None
+    try:
+        news_date = date.fromisoformat(str(record.get('date')))
+    except ValueError:
+        return None
+    return News(
+        title=title,
+        text=text,
+        date=news_date,
+        content_hash=News.make_content_hash(title, news_date),
+    )
+
+
+def write_batch(batch):
+    """
+    Сохраняет порцию новостей без дублей и возвращает число новых.
+
+    Дубли внутри порции отсекаются словарём по хешу, а уже
+    загруженные раньше — одним запросом по индексу content_hash.
+    """
+    unique = {}
+    for news in batch:
+        unique.setdefault(news.content_hash, news)
+    existing = set(
+        News.objects.filter(
+            content_hash__in=unique
+        ).values_list('content_hash', flat=True)
+    )
+    fresh = [
+        news for content_hash, news in unique.items()
+        if content_hash not in existing
+    ]
+    News.objects.bulk_create(fresh)
+    return len(fresh)
+
+
+def iter_batches(records, batch_size, stats):
+    """Порции годных новостей; негодные записи только считаются."""
+    batch = []
+    for record in records:
+        stats['read'] += 1
+        news = clean_record(record)
+        if news is None:
+            stats['invalid'] += 1
+            continue
+        batch.append(news)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest(records, batch_size=1000, transaction_size=10000, report=None):
+    """
+    Загружает записи и возвращает Counter со статистикой.
+
+    Порции по batch_size записей объединяются в транзакции примерно
+    по transaction_size записей; после каждой транзакции вызывается
+    report(stats), если он передан.
+    """
+    stats = Counter()
+    batches = iter_batches(records, batch_size, stats)
+    per_transaction = max(transaction_size // batch_size, 1)
+    for first in batches:
+        with transaction.atomic():
+            stats['created'] += write_batch(first)
+            for batch in islice(batches, per_transaction - 1):
+                stats['created'] += write_batch(batch)
+        if report:
+            report(stats)
+    stats['duplicates'] = stats['read'] - stats['invalid'] - stats['created']
+    return stats
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from news.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает сценарий замера производительности на временной '
+        'базе данных. Рабочая база не затрагивается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=None,
+            help='Объём данных сценария (по умолчанию свой у каждого).',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Количество повторов каждого замера.',
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            SCENARIOS[options['scenario']](self, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
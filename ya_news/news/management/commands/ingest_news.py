@@ -0,0 +1,79 @@
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.ingest import EXTENSIONS, FORMATS, READERS, IngestError, ingest
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает новости из фикстуры, JSON Lines или CSV потоково, '
+        'пропуская дубли по заголовку и дате.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл выгрузки или - для стандартного ввода.',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат выгрузки; по умолчанию — по расширению файла.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько новостей сохранять одним bulk_create.',
+        )
+        parser.add_argument(
+            '--transaction-size',
+            type=int,
+            default=20000,
+            help='Сколько новостей фиксировать одной транзакцией.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        data_format = options['format'] or EXTENSIONS.get(
+            Path(path).suffix.lower()
+        )
+        if data_format is None:
+            raise CommandError(
+                'Не удалось определить формат выгрузки, укажите --format.'
+            )
+        started = time.perf_counter()
+
+        def report(stats):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'прочитано {stats["read"]}, добавлено {stats["created"]}, '
+                f'{stats["read"] / elapsed:.0f} строк/с'
+            )
+
+        if path == '-':
+            file = sys.stdin
+        else:
+            file = open(path, encoding='utf-8', newline='')
+        try:
+            stats = ingest(
+                READERS[data_format](file),
+                batch_size=options['batch_size'],
+                transaction_size=options['transaction_size'],
+                report=report,
+            )
+        except IngestError as error:
+            raise CommandError(error)
+        finally:
+            if file is not sys.stdin:
+                file.close()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Готово за {elapsed:.1f} с: прочитано {stats["read"]}, '
+            f'добавлено {stats["created"]}, дублей {stats["duplicates"]}, '
+            f'пропущено некорректных {stats["invalid"]}, '
+            f'{stats["read"] / elapsed:.0f} строк/с.'
+        )
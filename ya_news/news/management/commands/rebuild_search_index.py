@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from news.search import install_triggers, is_supported, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс новостей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--optimize',
+            action='store_true',
+            help='После перестроения слить сегменты индекса в один.',
+        )
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError(
+                'Полнотекстовый поиск работает только с SQLite.'
+            )
+        install_triggers()
+        rebuild_index(optimize=options['optimize'])
+        self.stdout.write('Поисковый индекс новостей перестроен.')
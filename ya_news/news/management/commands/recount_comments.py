@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from news.cache import bump_versions
+from news.models import Comment, News
+
+BATCH_SIZE = 500
+
+
+def actual_comment_count():
+    """Подзапрос с реальным количеством видимых комментариев новости."""
+    comments = (
+        Comment.objects
+        .filter(news=OuterRef('pk'), is_hidden=False)
+        .order_by()
+        .values('news')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(comments, output_field=IntegerField()), 0
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет News.comment_count с реальным количеством комментариев '
+        'и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправлять.',
+        )
+
+    def handle(self, *args, **options):
+        mismatched = News.objects.annotate(
+            actual=actual_comment_count()
+        ).exclude(comment_count=F('actual'))
+        with transaction.atomic():
+            ids = list(mismatched.values_list('pk', flat=True))
+            total = len(ids)
+            if not options['dry_run']:
+                for start in range(0, total, BATCH_SIZE):
+                    News.objects.filter(
+                        pk__in=ids[start:start + BATCH_SIZE]
+                    ).update(
+                        comment_count=actual_comment_count(),
+                        modified=timezone.now(),
+                    )
+        if not options['dry_run']:
+            bump_versions(ids)
+        if options['dry_run']:
+            message = f'Расхождений счётчика комментариев: {total}'
+        else:
+            message = f'Исправлено счётчиков комментариев: {total}'
+        self.stdout.write(message)
@@ -0,0 +1,113 @@
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from news.cache import bump_versions
+from news.forms import BAD_WORDS
+from news.models import Comment, News
+from news.moderation import get_matcher
+
+
+class Command(BaseCommand):
+    help = (
+        'Повторно проверяет сохранённые комментарии по текущему списку '
+        'запрещённых слов и скрывает нарушающие правила.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Сколько комментариев читать и обновлять за раз.',
+        )
+        parser.add_argument(
+            '--start-after',
+            type=int,
+            default=0,
+            help='Начать с комментариев, id которых больше указанного.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=Path,
+            help=(
+                'Файл с последним обработанным id. Если он есть, проверка '
+                'продолжается с этого места, и он обновляется после '
+                'каждой порции (кроме запуска с --dry-run).'
+            ),
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать нарушения, ничего не скрывать.',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        last_id = options['start_after']
+        if checkpoint and checkpoint.exists():
+            last_id = int(checkpoint.read_text() or 0)
+        matcher = get_matcher(BAD_WORDS)
+        scanned = hidden = 0
+        started = time.perf_counter()
+        while True:
+            # Читаем порциями по первичному ключу: память не растёт,
+            # а прерванный запуск продолжается с последнего id.
+            batch = list(
+                Comment.objects
+                .filter(pk__gt=last_id, is_hidden=False)
+                .order_by('pk')
+                .only('pk', 'news_id', 'text')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            offending = [
+                comment for comment in batch if matcher.search(comment.text)
+            ]
+            if offending and not options['dry_run']:
+                self.hide(offending)
+            scanned += len(batch)
+            hidden += len(offending)
+            last_id = batch[-1].pk
+            # Пробный запуск ничего не скрыл: запиши он точку, настоящий
+            # запуск с тем же файлом пропустил бы эти комментарии.
+            if checkpoint and not options['dry_run']:
+                checkpoint.write_text(str(last_id))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'id до {last_id}: проверено {scanned}, '
+                f'нарушений {hidden}, {scanned / elapsed:.0f} строк/с'
+            )
+        action = 'найдено' if options['dry_run'] else 'скрыто'
+        self.stdout.write(
+            f'Готово: проверено {scanned} комментариев, {action} {hidden}.'
+        )
+
+    @staticmethod
+    def hide(comments):
+        """
+        Скрывает комментарии и уменьшает счётчики их новостей.
+
+        Обновляем по одной новости за раз и только ещё видимые
+        комментарии: так счётчик уменьшается ровно на число реально
+        скрытых строк, даже если их параллельно скрыл кто-то ещё.
+        """
+        per_news = defaultdict(list)
+        for comment in comments:
+            per_news[comment.news_id].append(comment.pk)
+        with transaction.atomic():
+            for news_id, ids in per_news.items():
+                total = Comment.objects.filter(
+                    pk__in=ids, is_hidden=False
+                ).update(is_hidden=True)
+                News.objects.filter(pk=news_id).update(
+                    comment_count=Greatest(F('comment_count') - total, 0),
+                    modified=timezone.now(),
+                )
+        bump_versions(per_news)
@@ -0,0 +1,194 @@
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from news.benchmarks import random_words, zipf_weights
+from news.models import Comment, News
+
+User = get_user_model()
+
+VOCABULARY_SIZE = 50_000
+NEWS_PER_DAY = 50
+COMMENT_TEXTS = 20_000
+
+
+def comment_insert_sql():
+    opts = Comment._meta
+    quote = connection.ops.quote_name
+    columns = [
+        quote(opts.get_field(name).column)
+        for name in ('news', 'author', 'text', 'created', 'is_hidden')
+    ]
+    return (
+        f'INSERT INTO {quote(opts.db_table)} ({", ".join(columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))})'
+    )
+
+
+def zipf_counts(total, slots, exponent):
+    """
+    Раскладывает total по slots пропорционально весам Ципфа.
+
+    Доли округляются вниз, а остаток отдаётся самым популярным
+    местам, поэтому сумма ровно равна total.
+    """
+    weights = [1 / rank ** exponent for rank in range(1, slots + 1)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for rank in range(total - sum(counts)):
+        counts[rank % slots] += 1
+    return counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу воспроизводимым набором пользователей, новостей '
+        'и комментариев для замеров производительности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--news', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=1_000_000)
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Показатель распределения комментариев по новостям.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора: одно и то же зерно даёт те же данные.',
+        )
+        parser.add_argument(
+            '--password',
+            default='password',
+            help='Пароль всех созданных пользователей.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.perf_counter()
+        self.vocabulary = random_words(self.rng, VOCABULARY_SIZE)
+        self.cum_weights = zipf_weights(len(self.vocabulary))
+        user_ids = self.create_users(options)
+        if options['comments'] and not user_ids:
+            raise CommandError('Комментариям нужны авторы: задайте --users.')
+        counts = zipf_counts(
+            options['comments'], max(options['news'], 1), options['zipf']
+        )
+        self.rng.shuffle(counts)
+        self.create_news(options['news'], counts[:options['news']], user_ids)
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'Готово за {elapsed:.1f} с.')
+
+    def words(self, total):
+        return ' '.join(
+            self.rng.choices(self.vocabulary, cum_weights=self.cum_weights,
+                             k=total)
+        )
+
+    def progress(self, label, done):
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'{label}: {done}, {elapsed:.1f} с')
+
+    def create_users(self, options):
+        """Пользователи seed-<зерно>-<номер> с общим хешем пароля."""
+        prefix = f'seed-{options["seed"]}-'
+        password = make_password(options['password'])
+        for start in range(0, options['users'], self.batch_size):
+            stop = min(start + self.batch_size, options['users'])
+            User.objects.bulk_create([
+                User(username=f'{prefix}{index}', password=password)
+                for index in range(start, stop)
+            ], ignore_conflicts=True)
+        self.progress('Пользователей', options['users'])
+        return list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def create_news(self, total, counts, user_ids):
+        """
+        Новости порциями, а за каждой порцией — её комментарии.
+
+        Число комментариев каждой новости известно заранее, поэтому
+        comment_count пишется сразу и пересчёт не нужен.
+        """
+        first_day = date.today() - timedelta(days=total // NEWS_PER_DAY)
+        comment_texts = [
+            self.words(self.rng.randint(3, 30))
+            for _ in range(COMMENT_TEXTS)
+        ]
+        comments = 0
+        for start in range(0, total, self.batch_size):
+            stop = min(start + self.batch_size, total)
+            batch = []
+            for index in range(start, stop):
+                title = self.words(4)[:50]
+                news_date = first_day + timedelta(days=index // NEWS_PER_DAY)
+                batch.append(News(
+                    title=title,
+                    text=self.words(self.rng.randint(30, 120)),
+                    date=news_date,
+                    comment_count=counts[index],
+                    content_hash=News.make_content_hash(title, news_date),
+                ))
+            with transaction.atomic():
+                last_id = News.objects.order_by('-pk').values_list(
+                    'pk', flat=True
+                ).first() or 0
+                News.objects.bulk_create(batch)
+                news_ids = News.objects.filter(pk__gt=last_id).order_by(
+                    'pk'
+                ).values_list('pk', flat=True)
+                comments += self.create_comments(
+                    zip(news_ids, batch), user_ids, comment_texts
+                )
+            self.progress('Новостей', stop)
+            self.progress('Комментариев', comments)
+
+    def create_comments(self, news_list, user_ids, texts):
+        """
+        Комментарии к порции новостей.
+
+        Комментариев на порядок больше, чем остальных строк, поэтому
+        они пишутся executemany без создания объектов модели: сборка
+        Comment и компиляция INSERT в bulk_create занимают больше
+        времени, чем сама запись. Комментарии новости идут с интервалом
+        в минуту начиная с её даты.
+        """
+        sql = comment_insert_sql()
+        adapt = connection.ops.adapt_datetimefield_value
+        rows = []
+        created = 0
+        with connection.cursor() as cursor:
+            for news_id, news in news_list:
+                started = datetime.combine(
+                    news.date, datetime.min.time(), timezone.utc
+                )
+                for minute in range(news.comment_count):
+                    rows.append((
+                        news_id,
+                        self.rng.choice(user_ids),
+                        self.rng.choice(texts),
+                        adapt(started + timedelta(minutes=minute)),
+                        False,
+                    ))
+                    if len(rows) == self.batch_size:
+                        cursor.executemany(sql, rows)
+                        created += len(rows)
+                        rows = []
+            if rows:
+                cursor.executemany(sql, rows)
+        return created + len(rows)
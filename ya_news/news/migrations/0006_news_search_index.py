@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS news_news_fts USING fts5("
+        "title, text, content='news_news', content_rowid='id', "
+        "tokenize='unicode61')"
+    )
+    schema_editor.execute(
+        "INSERT INTO news_news_fts(news_news_fts) VALUES ('rebuild')"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for action in ('insert', 'delete', 'update'):
+        schema_editor.execute(
+            f'DROP TRIGGER IF EXISTS news_news_fts_{action}'
+        )
+    schema_editor.execute('DROP TABLE IF EXISTS news_news_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_comment_is_hidden'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
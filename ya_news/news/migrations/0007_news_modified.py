@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_news_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, help_text='Время последней правки новости или её комментариев.', verbose_name='Изменена'),
+        ),
+    ]
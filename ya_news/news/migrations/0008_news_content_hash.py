@@ -0,0 +1,42 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:52
+
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_content_hash(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    last_id = 0
+    while True:
+        batch = list(
+            News.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .only('pk', 'title', 'date')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for news in batch:
+            raw = f'{news.title}\x1f{news.date.isoformat()}'
+            news.content_hash = hashlib.sha1(raw.encode()).hexdigest()
+        News.objects.bulk_update(batch, ['content_hash'])
+        last_id = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_news_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='content_hash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=40, verbose_name='Хеш заголовка и даты'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:27
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_news_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='news',
+            name='modified',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Время последней правки новости или её комментариев.', verbose_name='Изменена'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:28
+
+import hashlib
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def fill_missing_content_hash(apps, schema_editor):
+    """Хеш для новостей, загруженных через loaddata без него."""
+    News = apps.get_model('news', 'News')
+    while True:
+        batch = list(
+            News.objects.filter(content_hash='')
+            .order_by('pk')
+            .only('pk', 'title', 'date')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for news in batch:
+            raw = f'{news.title}\x1f{news.date.isoformat()}'
+            news.content_hash = hashlib.sha1(raw.encode()).hexdigest()
+        News.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_news_modified_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_missing_content_hash, migrations.RunPython.noop
+        ),
+    ]
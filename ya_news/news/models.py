@@ -1,22 +1,56 @@
+import hashlib
 from datetime import datetime
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    modified = models.DateTimeField(
+        'Изменена',
+        default=timezone.now,
+        help_text='Время последней правки новости или её комментариев.',
+    )
+    content_hash = models.CharField(
+        'Хеш заголовка и даты',
+        max_length=40,
+        editable=False,
+        db_index=True,
+    )
 
     class Meta:
-        ordering = ('-date',)
+        ordering = ('-date', '-id')
+        indexes = (
+            models.Index(fields=('-date', '-id'), name='news_date_id_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def make_content_hash(cls, title, date):
+        """SHA-1 от заголовка и даты: по нему отсеиваются дубли."""
+        date = cls._meta.get_field('date').to_python(date)
+        raw = f'{title}\x1f{date.isoformat()}'
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        # Не auto_now: сырое сохранение loaddata пропускает auto_now
+        # и оставило бы поле пустым, а default срабатывает и там.
+        self.modified = timezone.now()
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     news = models.ForeignKey(
@@ -29,9 +63,26 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    is_hidden = models.BooleanField(
+        'Скрыт модератором',
+        default=False,
+    )
 
     class Meta:
-        ordering = ('created',)
+        ordering = ('created', 'id')
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_id_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминаем видимость, чтобы счётчик учитывал её изменение."""
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_is_hidden = instance.__dict__.get('is_hidden')
+        return instance
@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WordMatcher:
+    """
+    Автомат Ахо — Корасик для поиска запрещённых слов.
+
+    Автомат строится один раз по всему списку слов, после чего текст
+    любой длины проверяется за один проход, независимо от того,
+    сколько слов в списке. Как и проверка `word in text`, ищутся
+    вхождения слов как подстрок; регистр приводится к нижнему.
+    """
+
+    def __init__(self, words):
+        self.size = 0
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [None]
+        for word in words:
+            self._add(word.strip().lower())
+        self._build_fail_links()
+
+    def _add(self, word):
+        if not word:
+            return
+        node = 0
+        for char in word:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            node = next_node
+        if self._output[node] is None:
+            self.size += 1
+        self._output[node] = word
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                if self._output[child] is None:
+                    # Слово, оканчивающееся в узле по ссылке неудачи,
+                    # тоже найдено, когда автомат приходит в child.
+                    self._output[child] = self._output[self._fail[child]]
+
+    def search(self, text):
+        """Первое найденное в тексте слово или None."""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node] is not None:
+                return output[node]
+        return None
+
+
+def read_words(path):
+    """Слова из файла: по одному в строке, # — комментарий."""
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            word = line.split('#', 1)[0].strip()
+            if word:
+                yield word
+
+
+class WordListFile:
+    """
+    Автомат по файлу со списком слов, общий для всех запросов процесса.
+
+    При каждом обращении проверяется время изменения и размер файла,
+    и если файл поменялся, автомат перестраивается. Запросы, пришедшие
+    во время перестроения, продолжают пользоваться прежним автоматом.
+    Если файл не читается (например, на миг пропал при подмене),
+    ошибка пишется в лог и остаётся последний собранный автомат;
+    исключение выбрасывается, только если автомата ещё нет.
+    """
+
+    def __init__(self, path, extra_words=()):
+        self.path = path
+        self.extra_words = tuple(extra_words)
+        self._lock = threading.Lock()
+        self._version = None
+        self._matcher = None
+
+    def matcher(self):
+        try:
+            self._reload()
+        except OSError:
+            if self._matcher is None:
+                raise
+            logger.exception(
+                'Не удалось прочитать список слов %s, '
+                'используется прежний.', self.path
+            )
+        return self._matcher
+
+    def _reload(self):
+        stat = os.stat(self.path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    words = [*self.extra_words, *read_words(self.path)]
+                    self._matcher = WordMatcher(words)
+                    self._version = version
+
+
+@lru_cache(maxsize=None)
+def _word_list_file(path, extra_words):
+    return WordListFile(path, extra_words)
+
+
+@lru_cache(maxsize=None)
+def _static_matcher(words):
+    return WordMatcher(words)
+
+
+def get_matcher(default_words):
+    """
+    Общий для процесса автомат запрещённых слов.
+
+    Если в настройках задан BAD_WORDS_FILE, слова из файла добавляются
+    к default_words и подхватываются при изменении файла.
+    """
+    path = getattr(settings, 'BAD_WORDS_FILE', None)
+    if path:
+        return _word_list_file(str(path), tuple(default_words)).matcher()
+    return _static_matcher(tuple(default_words))
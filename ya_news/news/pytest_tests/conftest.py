@@ -1,12 +1,18 @@
 from datetime import datetime, timedelta
+from pathlib import Path
 
 import pytest
 from django.conf import settings
+from django.core.cache import cache
 from django.test.client import Client
 from django.urls import reverse
 from django.utils import timezone
 
 from news.models import News, Comment
+from yanews.benchmarking import Baseline, Timing, run_timed
+from yanews.middleware import enforce_query_budgets
+
+BENCHMARK_BASELINE = Path(__file__).resolve().parent / 'benchmarks.json'
 
 
 @pytest.fixture(autouse=True)
@@ -14,6 +20,47 @@ def enable_db_access(db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Фикстура: каждый тест начинается с пустого кеша."""
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def no_server_timing(settings):
+    """Фикстура: замеры Server-Timing не пишут в лог тестов."""
+    settings.SERVER_TIMING_SAMPLE_RATE = 0
+
+
+@pytest.fixture(autouse=True)
+def query_budgets():
+    """Фикстура: превышение бюджета SQL-запросов страницы роняет тест."""
+    with enforce_query_budgets():
+        yield
+
+
+@pytest.fixture(scope='session')
+def benchmark_baseline():
+    """Фикстура: базовые замеры из benchmarks.json рядом с тестами."""
+    return Baseline(BENCHMARK_BASELINE)
+
+
+@pytest.fixture
+def benchmark(benchmark_baseline):
+    """Фикстура: замеряет функцию и сравнивает с базовым замером.
+
+    Тест падает, если функция стала медленнее базового замера
+    больше чем на допуск из BENCHMARK_TOLERANCE.
+    """
+    def run(name, func, **kwargs):
+        timing = Timing(name, run_timed(func, **kwargs))
+        message = benchmark_baseline.check(timing)
+        if message:
+            pytest.fail(message, pytrace=False)
+        return timing
+    return run
+
+
 @pytest.fixture
 def author(django_user_model):
     """Фикстура для пользователя автор."""
@@ -128,12 +175,24 @@ def news_home_url():
     return reverse('news:home')
 
 
+@pytest.fixture
+def news_search_url():
+    """Фикстура для получения url поиска по новостям."""
+    return reverse('news:search')
+
+
 @pytest.fixture
 def news_detail_url(news):
     """Фикстура для получения url отдельной новости."""
     return reverse('news:detail', args=(news.id,))
 
 
+@pytest.fixture
+def news_comments_url(news):
+    """Фикстура для получения url порции комментариев новости."""
+    return reverse('news:comments', args=(news.id,))
+
+
 @pytest.fixture
 def news_edit_url(comment):
     """Фикстура для получения url изменения комментария."""
@@ -1,6 +1,15 @@
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
 from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import connection
 
+from news import cache
 from news.forms import CommentForm
+from news.models import News
 
 
 def test_news_count(client, news_home_url, news_set):
@@ -22,6 +31,180 @@ def test_news_order(client, news_home_url, news_set):
     assert all_dates == sorted_dates
 
 
+def test_news_next_page(client, news_home_url, news_set):
+    """Тест: По курсору следующей страницы выводятся оставшиеся новости,
+    а с неё можно вернуться на первую страницу.
+    """
+    first_page = client.get(news_home_url).context['page']
+    assert first_page.has_next
+    assert not first_page.has_previous
+    response = client.get(news_home_url, {'cursor': first_page.next_cursor})
+    second_page = response.context['page']
+    assert [news.title for news in second_page] == [
+        f'Новость {settings.NEWS_COUNT_ON_HOME_PAGE}'
+    ]
+    assert not second_page.has_next
+    response = client.get(
+        news_home_url, {'cursor': second_page.previous_cursor}
+    )
+    assert list(response.context['object_list']) == list(first_page)
+
+
+def test_home_items_cached(client, settings, news_home_url, news, comment):
+    """Тест: Карточки новостей берутся из кеша, пока новость
+    и её комментарии не меняются.
+    """
+    settings.DEBUG = True
+    response = client.get(news_home_url)
+    assert response['X-Fragment-Cache'] == 'hits=0, misses=1'
+    response = client.get(news_home_url)
+    assert response['X-Fragment-Cache'] == 'hits=1, misses=0'
+    comment.delete()
+    response = client.get(news_home_url)
+    assert response['X-Fragment-Cache'] == 'hits=0, misses=1'
+    assert 'Комментариев' not in response.content.decode()
+    news.title = 'Новый заголовок'
+    news.save()
+    response = client.get(news_home_url)
+    assert 'Новый заголовок' in response.content.decode()
+
+
+def test_versions_bumped_again_on_commit(
+        news, django_capture_on_commit_callbacks
+):
+    """Тест: Версия карточки меняется и при сохранении новости,
+    и после фиксации транзакции.
+    """
+    key = cache.VERSION_KEY.format(pk=news.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        news.save()
+        saved = django_cache.get(key)
+    assert saved is not None
+    assert django_cache.get(key) != saved
+
+
+def test_home_not_modified(client, news_home_url, news):
+    """Тест: Лента отдаёт 304 по ETag, пока новости не меняются."""
+    etag = client.get(news_home_url)['ETag']
+    response = client.get(news_home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    news.title = 'Новый заголовок'
+    news.save()
+    response = client.get(news_home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_home_revalidated_after_delete(client, news_home_url, news_set):
+    """Тест: Лента не отдаёт Last-Modified, поэтому после удаления
+    новости повторный запрос с If-Modified-Since получает новую ленту.
+    """
+    response = client.get(news_home_url)
+    assert 'Last-Modified' not in response
+    etag = response['ETag']
+    News.objects.first().delete()
+    response = client.get(
+        news_home_url,
+        HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT',
+    )
+    assert response.status_code == HTTPStatus.OK
+    response = client.get(news_home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_detail_not_modified(
+        client, author_client, news_detail_url, news, author
+):
+    """Тест: ETag страницы новости меняется вместе с комментариями
+    и различается для разных пользователей.
+    """
+    response = client.get(news_detail_url)
+    etag = response['ETag']
+    assert 'Last-Modified' in response
+    response = client.get(news_detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    response = author_client.get(news_detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert 'Last-Modified' not in response
+    news.comment_set.create(author=author, text='Новый комментарий')
+    response = client.get(news_detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_broken_cursor(client, news_home_url):
+    """Тест: Некорректный курсор страницы приводит к ошибке 404."""
+    response = client.get(news_home_url, {'cursor': 'не-курсор'})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_search_finds_news(client, news_search_url, news, news_set):
+    """Тест: Поиск находит новости по словам заголовка и текста,
+    подсвечивает найденное и видит правки и удаления новостей.
+    """
+    response = client.get(news_search_url, {'q': 'заголов*'})
+    assert list(response.context['results']) == [news]
+    response = client.get(news_search_url, {'q': 'Просто'})
+    results = response.context['results']
+    assert len(results) == settings.NEWS_COUNT_ON_HOME_PAGE
+    assert '<mark>Просто</mark>' in results.results[0].snippet
+    news.title = 'Сенсация'
+    news.save()
+    response = client.get(news_search_url, {'q': 'сенсация'})
+    assert list(response.context['results']) == [news]
+    news.delete()
+    response = client.get(news_search_url, {'q': 'сенсация'})
+    assert not response.context['results']
+
+
+def test_search_next_page(client, news_search_url, news_set):
+    """Тест: Результаты поиска листаются по курсору без повторов."""
+    response = client.get(news_search_url, {'q': 'новость'})
+    first_page = response.context['results']
+    assert first_page.has_next
+    response = client.get(
+        news_search_url, {'q': 'новость', 'cursor': first_page.next_cursor}
+    )
+    second_page = response.context['results']
+    assert not second_page.has_next
+    found = [news.pk for news in [*first_page, *second_page]]
+    assert sorted(found) == sorted(News.objects.values_list('pk', flat=True))
+
+
+def test_search_ranks_all_matches(client, news_search_url, news_set):
+    """Тест: Лучшее совпадение идёт первым, даже если это самая
+    старая из найденных новостей.
+    """
+    oldest = News.objects.order_by('date').first()
+    oldest.title = 'Просто'
+    oldest.save()
+    response = client.get(news_search_url, {'q': 'просто'})
+    assert response.context['results'].results[0] == oldest
+
+
+def test_search_without_fts(client, news_search_url, news_set):
+    """Тест: Без поддержки FTS5 поиск отдаёт пустую выдачу."""
+    with mock.patch('news.search.is_supported', return_value=False):
+        response = client.get(news_search_url, {'q': 'просто'})
+    assert response.status_code == HTTPStatus.OK
+    assert not response.context['results']
+
+
+def test_rebuild_search_index(client, news_search_url, news_set):
+    """Тест: Команда rebuild_search_index восстанавливает
+    потерянный поисковый индекс.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO news_news_fts(news_news_fts) VALUES ('delete-all')"
+        )
+    response = client.get(news_search_url, {'q': 'новость 3'})
+    assert not response.context['results']
+    call_command('rebuild_search_index', stdout=StringIO())
+    response = client.get(news_search_url, {'q': 'новость 3'})
+    assert [news.title for news in response.context['results']] == [
+        'Новость 3'
+    ]
+
+
 def test_comments_order(client, news_detail_url, news, comments_set):
     """Тест: Комментарии на странице отдельной новости отсортированы
     в хронологическом порядке: старые в начале списка, новые — в конце.
@@ -35,6 +218,28 @@ def test_comments_order(client, news_detail_url, news, comments_set):
     assert all_timestamps == sorted_timestamps
 
 
+def test_comments_paginated(
+        client, settings, news_detail_url, news_comments_url, comments_set
+):
+    """Тест: На странице новости выводится только первая порция
+    комментариев, а следующая отдаётся отдельным запросом.
+    """
+    settings.COMMENTS_COUNT_ON_PAGE = 4
+    response = client.get(news_detail_url)
+    first_page = response.context['comments']
+    assert [comment.text for comment in first_page] == [
+        f'Tекст {index}' for index in range(4)
+    ]
+    response = client.get(
+        news_comments_url, {'cursor': first_page.next_cursor}
+    )
+    assert 'news' not in response.context
+    second_page = response.context['comments']
+    assert [comment.text for comment in second_page] == [
+        f'Tекст {index}' for index in range(4, 8)
+    ]
+
+
 def test_anonymous_client_has_no_form(client, news_detail_url):
     """Тест: Анонимному пользователю недоступна форма для
     отправки комментария на странице отдельной новости.
@@ -1,9 +1,17 @@
+import json
 from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
 
+import pytest
+from django.core.management import call_command
+from django.db.models import Count
 from pytest_django.asserts import assertRedirects, assertFormError
 
 from news.forms import BAD_WORDS, WARNING
-from news.models import Comment
+from news.ingest import IngestError, iter_json_array
+from news.models import Comment, News
+from news.moderation import WordMatcher
 
 
 BAD_TEXT = f'Какой-то текст, {BAD_WORDS[0]}, еще текст'
@@ -43,6 +51,60 @@ def test_catch_bad_words(author_client, form_data, news_detail_url):
     assert Comment.objects.count() == 0
 
 
+def test_word_matcher_finds_overlapping_words():
+    """Тест: Автомат находит слова, в том числе вложенные друг в друга,
+    и не находит ничего в чистом тексте.
+    """
+    matcher = WordMatcher(('he', 'she', 'hers', 'Редиска'))
+    assert matcher.search('uSHErs') == 'she'
+    assert matcher.search('ah hers') == 'he'
+    assert matcher.search('вот РЕДИСКА!') == 'редиска'
+    assert matcher.search('ничего плохого') is None
+
+
+def test_bad_words_file_reloaded(
+        author_client, form_data, news_detail_url, settings, tmp_path
+):
+    """Тест: Слова из файла BAD_WORDS_FILE запрещены вместе со
+    встроенным списком, а правка файла подхватывается без перезапуска.
+    """
+    words_file = tmp_path / 'bad_words.txt'
+    words_file.write_text('# список модерации\nпрохвост\n', encoding='utf-8')
+    settings.BAD_WORDS_FILE = words_file
+    form_data['text'] = 'Сам ты плут'
+    response = author_client.post(news_detail_url, data=form_data)
+    assertRedirects(response, news_detail_url + '#comments')
+    words_file.write_text('прохвост\nплут\n', encoding='utf-8')
+    for text in ('Сам ты плут', 'Прохвост!', BAD_TEXT):
+        form_data['text'] = text
+        response = author_client.post(news_detail_url, data=form_data)
+        assertFormError(response, 'form', 'text', errors=WARNING)
+    assert Comment.objects.count() == 1
+
+
+def test_bad_words_file_missing_keeps_matcher(
+        author_client, form_data, news_detail_url, settings, tmp_path
+):
+    """Тест: Пока файл BAD_WORDS_FILE недоступен, комментарии
+    проверяются по последнему прочитанному списку.
+    """
+    words_file = tmp_path / 'bad_words.txt'
+    words_file.write_text('прохвост\n', encoding='utf-8')
+    settings.BAD_WORDS_FILE = words_file
+    form_data['text'] = 'Прохвост!'
+    response = author_client.post(news_detail_url, data=form_data)
+    assertFormError(response, 'form', 'text', errors=WARNING)
+    words_file.unlink()
+    response = author_client.post(news_detail_url, data=form_data)
+    assertFormError(response, 'form', 'text', errors=WARNING)
+    form_data['text'] = 'Обычный комментарий'
+    response = author_client.post(news_detail_url, data=form_data)
+    assertRedirects(response, news_detail_url + '#comments')
+    settings.BAD_WORDS_FILE = tmp_path / 'missing.txt'
+    with pytest.raises(OSError):
+        author_client.post(news_detail_url, data=form_data)
+
+
 def test_author_can_edit_comment(
         author_client, form_data, comment, news, author,
         news_edit_url, news_detail_url
@@ -86,3 +148,163 @@ def test_other_user_cant_delete_note(not_author_client, news_delete_url):
     response = not_author_client.post(news_delete_url)
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert Comment.objects.count() == 1
+
+
+def test_comment_count_follows_comments(
+        author_client, form_data, news, news_detail_url, news_delete_url
+):
+    """Тест: Счётчик комментариев новости растёт при создании
+    комментария и уменьшается при удалении.
+    """
+    news.refresh_from_db()
+    assert news.comment_count == 1
+    author_client.post(news_detail_url, data=form_data)
+    news.refresh_from_db()
+    assert news.comment_count == 2
+    author_client.post(news_delete_url)
+    news.refresh_from_db()
+    assert news.comment_count == 1
+
+
+def test_recount_comments_fixes_drift(news, comments_set):
+    """Тест: Команда recount_comments исправляет рассинхронизированный
+    счётчик комментариев.
+    """
+    News.objects.filter(pk=news.pk).update(comment_count=0)
+    out = StringIO()
+    call_command('recount_comments', stdout=out)
+    news.refresh_from_db()
+    assert news.comment_count == Comment.objects.filter(news=news).count()
+    assert 'Исправлено счётчиков комментариев: 1' in out.getvalue()
+
+
+def test_remoderate_hides_bad_comments(
+        author, news, comments_set, client, news_detail_url, tmp_path
+):
+    """Тест: Команда remoderate скрывает сохранённые комментарии
+    с запрещёнными словами, уменьшает счётчик и запоминает,
+    докуда дошла проверка.
+    """
+    bad_comment = Comment.objects.create(
+        news=news, author=author, text=BAD_TEXT
+    )
+    checkpoint = tmp_path / 'checkpoint'
+    call_command(
+        'remoderate', batch_size=3, checkpoint=checkpoint, stdout=StringIO()
+    )
+    bad_comment.refresh_from_db()
+    news.refresh_from_db()
+    assert bad_comment.is_hidden
+    assert news.comment_count == Comment.objects.filter(
+        is_hidden=False
+    ).count()
+    assert checkpoint.read_text() == str(bad_comment.pk)
+    response = client.get(news_detail_url)
+    assert bad_comment not in response.context['comments']
+
+
+def test_remoderate_resumes_from_checkpoint(author, news, tmp_path):
+    """Тест: Команда remoderate не перепроверяет комментарии
+    до сохранённой контрольной точки.
+    """
+    bad_comment = Comment.objects.create(
+        news=news, author=author, text=BAD_TEXT
+    )
+    checkpoint = tmp_path / 'checkpoint'
+    checkpoint.write_text(str(bad_comment.pk))
+    call_command('remoderate', checkpoint=checkpoint, stdout=StringIO())
+    bad_comment.refresh_from_db()
+    assert not bad_comment.is_hidden
+
+
+def test_remoderate_dry_run_keeps_checkpoint(author, news, tmp_path):
+    """Тест: Пробный запуск remoderate не пишет контрольную точку,
+    и настоящий запуск после него скрывает найденное.
+    """
+    bad_comment = Comment.objects.create(
+        news=news, author=author, text=BAD_TEXT
+    )
+    checkpoint = tmp_path / 'checkpoint'
+    call_command(
+        'remoderate', checkpoint=checkpoint, dry_run=True, stdout=StringIO()
+    )
+    assert not checkpoint.exists()
+    bad_comment.refresh_from_db()
+    assert not bad_comment.is_hidden
+    call_command('remoderate', checkpoint=checkpoint, stdout=StringIO())
+    bad_comment.refresh_from_db()
+    assert bad_comment.is_hidden
+
+
+FIXTURE = Path(__file__).resolve().parent.parent / 'fixtures/news.json'
+
+
+def test_loaddata_fills_modified():
+    """Тест: Фикстура новостей загружается через loaddata, а время
+    изменения новостей заполняется.
+    """
+    call_command('loaddata', str(FIXTURE), stdout=StringIO())
+    assert News.objects.exists()
+    assert not News.objects.filter(modified__isnull=True).exists()
+
+
+def test_ingest_after_loaddata_skips_loaded_news():
+    """Тест: Новости, загруженные через loaddata, получают хеш,
+    и ingest_news той же фикстуры не создаёт дублей.
+    """
+    call_command('loaddata', str(FIXTURE), stdout=StringIO())
+    total = News.objects.count()
+    assert not News.objects.filter(content_hash='').exists()
+    out = StringIO()
+    call_command('ingest_news', str(FIXTURE), stdout=out)
+    assert News.objects.count() == total
+    assert f'дублей {total}' in out.getvalue()
+
+
+def test_ingest_news_skips_duplicates(news, tmp_path):
+    """Тест: Команда ingest_news загружает фикстуру и JSON Lines
+    порциями и пропускает уже загруженные новости.
+    """
+    out = StringIO()
+    call_command('ingest_news', str(FIXTURE), batch_size=2, stdout=out)
+    total = News.objects.count()
+    assert total > 1
+    assert 'дублей 0' in out.getvalue()
+    news.refresh_from_db()
+    lines = tmp_path / 'news.jsonl'
+    lines.write_text('\n'.join(json.dumps(record) for record in (
+        {'title': news.title, 'text': 'Другой текст',
+         'date': news.date.isoformat()},
+        {'title': 'Свежая новость', 'text': 'Текст', 'date': '2022-11-02'},
+        {'title': 'Свежая новость', 'text': 'Текст', 'date': '2022-11-02'},
+        {'title': 'Без даты', 'text': 'Текст'},
+    )), encoding='utf-8')
+    out = StringIO()
+    call_command('ingest_news', str(lines), stdout=out)
+    assert News.objects.count() == total + 1
+    assert 'дублей 2, пропущено некорректных 1' in out.getvalue()
+
+
+def test_iter_json_array_reads_by_chunks():
+    """Тест: Фикстура разбирается кусками по элементу за раз."""
+    items = [{'fields': {'text': 'Текст ' * index}} for index in range(20)]
+    file = StringIO(json.dumps(items, indent=2))
+    assert list(iter_json_array(file, chunk_size=16)) == items
+    with pytest.raises(IngestError):
+        list(iter_json_array(StringIO('[{"a": 1},'), chunk_size=4))
+
+
+def test_seed_precomputes_comment_count():
+    """Тест: Команда seed создаёт комментарии со смещённым
+    распределением и сразу верными счётчиками.
+    """
+    call_command(
+        'seed', users=5, news=20, comments=200, batch_size=7,
+        stdout=StringIO(),
+    )
+    assert Comment.objects.count() == 200
+    counts = sorted(News.objects.values_list('comment_count', flat=True))
+    assert sum(counts) == 200
+    assert counts[-1] > 200 / 20 * 3
+    for news in News.objects.annotate(actual=Count('comment')):
+        assert news.comment_count == news.actual
@@ -0,0 +1,35 @@
+from http import HTTPStatus
+
+import pytest
+
+
+@pytest.mark.usefixtures('comments_set')
+def test_news_detail_speed(author_client, news_detail_url, benchmark):
+    """Тест: Страница новости с комментариями и формой не медленнее
+    базового замера.
+    """
+    def get_detail():
+        response = author_client.get(news_detail_url)
+        assert response.status_code == HTTPStatus.OK
+
+    benchmark('NewsDetail', get_detail)
+
+
+@pytest.mark.usefixtures('news_set')
+def test_news_list_speed(client, news_home_url, benchmark):
+    """Тест: Лента новостей не медленнее базового замера."""
+    def get_home():
+        response = client.get(news_home_url)
+        assert response.status_code == HTTPStatus.OK
+
+    benchmark('NewsList', get_home)
+
+
+@pytest.mark.usefixtures('comments_set')
+def test_news_comments_speed(client, news_comments_url, benchmark):
+    """Тест: Порция комментариев не медленнее базового замера."""
+    def get_comments():
+        response = client.get(news_comments_url)
+        assert response.status_code == HTTPStatus.OK
+
+    benchmark('NewsComments', get_comments)
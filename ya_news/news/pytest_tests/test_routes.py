@@ -1,14 +1,31 @@
+import json
+import os
+import pstats
+import subprocess
+import sys
+import threading
 from http import HTTPStatus
+from unittest import mock
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
 from pytest_django.asserts import assertRedirects
 
+from yanews import memory, profiling
+from yanews.middleware import (
+    MemoryBudgetExceeded, MemoryMiddleware, QueryBudgetExceeded,
+)
+
 
 NEWS_HOME_URL = pytest.lazy_fixture('news_home_url')
+NEWS_SEARCH_URL = pytest.lazy_fixture('news_search_url')
 USERS_LOGIN_URL = pytest.lazy_fixture('users_login_url')
 USERS_SIGNUP_URL = pytest.lazy_fixture('users_signup_url')
 USERS_LOGOUT_URL = pytest.lazy_fixture('users_logout_url')
 NEWS_DETAIL_URL = pytest.lazy_fixture('news_detail_url')
+NEWS_COMMENTS_URL = pytest.lazy_fixture('news_comments_url')
 NEWS_EDIT_URL = pytest.lazy_fixture('news_edit_url')
 NEWS_DELETE_URL = pytest.lazy_fixture('news_delete_url')
 CLIENT = pytest.lazy_fixture('client')
@@ -20,7 +37,9 @@ NOT_AUTHOR_CLIENT = pytest.lazy_fixture('not_author_client')
     'url, parametrized_client, status',
     (
         (NEWS_HOME_URL, CLIENT, HTTPStatus.OK),
+        (NEWS_SEARCH_URL, CLIENT, HTTPStatus.OK),
         (NEWS_DETAIL_URL, CLIENT, HTTPStatus.OK),
+        (NEWS_COMMENTS_URL, CLIENT, HTTPStatus.OK),
         (USERS_SIGNUP_URL, CLIENT, HTTPStatus.OK),
         (USERS_LOGIN_URL, CLIENT, HTTPStatus.OK),
         (USERS_LOGOUT_URL, CLIENT, HTTPStatus.OK),
@@ -61,3 +80,193 @@ def test_redirects(client, url, users_login_url):
     expected_url = f'{users_login_url}?next={url}'
     response = client.get(url)
     assertRedirects(response, expected_url)
+
+
+def test_query_budget_exceeded(client, settings, news_home_url):
+    """Тест: Превышение бюджета SQL-запросов страницы
+    приводит к ошибке в тестах.
+    """
+    settings.QUERY_BUDGETS = {'news:home': 0}
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(news_home_url)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures('comment')
+def test_server_timing_header(client, settings, news_detail_url):
+    """Тест: Ответ содержит разбивку времени по БД, представлению
+    и шаблону как под WSGI, так и под ASGI; при нулевой доле замеров
+    заголовка нет.
+    """
+    settings.SERVER_TIMING_SAMPLE_RATE = 1.0
+    response = client.get(news_detail_url)
+    timing = response['Server-Timing']
+    for metric in ('db;dur=', 'view;dur=', 'tpl;dur=', 'total;dur='):
+        assert metric in timing
+
+    async def get_detail():
+        return await AsyncClient().get(news_detail_url)
+
+    response = async_to_sync(get_detail)()
+    assert response.status_code == HTTPStatus.OK
+    assert 'tpl;dur=' in response['Server-Timing']
+    settings.SERVER_TIMING_SAMPLE_RATE = 0
+    assert 'Server-Timing' not in client.get(news_detail_url)
+
+
+def test_profiler_dumps_view_profiles(
+        client, settings, tmp_path, news_detail_url
+):
+    """Тест: Запрос с заголовком профилирования попадает в профиль
+    своего представления в формате pstats и свёрнутых стеков.
+    """
+    settings.PROFILER_DIR = tmp_path
+    settings.PROFILER_DUMP_INTERVAL = 0
+    settings.PROFILER_TOKEN = 'секрет'
+    client.get(news_detail_url, HTTP_X_PROFILE='не тот')
+    assert not list(tmp_path.iterdir())
+    client.get(news_detail_url, HTTP_X_PROFILE='секрет')
+    pid = os.getpid()
+    stats = pstats.Stats(str(tmp_path / f'news.detail.{pid}.prof'))
+    assert any(
+        name == 'get_object' for _, _, name in stats.stats
+    )
+    collapsed = (tmp_path / f'news.detail.{pid}.collapsed').read_text()
+    assert 'views.py' in collapsed
+    assert all(
+        line.rsplit(' ', 1)[1].isdigit() for line in collapsed.splitlines()
+    )
+
+
+def test_profiler_flushes_at_exit(
+        client, settings, tmp_path, news_detail_url
+):
+    """Тест: Профиль, не дождавшийся периодической выгрузки,
+    выгружается при выходе процесса.
+    """
+    settings.PROFILER_DIR = tmp_path
+    settings.PROFILER_DUMP_INTERVAL = 3600
+    settings.PROFILER_TOKEN = 'секрет'
+    client.get(news_detail_url, HTTP_X_PROFILE='секрет')
+    prof = tmp_path / f'news.detail.{os.getpid()}.prof'
+    assert not prof.exists()
+    profiling.store.flush()
+    assert pstats.Stats(str(prof)).total_calls
+
+
+def test_memory_report_and_budget(
+        client, settings, tmp_path, news_detail_url
+):
+    """Тест: Отслеженный запрос попадает в отчёт о памяти, а превышение
+    бюджета памяти вызывает исключение.
+    """
+    settings.MEMORY_SAMPLE_RATE = 1
+    settings.MEMORY_REPORT_DIR = tmp_path
+    settings.MEMORY_DUMP_INTERVAL = 0
+    assert client.get(news_detail_url).status_code == HTTPStatus.OK
+    report = json.loads(
+        (tmp_path / f'memory.{os.getpid()}.json').read_text()
+    )
+    assert report['news:detail']['peak_max_bytes'] > 0
+    assert report['news:detail']['top_sites']
+    settings.MEMORY_BUDGETS = {'news:detail': 1}
+    settings.MEMORY_BUDGET_RAISE = True
+    with pytest.raises(MemoryBudgetExceeded):
+        client.get(news_detail_url)
+
+
+def test_memory_skips_requests_during_other_trace(
+        client, settings, tmp_path, news_detail_url
+):
+    """Тест: Запрос, пришедший во время замера другого запроса,
+    не отслеживается и не трогает его трассировку.
+    """
+    settings.MEMORY_SAMPLE_RATE = 1
+    settings.MEMORY_REPORT_DIR = tmp_path
+    with MemoryMiddleware._lock:
+        assert client.get(news_detail_url).status_code == HTTPStatus.OK
+    assert not (tmp_path / f'memory.{os.getpid()}.json').exists()
+
+
+def test_memory_dump_failure_keeps_response(
+        client, settings, tmp_path, news_detail_url
+):
+    """Тест: Ошибка записи отчёта о памяти не ломает ответ,
+    а одновременные выгрузки из разных потоков не мешают друг другу.
+    """
+    settings.MEMORY_SAMPLE_RATE = 1
+    settings.MEMORY_DUMP_INTERVAL = 0
+    settings.MEMORY_REPORT_DIR = tmp_path
+    with mock.patch.object(memory.store, 'dump', side_effect=OSError):
+        assert client.get(news_detail_url).status_code == HTTPStatus.OK
+    report = {'news:detail': {'requests': 1}}
+    threads = [
+        threading.Thread(
+            target=lambda: [
+                memory.store.dump(tmp_path, report) for _ in range(50)
+            ]
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert json.loads(
+        (tmp_path / f'memory.{os.getpid()}.json').read_text()
+    ) == report
+
+
+def metric_values(client):
+    response = client.get(reverse('metrics'))
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    return dict(
+        line.rsplit(' ', 1)
+        for line in response.content.decode().splitlines()
+        if not line.startswith('#')
+    )
+
+
+def test_metrics_endpoint(
+        client, author_client, settings, tmp_path, news_home_url,
+        news_detail_url
+):
+    """Тест: /metrics складывает метрики своего процесса и файлы других
+    живых процессов, файлы завершившихся удаляет, а посторонние
+    файлы пропускает.
+    """
+    settings.METRICS_DIR = tmp_path
+    before = metric_values(client)
+    client.get(news_home_url)
+    client.get(news_home_url)
+    author_client.post(news_detail_url, data={'text': 'редиска'})
+    other = {'counters': [[
+        'comments_written_total', [['action', 'created']], 5
+    ]], 'histograms': []}
+    (tmp_path / f'metrics.{os.getppid()}.json').write_text(json.dumps(other))
+    finished = subprocess.Popen([sys.executable, '-c', ''])
+    finished.wait()
+    dead = tmp_path / f'metrics.{finished.pid}.json'
+    dead.write_text(json.dumps(other))
+    stray = tmp_path / 'metrics.backup.json'
+    stray.write_text('{}')
+    after = metric_values(client)
+    assert not dead.exists()
+    assert stray.exists()
+
+    def delta(key):
+        return float(after.get(key, 0)) - float(before.get(key, 0))
+
+    assert delta('comments_written_total{action="created"}') == 5
+    assert delta(
+        'form_validation_failures_total'
+        '{form="CommentForm",reason="bad_words"}'
+    ) == 1
+    assert delta(
+        'http_request_duration_seconds_count'
+        '{status="200",view="news:home"}'
+    ) == 2
+    assert delta('http_request_queries_count{view="news:home"}') == 2
+    assert 0 < float(after['cache_hit_ratio{cache="news_fragments"}']) < 1
+    settings.METRICS_TOKEN = 'секрет'
+    assert client.get(reverse('metrics')).status_code == HTTPStatus.FORBIDDEN
@@ -0,0 +1,213 @@
+"""
+Полнотекстовый поиск по новостям на SQLite FTS5.
+
+Индекс news_news_fts — external content таблица поверх news_news:
+сам текст в индексе не дублируется, а синхронизацию выполняют
+триггеры, поэтому в индекс попадают и записи из bulk_create.
+Сама таблица создаётся миграцией, а триггеры ставятся после каждой
+миграции: SQLite пересоздаёт news_news при изменении схемы, и
+триггеры старой таблицы при этом удаляются.
+"""
+import re
+
+from django.db import connection
+from django.http import Http404
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import News
+from .pagination import pack_cursor, unpack_cursor
+
+INDEX_TABLE = 'news_news_fts'
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+SNIPPET_WORDS = 24
+
+TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_insert
+    AFTER INSERT ON news_news BEGIN
+        INSERT INTO {INDEX_TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_delete
+    AFTER DELETE ON news_news BEGIN
+        INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_update
+    AFTER UPDATE OF title, text ON news_news BEGIN
+        INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO {INDEX_TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+)
+
+# bm25 считается для всех совпадений запроса: иначе старая новость
+# не нашлась бы, даже если она лучше всех подходит к запросу. Цена
+# запроса по частому слову поэтому растёт вместе с архивом.
+SEARCH_SQL = f"""
+    SELECT id, score FROM (
+        SELECT
+            rowid AS id,
+            bm25({INDEX_TABLE}, {TITLE_WEIGHT}, {TEXT_WEIGHT}) AS score
+        FROM {INDEX_TABLE}
+        WHERE {INDEX_TABLE} MATCH %s
+    )
+    WHERE score > %s OR (score = %s AND id > %s)
+    ORDER BY score, id
+    LIMIT %s
+"""
+
+
+def is_supported(using_connection=connection):
+    return using_connection.vendor == 'sqlite'
+
+
+def install_triggers(using_connection=connection):
+    """Ставит триггеры синхронизации индекса, если их ещё нет."""
+    if not is_supported(using_connection):
+        return
+    with using_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [INDEX_TABLE],
+        )
+        if cursor.fetchone() is None:
+            return
+        for sql in TRIGGERS:
+            cursor.execute(sql)
+
+
+def rebuild_index(optimize=False):
+    """Перестраивает индекс по текущему содержимому news_news."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('rebuild')"
+        )
+        if optimize:
+            cursor.execute(
+                f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) "
+                "VALUES ('optimize')"
+            )
+
+
+def parse_query(query):
+    """
+    Слова запроса и запрос FTS5 для них.
+
+    Каждое слово берётся в кавычки, чтобы операторы FTS5 в тексте
+    запроса не ломали его; все слова должны встретиться. Слово со
+    звёздочкой на конце ищется как префикс: «новост*» найдёт и
+    «новости», и «новостей». Префиксный поиск дороже, поэтому
+    по умолчанию слова ищутся целиком.
+    """
+    terms = re.findall(r'\w+\*?', query.lower())
+    match = ' '.join(
+        f'"{term.rstrip("*")}"' + ('*' if term.endswith('*') else '')
+        for term in terms
+    )
+    return terms, match
+
+
+def is_term(word, terms):
+    word = word.lower()
+    return any(
+        word.startswith(term[:-1]) if term.endswith('*') else word == term
+        for term in terms
+    )
+
+
+def make_snippet(text, terms, size=SNIPPET_WORDS):
+    """
+    Фрагмент текста вокруг первого найденного слова.
+
+    Фрагмент собирается в Python для уже загруженной страницы
+    результатов: snippet() FTS5 по external content таблице
+    перебирает все совпадения запроса и на больших архивах дорог.
+    """
+    words = list(re.finditer(r'\w+', text))
+    first = next(
+        (index for index, word in enumerate(words)
+         if is_term(word.group(), terms)),
+        0,
+    )
+    start = max(first - size // 4, 0)
+    window = words[start:start + size]
+    if not window:
+        return ''
+    parts = ['…'] if start else []
+    position = window[0].start()
+    for word in window:
+        parts.append(escape(text[position:word.start()]))
+        if is_term(word.group(), terms):
+            parts.append(f'<mark>{escape(word.group())}</mark>')
+        else:
+            parts.append(escape(word.group()))
+        position = word.end()
+    if start + size < len(words):
+        parts.append('…')
+    return mark_safe(''.join(parts))
+
+
+class SearchResults:
+    """
+    Страница результатов поиска, упорядоченных по bm25.
+
+    Переход на следующую страницу идёт по курсору (score, id) последнего
+    результата, поэтому глубокие страницы не требуют OFFSET. Без FTS5
+    (не SQLite) выдача пуста.
+    """
+
+    def __init__(self, query, per_page, cursor=None):
+        self.query = query
+        self.per_page = per_page
+        self.results = []
+        self.next_cursor = None
+        self.terms, match = parse_query(query)
+        if match and is_supported():
+            self._fetch(match, self._after(cursor))
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @staticmethod
+    def _after(cursor):
+        if not cursor:
+            return float('-inf'), 0
+        try:
+            score, pk = unpack_cursor(cursor)
+            return float(score), int(pk)
+        except (ValueError, TypeError):
+            raise Http404('Некорректный курсор страницы.')
+
+    def _fetch(self, match, after):
+        score, pk = after
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SEARCH_SQL, [match, score, score, pk, self.per_page + 1]
+            )
+            rows = cursor.fetchall()
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            last_pk, last_score = rows[-1]
+            self.next_cursor = pack_cursor([last_score, last_pk])
+        ids = [row[0] for row in rows]
+        news = News.objects.in_bulk(ids)
+        for pk in ids:
+            if pk in news:
+                news[pk].snippet = make_snippet(news[pk].text, self.terms)
+                self.results.append(news[pk])
@@ -0,0 +1,72 @@
+from django.db import connections
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_versions
+from .models import Comment, News
+from .search import install_triggers
+
+
+def touch_news(news_id, delta=0):
+    """
+    Отмечает изменение комментариев новости одним UPDATE.
+
+    Сдвигает счётчик комментариев на delta и обновляет время
+    изменения, по которому строятся ETag и Last-Modified.
+    """
+    News.objects.filter(pk=news_id).update(
+        comment_count=Greatest(F('comment_count') + delta, 0),
+        modified=timezone.now(),
+    )
+
+
+@receiver(pre_save, sender=News)
+def fill_content_hash(sender, instance, **kwargs):
+    """
+    Хеш для отсева дублей при загрузке считается при любом сохранении.
+
+    В том числе при сыром сохранении loaddata, которое обходит
+    News.save(); bulk_create сигналов не шлёт, поэтому ingest
+    заполняет хеш сам.
+    """
+    instance.content_hash = News.make_content_hash(
+        instance.title, instance.date
+    )
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def news_changed(sender, instance, **kwargs):
+    bump_versions([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """Учитываем только видимые комментарии."""
+    if kwargs.get('raw'):
+        return
+    loaded_is_hidden = getattr(instance, 'loaded_is_hidden', None)
+    delta = 0
+    if created and not instance.is_hidden:
+        delta = 1
+    elif loaded_is_hidden is not None and (
+            loaded_is_hidden != instance.is_hidden
+    ):
+        delta = -1 if instance.is_hidden else 1
+    touch_news(instance.news_id, delta)
+    instance.loaded_is_hidden = instance.is_hidden
+    bump_versions([instance.news_id])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    touch_news(instance.news_id, 0 if instance.is_hidden else -1)
+    bump_versions([instance.news_id])
+
+
+def install_search_triggers(sender, using, **kwargs):
+    """Возвращает триггеры поискового индекса после миграций."""
+    install_triggers(connections[using])
@@ -1,13 +1,19 @@
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
 
+from .cache import render_news_items
+from .conditional import detail_condition, feed_condition
 from .forms import CommentForm
 from .models import Comment, News
+from .pagination import KeysetPaginator
+from .search import SearchResults
 
 
+@method_decorator(feed_condition, name='get')
 class NewsList(generic.ListView):
     """Список новостей."""
     model = News
@@ -15,25 +21,80 @@ class NewsList(generic.ListView):
 
     def get_queryset(self):
         """
-        Выводим только несколько последних новостей.
+        Выводим страницу ленты новостей, начиная с самых свежих.
 
-        Их количество определяется в настройках проекта.
+        Размер страницы определяется в настройках проекта, а переход
+        между страницами идёт по курсору из параметра cursor.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        paginator = KeysetPaginator(
+            self.model.objects.all(),
+            self.model._meta.ordering,
+            settings.NEWS_COUNT_ON_HOME_PAGE,
+        )
+        self.page = paginator.page(self.request.GET.get('cursor'))
+        return self.page.object_list
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page'] = self.page
+        context['items'], *self.fragment_cache = render_news_items(
+            context['object_list']
+        )
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        if settings.DEBUG:
+            hits, misses = self.fragment_cache
+            response['X-Fragment-Cache'] = f'hits={hits}, misses={misses}'
+        return response
+
+
+class CommentsPageMixin:
+    """Страница комментариев к новости, выбранная по курсору."""
+
+    def get_comments_page(self, news_pk):
+        paginator = KeysetPaginator(
+            Comment.objects.filter(
+                news_id=news_pk, is_hidden=False
+            ).select_related('author'),
+            Comment._meta.ordering,
+            settings.COMMENTS_COUNT_ON_PAGE,
+        )
+        return paginator.page(self.request.GET.get('cursor'))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments'] = self.get_comments_page(self.object.pk)
+        return context
 
 
-class NewsDetail(generic.DetailView):
+class NewsSearch(generic.TemplateView):
+    """Поиск по заголовкам и текстам новостей."""
+    template_name = 'news/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        context['query'] = query
+        context['results'] = SearchResults(
+            query,
+            settings.NEWS_COUNT_ON_HOME_PAGE,
+            self.request.GET.get('cursor'),
+        )
+        return context
+
+
+class NewsDetail(CommentsPageMixin, generic.DetailView):
     model = News
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
-        return obj
+        """Новость, уже прочитанная при проверке ETag, не грузим снова."""
+        news = getattr(self.request, 'news', None)
+        if news is not None and queryset is None:
+            return news
+        return super().get_object(queryset)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -42,8 +103,22 @@ class NewsDetail(generic.DetailView):
         return context
 
 
+class NewsComments(CommentsPageMixin, generic.TemplateView):
+    """Очередная порция комментариев к новости без остальной страницы."""
+    template_name = 'news/includes/comments.html'
+
+    def get_context_data(self, **kwargs):
+        comments = self.get_comments_page(self.kwargs['pk'])
+        if not comments.first and not News.objects.filter(
+                pk=self.kwargs['pk']
+        ).exists():
+            raise Http404('Новость не найдена.')
+        return {'comments': comments, 'news_pk': self.kwargs['pk']}
+
+
 class NewsComment(
         LoginRequiredMixin,
+        CommentsPageMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -63,19 +138,21 @@ class NewsComment(
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
 
 
 class NewsDetailView(generic.View):
+    detail_view = staticmethod(NewsDetail.as_view())
+    comment_view = staticmethod(NewsComment.as_view())
 
+    @method_decorator(detail_condition)
     def get(self, request, *args, **kwargs):
-        view = NewsDetail.as_view()
-        return view(request, *args, **kwargs)
+        return self.detail_view(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
-        view = NewsComment.as_view()
-        return view(request, *args, **kwargs)
+        return self.comment_view(request, *args, **kwargs)
 
 
 class CommentBase(LoginRequiredMixin):
@@ -83,14 +160,15 @@ class CommentBase(LoginRequiredMixin):
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
         """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        return self.model.objects.filter(
+            author=self.request.user
+        ).select_related('news')
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
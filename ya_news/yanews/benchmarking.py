@@ -0,0 +1,130 @@
+"""
+Замеры времени в тестах и сравнение с сохранённым базовым замером.
+
+Время каждого замера делится на время калибровочной нагрузки,
+измеренной на той же машине, поэтому базовый файл, записанный
+на одном компьютере, пригоден для проверки на другом.
+
+Переменные окружения:
+BENCHMARK_TOLERANCE — допустимое замедление в долях (0.5 — на 50 %);
+BENCHMARK_UPDATE — если задана, результаты записываются в базовый
+файл вместо сравнения.
+"""
+import json
+import os
+import statistics
+import time
+from functools import lru_cache
+
+TOLERANCE_ENV = 'BENCHMARK_TOLERANCE'
+UPDATE_ENV = 'BENCHMARK_UPDATE'
+DEFAULT_TOLERANCE = 0.5
+
+
+def calibration_workload():
+    total = 0
+    for number in range(200_000):
+        total += number * number % 7
+    return total
+
+
+def run_timed(func, warmup=3, min_runs=10, max_runs=200, max_seconds=2.0):
+    """
+    Время вызовов func в миллисекундах после разогрева.
+
+    Повторы идут, пока межквартильный размах не станет меньше 5 %
+    медианы, но не меньше min_runs и не дольше max_seconds.
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    deadline = time.perf_counter() + max_seconds
+    while len(timings) < max_runs:
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+        if len(timings) < min_runs:
+            continue
+        low, _, high = statistics.quantiles(timings, n=4)
+        if high - low < statistics.median(timings) * 0.05:
+            break
+        if time.perf_counter() > deadline:
+            break
+    return timings
+
+
+@lru_cache(maxsize=None)
+def calibration_ms():
+    """Медиана калибровочной нагрузки; считается один раз за прогон."""
+    return statistics.median(run_timed(calibration_workload, min_runs=5))
+
+
+class Timing:
+    """Результат замера: медиана, квартили и число повторов."""
+
+    def __init__(self, name, timings):
+        self.name = name
+        self.runs = len(timings)
+        self.median = statistics.median(timings)
+        if len(timings) > 1:
+            self.low, _, self.high = statistics.quantiles(timings, n=4)
+        else:
+            self.low = self.high = self.median
+
+    @property
+    def relative(self):
+        return self.median / calibration_ms()
+
+    def __str__(self):
+        return (
+            f'{self.name}: {self.median:.2f} мс '
+            f'(квартили {self.low:.2f}–{self.high:.2f} мс, '
+            f'{self.runs} повторов)'
+        )
+
+
+class Baseline:
+    """Файл с базовыми замерами в единицах калибровочной нагрузки."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tolerance = float(
+            os.environ.get(TOLERANCE_ENV, DEFAULT_TOLERANCE)
+        )
+        self.update = bool(os.environ.get(UPDATE_ENV))
+
+    def load(self):
+        if not self.path.exists():
+            return {}
+        return json.loads(self.path.read_text(encoding='utf-8'))
+
+    def record(self, timing):
+        data = self.load()
+        data[timing.name] = round(timing.relative, 4)
+        self.path.write_text(
+            json.dumps(data, indent=2, sort_keys=True) + '\n',
+            encoding='utf-8',
+        )
+
+    def check(self, timing):
+        """
+        Сообщение о регрессии или None.
+
+        В режиме обновления замер записывается в файл и не проверяется.
+        """
+        if self.update:
+            self.record(timing)
+            return None
+        expected = self.load().get(timing.name)
+        if expected is None:
+            return None
+        change = timing.relative / expected - 1
+        if change <= self.tolerance:
+            return None
+        expected_ms = expected * calibration_ms()
+        return (
+            f'{timing}\nбазовый замер: {expected_ms:.2f} мс, '
+            f'замедление {change:+.0%} при допуске {self.tolerance:.0%}. '
+            f'Если замедление ожидаемо, обновите базовый файл: '
+            f'{UPDATE_ENV}=1 pytest'
+        )
@@ -0,0 +1,307 @@
+"""
+Метрики процесса в текстовом формате Prometheus.
+
+Каждый процесс копит счётчики и гистограммы в памяти и не чаще раза
+в settings.METRICS_FLUSH_INTERVAL секунд пишет их в каталог
+settings.METRICS_DIR файлом metrics.<pid>.json. Страница /metrics
+складывает свои данные с файлами остальных живых процессов, поэтому
+метрики всех воркеров видны с любого из них без внешних сервисов.
+Файлы завершившихся процессов удаляются: их счётчики пропадают,
+и Prometheus считает это сбросом счётчика.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from news.cache import fragments_fetched
+from news.forms import comment_rejected
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# Имя метрики: тип, описание и границы корзин гистограммы.
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса.', LATENCY_BUCKETS
+    ),
+    'http_request_queries': (
+        'histogram', 'SQL-запросов на один запрос.', QUERY_BUCKETS
+    ),
+    'cache_requests_total': (
+        'counter', 'Обращения к кешу по результату.', None
+    ),
+    'comments_written_total': (
+        'counter', 'Записи комментариев по действию.', None
+    ),
+    'form_validation_failures_total': (
+        'counter', 'Отклонённые формы по причине.', None
+    ),
+}
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', r'\\')
+        .replace('"', r'\"').replace('\n', r'\n')
+    )
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+    return f'{{{pairs}}}'
+
+
+def format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsStore:
+    """
+    Счётчики и гистограммы процесса.
+
+    Запись идёт под блокировкой процесса, которая держится лишь
+    на время сложения; между процессами блокировок нет — каждый пишет
+    только свой файл. После fork дочерний процесс начинает с нуля,
+    чтобы не учесть данные родителя дважды.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {}
+        self._histograms = {}
+        self._flushed = time.monotonic()
+
+    def inc(self, name, labels, value=1):
+        key = (name, label_key(labels))
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            self._counters[key] = self._counters.get(key, 0) + value
+        self.maybe_flush()
+
+    def observe(self, name, labels, value):
+        """Значение в гистограмму; последняя корзина — +Inf, затем сумма."""
+        buckets = METRICS[name][2]
+        key = (name, label_key(labels))
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            row = self._histograms.get(key)
+            if row is None:
+                row = self._histograms[key] = [0] * (len(buckets) + 2)
+            row[bisect_left(buckets, value)] += 1
+            row[-1] += value
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [
+                    [name, labels, value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                'histograms': [
+                    [name, labels, list(row)]
+                    for (name, labels), row in self._histograms.items()
+                ],
+            }
+
+    def maybe_flush(self):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if not directory or time.monotonic() - self._flushed < interval:
+            return
+        self._flushed = time.monotonic()
+        self.flush(directory)
+
+    def flush(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'metrics.{os.getpid()}.json'
+        temporary = path.with_name(
+            f'.{path.name}.{threading.get_ident()}.tmp'
+        )
+        temporary.write_text(json.dumps(self.snapshot()), encoding='utf-8')
+        os.replace(temporary, path)
+
+    def snapshots(self):
+        """Свои данные и файлы остальных живых процессов."""
+        yield self.snapshot()
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory or not Path(directory).is_dir():
+            return
+        for path in Path(directory).glob('metrics.*.json'):
+            try:
+                pid = int(path.stem.split('.', 1)[1])
+            except ValueError:
+                # Чужой файл в каталоге метрик, а не файл процесса.
+                continue
+            if pid == os.getpid():
+                continue
+            if not is_alive(pid):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                yield json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+
+    def collect(self):
+        counters = {}
+        histograms = {}
+        for snapshot in self.snapshots():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, row in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0] * len(row))
+                for index, value in enumerate(row):
+                    total[index] += value
+        return counters, histograms
+
+    def render(self):
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, description, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(
+                        f'{name}{format_labels(labels)} '
+                        f'{format_value(value)}'
+                    )
+            for (metric, labels), row in sorted(histograms.items()):
+                if metric == name:
+                    lines.extend(histogram_lines(name, labels, buckets, row))
+        lines.extend(hit_ratio_lines(counters))
+        return '\n'.join(lines) + '\n'
+
+
+def histogram_lines(name, labels, buckets, row):
+    bounds = [format_value(bound) for bound in buckets] + ['+Inf']
+    cumulative = 0
+    for bound, count in zip(bounds, row):
+        cumulative += count
+        bucket_labels = (*labels, ('le', bound))
+        yield f'{name}_bucket{format_labels(bucket_labels)} {cumulative}'
+    yield f'{name}_sum{format_labels(labels)} {format_value(row[-1])}'
+    yield f'{name}_count{format_labels(labels)} {cumulative}'
+
+
+def hit_ratio_lines(counters):
+    """Доля попаданий по каждому кешу из cache_requests_total."""
+    results = {}
+    for (name, labels), value in counters.items():
+        if name != 'cache_requests_total':
+            continue
+        labels = dict(labels)
+        row = results.setdefault(labels['cache'], {'hit': 0, 'miss': 0})
+        row[labels['result']] += value
+    yield '# HELP cache_hit_ratio Доля попаданий в кеш с запуска процессов.'
+    yield '# TYPE cache_hit_ratio gauge'
+    for cache, row in sorted(results.items()):
+        requests = row['hit'] + row['miss']
+        ratio = row['hit'] / requests if requests else 0
+        yield (
+            f'cache_hit_ratio{format_labels((("cache", cache),))} '
+            f'{format_value(round(ratio, 6))}'
+        )
+
+
+store = MetricsStore()
+
+
+def metrics_view(request):
+    """
+    Метрики всех процессов в формате Prometheus.
+
+    Если задан settings.METRICS_TOKEN, страница отдаётся только
+    с заголовком Authorization: Bearer <токен>.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and not constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(store.render(), content_type=CONTENT_TYPE)
+
+
+def comment_saved(sender, created, **kwargs):
+    if not kwargs.get('raw'):
+        action = 'created' if created else 'updated'
+        store.inc('comments_written_total', {'action': action})
+
+
+def comment_deleted(sender, **kwargs):
+    store.inc('comments_written_total', {'action': 'deleted'})
+
+
+def fragments_counted(sender, hits, misses, **kwargs):
+    labels = {'cache': 'news_fragments'}
+    store.inc('cache_requests_total', {**labels, 'result': 'hit'}, hits)
+    store.inc('cache_requests_total', {**labels, 'result': 'miss'}, misses)
+
+
+def comment_form_rejected(sender, reason, **kwargs):
+    store.inc(
+        'form_validation_failures_total',
+        {'form': sender.__name__, 'reason': reason},
+    )
+
+
+def connect_signals():
+    """
+    Подключает счётчики к сигналам приложения.
+
+    Вызывается из MetricsConfig.ready(), поэтому записи считаются и в
+    командах управления, а не только после загрузки URLconf.
+    """
+    post_save.connect(
+        comment_saved,
+        sender='news.Comment',
+        dispatch_uid='metrics-comment-save',
+    )
+    post_delete.connect(
+        comment_deleted,
+        sender='news.Comment',
+        dispatch_uid='metrics-comment-delete',
+    )
+    fragments_fetched.connect(fragments_counted, dispatch_uid='metrics-cache')
+    comment_rejected.connect(
+        comment_form_rejected, dispatch_uid='metrics-comment-rejected'
+    )
@@ -18,9 +18,15 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'news.apps.NewsConfig',
+    'yanews.apps.MetricsConfig',
 ]
 
 MIDDLEWARE = [
+    'yanews.middleware.MetricsMiddleware',
+    'yanews.middleware.QueryBudgetMiddleware',
+    'yanews.middleware.ServerTimingMiddleware',
+    'yanews.middleware.ProfilerMiddleware',
+    'yanews.middleware.MemoryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,3 +86,97 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+COMMENTS_COUNT_ON_PAGE = 20
+
+# Сколько секунд хранить отрендеренные карточки новостей главной страницы.
+# Версии новостей, которые сбрасывают карточки, лежат в кеше
+# по умолчанию: при нескольких процессах он должен быть общим
+# для всех (Memcached, Redis), иначе сброс увидит только процесс,
+# изменивший новость, а остальные до NEWS_FRAGMENT_CACHE_TIMEOUT
+# будут отдавать старые карточки. LocMemCache ниже подходит только
+# для разработки и одного процесса.
+NEWS_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Файл с дополнительными запрещёнными словами, по одному в строке.
+# Изменения файла подхватываются без перезапуска.
+BAD_WORDS_FILE = None
+
+# Допустимое количество SQL-запросов на один запрос к странице, с учётом
+# загрузки сессии и пользователя. При DEBUG превышения пишутся в лог,
+# а при QUERY_BUDGET_RAISE = True (включается в тестах) вызывают ошибку.
+QUERY_BUDGETS = {
+    'news:home': 5,
+    'news:search': 4,
+    'news:detail': 6,
+    'news:comments': 4,
+    'news:edit': 5,
+    'news:delete': 5,
+}
+QUERY_BUDGET_RAISE = False
+
+# Доля запросов, для которых в ответ добавляется заголовок Server-Timing
+# с разбивкой времени на БД, представление и шаблон, а в лог
+# yanews.middleware.timing пишется та же разбивка одной строкой JSON.
+# 0 выключает замеры. Каждый замер — строка лога уровня INFO, поэтому
+# по умолчанию замеряется 1 % запросов; 1.0 удобно при отладке.
+SERVER_TIMING_SAMPLE_RATE = 0.01
+
+# Профилирование cProfile: доля запросов и заголовок, по которому
+# профилируется отдельный запрос. Значение заголовка должно совпасть
+# с PROFILER_TOKEN; без токена заголовок принимается только при DEBUG.
+# Профили по имени URL выгружаются в PROFILER_DIR не чаще раза
+# в PROFILER_DUMP_INTERVAL секунд.
+PROFILER_SAMPLE_RATE = 0
+PROFILER_HEADER = 'X-Profile'
+PROFILER_TOKEN = None
+PROFILER_DIR = BASE_DIR / 'profiles'
+PROFILER_DUMP_INTERVAL = 60
+
+# Учёт памяти через tracemalloc: доля отслеживаемых запросов (0 — выкл.),
+# глубина сохраняемых стеков и каталог для отчёта memory.<pid>.json
+# с пиком памяти и местами выделения по имени URL. Отчёт пишется
+# не чаще раза в MEMORY_DUMP_INTERVAL секунд. Пик сверяется
+# с MEMORY_BUDGETS в байтах; при MEMORY_BUDGET_RAISE превышение
+# вызывает исключение, иначе пишется в лог. Пик точен только
+# в однопоточных воркерах: tracemalloc считает выделения всех потоков.
+MEMORY_SAMPLE_RATE = 0
+MEMORY_TRACE_FRAMES = 1
+MEMORY_REPORT_DIR = BASE_DIR / 'profiles'
+MEMORY_DUMP_INTERVAL = 60
+MEMORY_BUDGETS = {
+    'news:home': 8 * 1024 * 1024,
+    'news:search': 8 * 1024 * 1024,
+    'news:detail': 16 * 1024 * 1024,
+    'news:comments': 8 * 1024 * 1024,
+}
+MEMORY_BUDGET_RAISE = False
+
+# Метрики Prometheus на странице /metrics. Каждый процесс не чаще раза
+# в METRICS_FLUSH_INTERVAL секунд пишет свои метрики в METRICS_DIR,
+# а страница складывает метрики всех живых процессов. Если задан
+# METRICS_TOKEN, страница требует Authorization: Bearer <токен>.
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yanews.middleware.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
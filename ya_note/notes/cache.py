@@ -0,0 +1,138 @@
+"""
+Кеш отрендеренных страниц заметок пользователя.
+
+Список и страница заметки кешируются целиком под ключом с версией
+автора. Версия — случайная метка, которую сигналы меняют при любом
+сохранении и удалении заметки, а пакетные записи (загрузка, seed) —
+явно через bump_versions. Старые страницы при этом не удаляются,
+а перестают запрашиваться и вытесняются кешем со временем.
+
+ETag страницы строится из того же ключа и отдаётся только вместе
+с успешной страницей: при повторной проверке он сверяется, лишь если
+страница этого пользователя лежит в кеше, а туда попадают только
+ответы 200. Поэтому ответ 304 не требует запросов к базе, а отсутствие
+заметки или чужая заметка по-прежнему дают 404. На страницах нет форм
+с CSRF-токеном, так что страница зависит только от пользователя,
+адреса и его заметок.
+"""
+import hashlib
+import uuid
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+from django.http import HttpResponse
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+VERSION_KEY = 'notes:author-version:{author_id}'
+# Страница хранится парой (содержимое, заголовки).
+PAGE_KEY = 'notes:page-headers:{author_id}:{version}:{path}'
+
+# Попадания и промахи с момента запуска процесса.
+stats = Counter()
+# Отправляется после каждого чтения страницы из кеша с аргументом hit.
+page_fetched = Signal()
+
+
+def new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def bump_versions(author_ids):
+    """
+    Делает устаревшими закешированные страницы авторов.
+
+    Версия меняется сразу и ещё раз после фиксации транзакции: иначе
+    страница, которую параллельный запрос успел отрендерить по старым
+    данным до фиксации, осталась бы в кеше под новой версией.
+    """
+    def bump():
+        cache.set_many(
+            {VERSION_KEY.format(author_id=pk): new_version()
+             for pk in author_ids},
+            timeout=None,
+        )
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_version(author_id):
+    key = VERSION_KEY.format(author_id=author_id)
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        cache.set(key, version, timeout=None)
+    return version
+
+
+def page_key(request):
+    """Ключ страницы для пользователя; считается один раз на запрос."""
+    if not hasattr(request, 'notes_page_key'):
+        path = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+        request.notes_page_key = PAGE_KEY.format(
+            author_id=request.user.pk,
+            version=get_version(request.user.pk),
+            path=path,
+        )
+    return request.notes_page_key
+
+
+def cached(request):
+    """Страница запроса из кеша или None; читается один раз на запрос."""
+    if not hasattr(request, 'notes_page'):
+        request.notes_page = cache.get(page_key(request))
+        hit = request.notes_page is not None
+        stats['hits' if hit else 'misses'] += 1
+        page_fetched.send(cached_page, hit=hit)
+    return request.notes_page
+
+
+def make_etag(request):
+    return hashlib.sha1(page_key(request).encode()).hexdigest()
+
+
+def page_etag(request, *args, **kwargs):
+    """Значение ETag только для страницы из кеша, то есть успешной."""
+    if cached(request) is None:
+        return None
+    return make_etag(request)
+
+
+def cached_page(view):
+    """
+    Отдаёт страницу из кеша, а при промахе кладёт туда ответ view.
+
+    Кешируются только успешные ответы, вместе с заголовками view
+    (в том числе Content-Type), чтобы ответ из кеша не отличался
+    от отрендеренного. Шаблон по-прежнему рендерится после выхода
+    из view, и страница попадает в кеш уже после этого. ETag
+    получают только успешные ответы.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = page_key(request)
+        page = cached(request)
+        if page is not None:
+            content, headers = page
+            response = HttpResponse(content)
+            for header, value in headers:
+                response[header] = value
+            return response
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: cache.set(
+                    key,
+                    (rendered.content, list(rendered.items())),
+                    settings.NOTES_PAGE_CACHE_TIMEOUT,
+                )
+            )
+            response['ETag'] = quote_etag(make_etag(request))
+        return response
+
+    return condition(etag_func=page_etag)(wrapper)
@@ -0,0 +1,129 @@
+"""
+Текстовое поле, которое хранит большие значения сжатыми.
+
+Текст короче COMPRESS_THRESHOLD байт в UTF-8 пишется как обычно,
+а длиннее — BLOB-ом: байт кодека (b'z' — zlib) и сжатые данные.
+SQLite хранит в столбце с типом text и строки, и BLOB без
+преобразования, поэтому столбец остаётся прежним, а значение само
+говорит, сжато ли оно. Для других СУБД текст пишется без сжатия.
+
+Из базы сжатое значение приходит как CompressedText и распаковывается
+только при обращении к атрибуту модели: загруженная, но не прочитанная
+заметка не платит за распаковку. values() и values_list() отдают
+CompressedText как есть, str() превращает его в текст.
+"""
+import zlib
+
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+COMPRESS_THRESHOLD = 1024
+COMPRESS_LEVEL = 6
+ZLIB = b'z'
+
+
+def compress(text, threshold=COMPRESS_THRESHOLD, level=COMPRESS_LEVEL):
+    """Байты со сжатым текстом или сам текст, если сжимать не стоит."""
+    data = text.encode()
+    if len(data) < threshold:
+        return text
+    packed = ZLIB + zlib.compress(data, level)
+    return packed if len(packed) < len(data) else text
+
+
+def decompress(value):
+    """Текст значения из базы: сжатого или обычного."""
+    if isinstance(value, CompressedText):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        value = bytes(value)
+        if value[:1] != ZLIB:
+            raise ValueError(f'Неизвестный кодек сжатия: {value[:1]!r}.')
+        return zlib.decompress(value[1:]).decode()
+    return value
+
+
+class CompressedText:
+    """Сжатое значение из базы; распаковывается один раз по str()."""
+    __slots__ = ('packed', 'text')
+
+    def __init__(self, packed):
+        self.packed = bytes(packed)
+        self.text = None
+
+    def __str__(self):
+        if self.text is None:
+            self.text = decompress(self.packed)
+        return self.text
+
+    def __eq__(self, other):
+        if isinstance(other, CompressedText):
+            return self.packed == other.packed
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return f'<CompressedText: {len(self.packed)} байт>'
+
+
+class CompressedTextAttribute(DeferredAttribute):
+    """Атрибут модели, распаковывающий значение при первом чтении."""
+
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = instance.__dict__[self.field.attname] = str(value)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+    def raw(self, instance):
+        """Значение без распаковки, если атрибут ещё не читали."""
+        return instance.__dict__.get(self.field.attname)
+
+
+class CompressedTextField(models.TextField):
+    """TextField, сжимающий значения от threshold байт."""
+    descriptor_class = CompressedTextAttribute
+
+    def __init__(self, *args, threshold=COMPRESS_THRESHOLD, **kwargs):
+        self.threshold = threshold
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.threshold != COMPRESS_THRESHOLD:
+            kwargs['threshold'] = self.threshold
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, (bytes, memoryview)):
+            return CompressedText(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, CompressedText):
+            return str(value)
+        return super().to_python(value)
+
+    def get_prep_value(self, value):
+        if isinstance(value, CompressedText):
+            return value
+        return super().get_prep_value(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if isinstance(value, CompressedText):
+            return value.packed
+        if value is None or connection.vendor != 'sqlite':
+            return value
+        return compress(value, self.threshold)
+
+    def value_to_string(self, obj):
+        return str(self.value_from_object(obj))
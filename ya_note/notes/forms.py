@@ -1,12 +1,17 @@
-from pytils.translit import slugify
+from pathlib import Path
 
 from django import forms
 from django.core.exceptions import ValidationError
+from django.dispatch import Signal
 
 from .models import Note
+from .transfer import EXTENSIONS
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
 
+# Отправляется, когда slug формы занят другой заметкой.
+slug_collision = Signal()
+
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
@@ -16,14 +21,49 @@ class NoteForm(forms.ModelForm):
         fields = ('title', 'text', 'slug')
 
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
+        """
+        Отклоняет занятый slug, только если он задан явно.
+
+        Пустой slug заметка подберёт сама при сохранении.
+        """
+        slug = self.cleaned_data.get('slug')
+        if slug and Note.objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
-            raise ValidationError(slug + WARNING)
+            raise self.slug_taken(slug)
         return slug
+
+    def slug_taken(self, slug):
+        """Ошибка занятого slug; о столкновении сообщает сигнал."""
+        slug_collision.send(NoteForm, slug=slug)
+        return ValidationError(slug + WARNING)
+
+    def validate_unique(self):
+        """
+        Повторно не проверяем уникальность модели.
+
+        slug — единственное уникальное поле заметки: явный slug уже
+        проверен в clean_slug, а пустой подбирается при сохранении.
+        Если явный slug занял параллельный запрос уже после проверки,
+        представление превращает IntegrityError в ту же ошибку формы.
+        """
+
+
+class ImportForm(forms.Form):
+    """Форма загрузки заметок из файла."""
+
+    file = forms.FileField(
+        label='Файл',
+        help_text='JSON Lines или CSV с колонками title, text, slug',
+    )
+
+    def clean_file(self):
+        """Формат файла определяется по расширению."""
+        upload = self.cleaned_data['file']
+        extension = Path(upload.name).suffix.lower()
+        if extension not in EXTENSIONS:
+            raise ValidationError(
+                'Поддерживаются файлы ' + ', '.join(EXTENSIONS) + '.'
+            )
+        self.file_format = EXTENSIONS[extension]
+        return upload
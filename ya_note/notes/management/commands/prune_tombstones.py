@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from notes.models import ChangeCounter, NoteTombstone
+from notes.sync import COUNTER, PRUNED_COUNTER
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет старые следы удалённых заметок. Клиенты, отставшие '
+        'сильнее, получат reset и синхронизируются заново.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=1_000_000,
+            help='Сколько последних номеров изменений хранить следы.',
+        )
+
+    def handle(self, *args, **options):
+        if options['keep'] < 0:
+            raise CommandError('--keep не может быть отрицательным.')
+        with transaction.atomic():
+            last, _ = ChangeCounter.objects.get_or_create(name=COUNTER)
+            until = last.value - options['keep']
+            pruned, _ = ChangeCounter.objects.select_for_update(
+            ).get_or_create(name=PRUNED_COUNTER)
+            if until <= pruned.value:
+                self.stdout.write('Удалять нечего.')
+                return
+            deleted, _ = NoteTombstone.objects.filter(
+                change_seq__lte=until
+            ).delete()
+            pruned.value = until
+            pruned.save(update_fields=['value'])
+        self.stdout.write(
+            f'Удалено следов: {deleted}, до номера {until} включительно.'
+        )
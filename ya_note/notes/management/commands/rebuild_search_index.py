@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.models import Note
+from notes.search import is_supported, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--optimize',
+            action='store_true',
+            help='После перестроения слить сегменты индекса в один.',
+        )
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError(
+                'Полнотекстовый поиск работает только с SQLite.'
+            )
+        rebuild_index(Note.objects.all(), optimize=options['optimize'])
+        self.stdout.write('Поисковый индекс заметок перестроен.')
@@ -0,0 +1,199 @@
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from notes.cache import bump_versions
+from notes.models import Note
+from notes.search import index_notes
+from notes.sync import reserve_changes
+from notes.translit import slugify_many
+
+User = get_user_model()
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+VOCABULARY_SIZE = 20_000
+CORPUS_WORDS = 500_000
+# Медиана длины заметки — около 40 слов, но встречаются заметки
+# на десятки тысяч слов.
+MEDIAN_WORDS = 40
+SIZE_SIGMA = 1.6
+MAX_WORDS = 50_000
+
+
+def zipf_counts(total, slots, exponent):
+    """
+    Раскладывает total по slots пропорционально весам Ципфа.
+
+    Доли округляются вниз, а остаток отдаётся самым популярным
+    местам, поэтому сумма ровно равна total.
+    """
+    weights = [1 / rank ** exponent for rank in range(1, slots + 1)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for rank in range(total - sum(counts)):
+        counts[rank % slots] += 1
+    return counts
+
+
+TEXT_FIELD = Note._meta.get_field('text')
+
+
+def note_insert_sql():
+    opts = Note._meta
+    quote = connection.ops.quote_name
+    columns = [
+        quote(opts.get_field(name).column)
+        for name in ('title', 'text', 'slug', 'author', 'change_seq')
+    ]
+    return (
+        f'INSERT INTO {quote(opts.db_table)} ({", ".join(columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))})'
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу воспроизводимым набором пользователей и заметок '
+        'для замеров производительности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--notes', type=int, default=1_000_000)
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.0,
+            help='Показатель распределения заметок по авторам.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора: одно и то же зерно даёт те же данные.',
+        )
+        parser.add_argument(
+            '--password',
+            default='password',
+            help='Пароль всех созданных пользователей.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.perf_counter()
+        user_ids = self.create_users(options)
+        if options['notes'] and not user_ids:
+            raise CommandError('Заметкам нужны авторы: задайте --users.')
+        counts = zipf_counts(options['notes'], len(user_ids), options['zipf'])
+        self.rng.shuffle(counts)
+        last_id = Note.objects.aggregate(last=Max('id'))['last'] or 0
+        self.create_notes(options['seed'], last_id, zip(user_ids, counts))
+        self.index_notes(last_id)
+        bump_versions(user_ids)
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'Готово за {elapsed:.1f} с.')
+
+    def progress(self, label, done):
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'{label}: {done}, {elapsed:.1f} с')
+
+    def create_users(self, options):
+        """Пользователи seed-<зерно>-<номер> с общим хешем пароля."""
+        prefix = f'seed-{options["seed"]}-'
+        password = make_password(options['password'])
+        for start in range(0, options['users'], self.batch_size):
+            stop = min(start + self.batch_size, options['users'])
+            User.objects.bulk_create([
+                User(username=f'{prefix}{index}', password=password)
+                for index in range(start, stop)
+            ], ignore_conflicts=True)
+        self.progress('Пользователей', options['users'])
+        return list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def make_corpus(self):
+        vocabulary = [
+            ''.join(self.rng.choices(ALPHABET, k=self.rng.randint(2, 10)))
+            for _ in range(VOCABULARY_SIZE)
+        ]
+        cum_weights = list(accumulate(
+            1 / rank for rank in range(1, VOCABULARY_SIZE + 1)
+        ))
+        corpus = self.rng.choices(
+            vocabulary, cum_weights=cum_weights, k=CORPUS_WORDS
+        )
+        return corpus, dict(zip(vocabulary, slugify_many(vocabulary)))
+
+    def create_notes(self, seed, last_id, author_counts):
+        """
+        Заметки пишутся executemany без создания объектов модели.
+
+        Сборка Note и компиляция INSERT в bulk_create занимают больше
+        времени, чем сама запись, а заметок здесь миллионы. Текст
+        заметки — отрезок заранее собранного корпуса, длина которого
+        распределена логнормально: большинство заметок короткие,
+        но есть и очень длинные. Slug заголовка собирается из заранее
+        транслитерированных слов словаря, а номер в нём отсчитывается
+        от последнего id до запуска: так повторный запуск с тем же
+        зерном не повторяет slug прошлых запусков. Длинные тексты
+        сжимаются полем модели так же, как при обычном сохранении.
+        """
+        corpus, word_slugs = self.make_corpus()
+        sql = note_insert_sql()
+        rows = []
+        created = 0
+        for author_id, count in author_counts:
+            for _ in range(count):
+                size = min(
+                    int(self.rng.lognormvariate(0, SIZE_SIGMA) * MEDIAN_WORDS)
+                    + 1,
+                    MAX_WORDS,
+                )
+                offset = self.rng.randrange(CORPUS_WORDS - size)
+                words = corpus[offset:offset + 3]
+                title = ' '.join(words).capitalize()
+                title_slug = '-'.join(word_slugs[word] for word in words)
+                number = last_id + created + len(rows) + 1
+                slug = f'{title_slug[:80]}-{seed}-{number}'
+                text = ' '.join(corpus[offset:offset + size])
+                rows.append((
+                    title,
+                    TEXT_FIELD.get_db_prep_value(text, connection),
+                    slug,
+                    author_id,
+                ))
+                if len(rows) == self.batch_size:
+                    created += self.write(sql, rows, created)
+                    rows = []
+        self.write(sql, rows, created)
+
+    def index_notes(self, last_id):
+        """Заметки записаны в обход модели, поэтому индексируем их сами."""
+        with transaction.atomic():
+            index_notes(
+                Note.objects.filter(id__gt=last_id)
+                .values_list('id', 'title', 'text', 'author_id')
+                .iterator(chunk_size=self.batch_size)
+            )
+        self.progress('Поисковый индекс', 'готов')
+
+    def write(self, sql, rows, created):
+        if rows:
+            with transaction.atomic(), connection.cursor() as cursor:
+                first = reserve_changes(len(rows))
+                cursor.executemany(sql, [
+                    (*row, first + offset) for offset, row in enumerate(rows)
+                ])
+            self.progress('Заметок', created + len(rows))
+        return len(rows)
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+from notes.search import index_notes
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Подчёркивание — часть слова: так префикс автора u<id>_ не
+    # отделяется от слова при разборе.
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS notes_note_fts USING fts5("
+        "title, text, content='', "
+        "tokenize=\"unicode61 tokenchars '_'\")"
+    )
+    Note = apps.get_model('notes', 'Note')
+    index_notes(
+        Note.objects.using(schema_editor.connection.alias)
+        .values_list('id', 'title', 'text', 'author_id').iterator()
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS notes_note_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_note_author_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
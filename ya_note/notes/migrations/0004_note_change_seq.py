@@ -0,0 +1,57 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:31
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing_notes(apps, schema_editor):
+    """Существующие заметки нумеруются по id, счётчик продолжает с max."""
+    Note = apps.get_model('notes', 'Note')
+    ChangeCounter = apps.get_model('notes', 'ChangeCounter')
+    db = schema_editor.connection.alias
+    Note.objects.using(db).update(change_seq=F('id'))
+    last = Note.objects.using(db).aggregate(last=Max('id'))['last'] or 0
+    ChangeCounter.objects.using(db).create(name='notes', value=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NoteTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_id', models.BigIntegerField()),
+                ('slug', models.SlugField(db_index=False, max_length=100)),
+                ('author_id', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            number_existing_notes, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'change_seq'], name='note_author_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notetombstone',
+            index=models.Index(fields=['author_id', 'change_seq'], name='tombstone_author_change_idx'),
+        ),
+    ]
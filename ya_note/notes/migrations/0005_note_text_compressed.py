@@ -0,0 +1,74 @@
+# Generated by Django 3.2.15 on 2026-10-18 21:05
+
+from django.db import migrations
+
+import notes.fields
+
+BATCH_SIZE = 1000
+# Сжимаются только строки, хранящиеся текстом и не короче порога;
+# typeof() отсекает уже сжатые, поэтому прерванную миграцию можно
+# запустить заново.
+LARGE_SQL = """
+    SELECT id, text FROM notes_note
+    WHERE id > %s AND typeof(text) = %s
+        AND length(CAST(text AS BLOB)) >= %s
+    ORDER BY id
+    LIMIT %s
+"""
+UPDATE_SQL = 'UPDATE notes_note SET text = %s WHERE id = %s'
+
+
+def convert(schema_editor, storage_class, threshold, encode):
+    """
+    Переписывает тексты порциями по id, не держа в памяти все заметки.
+
+    Столбец не меняется: SQLite хранит в нём и строки, и BLOB, поэтому
+    пересоздавать таблицу не нужно. Файл базы после миграции
+    уменьшится только после VACUUM.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                LARGE_SQL, [last_id, storage_class, threshold, BATCH_SIZE]
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            cursor.executemany(
+                UPDATE_SQL, [(encode(text), pk) for pk, text in rows]
+            )
+
+
+def compress_texts(apps, schema_editor):
+    convert(
+        schema_editor, 'text', notes.fields.COMPRESS_THRESHOLD,
+        notes.fields.compress,
+    )
+
+
+def decompress_texts(apps, schema_editor):
+    convert(schema_editor, 'blob', 0, notes.fields.decompress)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_note_change_seq'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='note',
+                    name='text',
+                    field=notes.fields.CompressedTextField(help_text='Добавьте подробностей', verbose_name='Текст'),
+                ),
+            ],
+        ),
+        migrations.RunPython(compress_texts, decompress_texts),
+    ]
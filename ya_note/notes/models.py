@@ -1,7 +1,12 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
-from pytils.translit import slugify
+from .fields import CompressedTextField
+from .slugs import allocate_slug
+from .sync import reserve_changes
+
+# Сколько раз подбирать slug заново, если его успел занять другой запрос.
+SLUG_ATTEMPTS = 5
 
 
 class Note(models.Model):
@@ -11,7 +16,8 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    # Длинные тексты хранятся сжатыми, см. fields.py.
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
@@ -23,16 +29,111 @@ class Note(models.Model):
         help_text=('Укажите адрес для страницы заметки. Используйте только '
                    'латиницу, цифры, дефисы и знаки подчёркивания')
     )
+    # Отдельный индекс внешнего ключа не нужен: его заменяет
+    # составной индекс (author, id) из Meta.
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
+    # Номер последнего изменения заметки для синхронизации, см. sync.py.
+    # Его ставит save(); пакетные записи в обход save() резервируют
+    # номера сами, как и индексируют заметки для поиска.
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+            models.Index(
+                fields=('author', 'change_seq'), name='note_author_change_idx'
+            ),
+        )
+
+    # Поля заметки в поисковом индексе, см. search.py.
+    INDEXED_FIELDS = ('title', 'text', 'author_id')
+    indexed = None
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминаем значения, по которым заметка лежит в индексе."""
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields():
+            instance.indexed = instance.indexed_values()
+        return instance
+
+    def indexed_values(self):
+        """
+        Значения полей индекса как они есть, без распаковки текста.
+
+        Загруженная, но не прочитанная заметка не распаковывает текст
+        ни при загрузке, ни при сохранении других полей.
+        """
+        return tuple(
+            self.__dict__[name] if name in self.__dict__
+            else getattr(self, name)
+            for name in self.INDEXED_FIELDS
+        )
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Пустой slug подбирается по заголовку с наименьшим свободным номером.
+
+        Если между подбором и записью тот же slug занял параллельный
+        запрос, запись откатывается до точки сохранения и slug
+        подбирается заново.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'change_seq'}
+        if self.slug:
+            return self.save_change(*args, **kwargs)
+        for attempt in range(SLUG_ATTEMPTS):
+            self.slug = allocate_slug(
+                type(self).objects.all(), self.title, exclude_pk=self.pk
+            )
+            try:
+                return self.save_change(*args, **kwargs)
+            except IntegrityError:
+                self.slug = ''
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
+
+    def save_change(self, *args, **kwargs):
+        """Номер изменения берётся в одной транзакции с записью заметки."""
+        with transaction.atomic(using=kwargs.get('using')):
+            self.change_seq = reserve_changes()
+            return super().save(*args, **kwargs)
+
+
+class NoteTombstone(models.Model):
+    """
+    След удалённой заметки, по которому клиенты узнают об удалении.
+
+    Автор хранится числом, а не внешним ключом: след пишется уже
+    после удаления заметки, в том числе когда вместе с заметками
+    удаляется сам пользователь.
+    """
+    note_id = models.BigIntegerField()
+    slug = models.SlugField(max_length=100, db_index=False)
+    author_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author_id', 'change_seq'),
+                name='tombstone_author_change_idx',
+            ),
+        )
+
+
+class ChangeCounter(models.Model):
+    """
+    Счётчики синхронизации: 'notes' — последний выданный номер
+    изменения, 'tombstones-pruned' — номер, до которого удалены следы.
+    """
+    name = models.CharField(max_length=32, primary_key=True)
+    value = models.BigIntegerField(default=0)
@@ -0,0 +1,184 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+AFTER = 'a'
+BEFORE = 'b'
+
+
+def pack_cursor(values):
+    """Непрозрачный курсор: base64 от JSON со списком значений."""
+    raw = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(cursor):
+    """Список значений из курсора или ValueError для битого курсора."""
+    padding = '=' * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    if not isinstance(values, list):
+        raise ValueError(cursor)
+    return values
+
+
+class KeysetPage:
+    """Страница выборки, полученная по курсору."""
+
+    def __init__(self, paginator, object_list, direction, cursor_given):
+        self.paginator = paginator
+        self.object_list = object_list
+        self._direction = direction
+        self._cursor_given = cursor_given
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def first(self):
+        return self.object_list[0] if len(self) else None
+
+    @property
+    def last(self):
+        return self.object_list[len(self) - 1] if len(self) else None
+
+    @cached_property
+    def has_next(self):
+        if not len(self):
+            return False
+        if self._direction == AFTER and len(self) < self.paginator.per_page:
+            return False
+        return self.paginator.exists_after(self.last)
+
+    @cached_property
+    def has_previous(self):
+        if not self._cursor_given or not len(self):
+            return False
+        if self._direction == BEFORE and len(self) < self.paginator.per_page:
+            return False
+        return self.paginator.exists_before(self.first)
+
+    @property
+    def next_cursor(self):
+        if self.has_next:
+            return self.paginator.encode(AFTER, self.last)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous:
+            return self.paginator.encode(BEFORE, self.first)
+        return None
+
+
+class KeysetPaginator:
+    """
+    Постраничный вывод по ключу (seek-пагинация).
+
+    Вместо OFFSET страница ищется условием вида «id больше ключа
+    последней записи» (для списка заметок ключ — один id, см.
+    NotesList), поэтому стоимость любой страницы одинакова при наличии
+    индекса по фильтру и полям сортировки (у заметок — author, id).
+    Курсоры непрозрачны: это base64 от JSON с направлением
+    и значениями ключа.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+
+    def page(self, cursor=None):
+        """Возвращает страницу по курсору или 404 для битого курсора."""
+        if not cursor:
+            object_list = self.queryset.order_by(*self.ordering)
+            return KeysetPage(
+                self, object_list[:self.per_page], AFTER, False
+            )
+        direction, key = self.decode(cursor)
+        if direction == AFTER:
+            object_list = self._seek(key, forward=True).order_by(
+                *self.ordering
+            )[:self.per_page]
+        else:
+            # Берём ближайшие записи в обратном порядке и возвращаем
+            # их в прямом, не покидая QuerySet.
+            reverse_page = self._seek(key, forward=False).order_by(
+                *self._reverse_ordering()
+            )[:self.per_page]
+            object_list = self.queryset.filter(
+                pk__in=reverse_page.values('pk')
+            ).order_by(*self.ordering)
+        return KeysetPage(self, object_list, direction, True)
+
+    def exists_after(self, obj):
+        return self._seek(self._key(obj), forward=True).exists()
+
+    def exists_before(self, obj):
+        return self._seek(self._key(obj), forward=False).exists()
+
+    def encode(self, direction, obj):
+        values = [
+            field.value_to_string(obj) for field in self.fields
+        ]
+        return pack_cursor([direction, *values])
+
+    def decode(self, cursor):
+        try:
+            direction, *values = unpack_cursor(cursor)
+            if direction not in (AFTER, BEFORE):
+                raise ValueError(direction)
+            if len(values) != len(self.fields):
+                raise ValueError(values)
+            key = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            raise Http404('Некорректный курсор страницы.')
+        return direction, key
+
+    def _key(self, obj):
+        return [getattr(obj, field.attname) for field in self.fields]
+
+    def _reverse_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def _seek(self, key, forward):
+        """
+        Условие «строго после ключа» в порядке сортировки.
+
+        Для ключа (a, b) это a > x OR (a = x AND b > y), где направление
+        сравнения каждого поля зависит от знака в ordering. Нестрогое
+        условие на первое поле дублируется отдельно, чтобы база могла
+        начать просмотр индекса сразу с нужного места.
+        """
+        condition = Q()
+        equal = Q()
+        for name, field, value in zip(self.ordering, self.fields, key):
+            lookup = self._lookup(name, forward)
+            condition |= equal & Q(**{f'{field.name}__{lookup}': value})
+            equal &= Q(**{field.name: value})
+        first = self.fields[0].name
+        bound = Q(**{
+            f'{first}__{self._lookup(self.ordering[0], forward)}e': key[0]
+        })
+        return self.queryset.filter(bound, condition)
+
+    @staticmethod
+    def _lookup(name, forward):
+        descending = name.startswith('-')
+        return 'lt' if descending == forward else 'gt'
@@ -0,0 +1,247 @@
+"""
+Полнотекстовый поиск по заметкам пользователя на SQLite FTS5.
+
+Индекс notes_note_fts — contentless таблица FTS5: в ней хранится
+только индекс, без копии заголовков и текстов. Каждое слово пишется
+в индекс с префиксом автора, u<author_id>_слово, поэтому запрос
+читает только списки документов автора: ни поиск, ни подсчёт bm25
+не проходят по чужим заметкам, сколько бы их ни было.
+
+Индекс обновляют сигналы сохранения и удаления Note (см. signals.py):
+синхронизация идёт через модель, а не триггерами, чтобы индекс
+получал текст в том виде, в каком его видит приложение. Записи
+в обход модели (bulk_create, executemany) индексируются явно через
+index_notes(), а команда rebuild_search_index перестраивает индекс
+целиком.
+"""
+import re
+from itertools import islice
+
+from django.db import connection, transaction
+from django.http import Http404
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .pagination import pack_cursor, unpack_cursor
+
+INDEX_TABLE = 'notes_note_fts'
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+SNIPPET_WORDS = 24
+# Сколько символов текста просматривать на каждое слово перед совпадением.
+LOOKBEHIND_CHARS = 32
+BATCH_SIZE = 2000
+WORD = re.compile(r'\w+')
+
+# Строка с NULL в служебном столбце добавляет документ, а со значением
+# 'delete' удаляет его; для удаления нужны прежние значения столбцов.
+WRITE_SQL = (
+    f'INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, title, text) '
+    'VALUES (%s, %s, %s, %s)'
+)
+
+# Ранжируется вся выдача автора: префикс автора в словах уже
+# ограничивает поиск его заметками, так что цена запроса зависит
+# от числа его совпадений, а не от размера индекса.
+SEARCH_SQL = f"""
+    SELECT id, score FROM (
+        SELECT
+            rowid AS id,
+            bm25({INDEX_TABLE}, {TITLE_WEIGHT}, {TEXT_WEIGHT}) AS score
+        FROM {INDEX_TABLE}
+        WHERE {INDEX_TABLE} MATCH %s
+    )
+    WHERE score > %s OR (score = %s AND id > %s)
+    ORDER BY score, id
+    LIMIT %s
+"""
+
+
+def is_supported(using_connection=connection):
+    return using_connection.vendor == 'sqlite'
+
+
+def owner_prefix(author_id):
+    return f'u{author_id}_'
+
+
+def owned_words(text, author_id):
+    """
+    Слова текста с префиксом автора, как они пишутся в индекс.
+
+    text может быть и сжатым значением из values_list (см. fields.py).
+    """
+    prefix = owner_prefix(author_id)
+    words = WORD.findall(str(text))
+    return prefix + f' {prefix}'.join(words) if words else ''
+
+
+def write(rows):
+    """Пишет в индекс строки (команда, id, заголовок, текст, автор)."""
+    rows = [
+        (
+            command, pk,
+            owned_words(title, author_id), owned_words(text, author_id),
+        )
+        for command, pk, title, text, author_id in rows
+    ]
+    if rows and is_supported():
+        with connection.cursor() as cursor:
+            cursor.executemany(WRITE_SQL, rows)
+
+
+def index_notes(documents, batch_size=BATCH_SIZE):
+    """
+    Добавляет в индекс заметки (id, заголовок, текст, id автора).
+
+    Для записей в обход модели; documents читаются пачками,
+    поэтому подходит и values_list(...).iterator().
+    """
+    documents = iter(documents)
+    while batch := list(islice(documents, batch_size)):
+        write((None, *document) for document in batch)
+
+
+def rebuild_index(queryset, optimize=False):
+    """Перестраивает индекс по заметкам из queryset."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('delete-all')"
+        )
+        index_notes(
+            queryset.values_list('id', 'title', 'text', 'author_id')
+            .iterator(chunk_size=BATCH_SIZE)
+        )
+    if optimize:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('optimize')"
+            )
+
+
+def parse_query(query, author_id):
+    """
+    Слова запроса и запрос FTS5 по заметкам автора.
+
+    Слова берутся в кавычки, чтобы операторы FTS5 в тексте запроса
+    не ломали его, и получают префикс автора; все слова должны
+    встретиться. Слово со звёздочкой на конце ищется как префикс.
+    """
+    terms = re.findall(r'\w+\*?', query.lower())
+    prefix = owner_prefix(author_id)
+    match = ' '.join(
+        f'"{prefix}{term.rstrip("*")}"' + ('*' if term.endswith('*') else '')
+        for term in terms
+    )
+    return terms, match
+
+
+def is_term(word, terms):
+    word = word.lower()
+    return any(
+        word.startswith(term[:-1]) if term.endswith('*') else word == term
+        for term in terms
+    )
+
+
+def term_pattern(terms):
+    """Регулярное выражение, находящее любое слово запроса."""
+    alternatives = '|'.join(
+        re.escape(term[:-1]) + r'\w*' if term.endswith('*')
+        else re.escape(term)
+        for term in terms
+    )
+    return re.compile(rf'\b(?:{alternatives})\b', re.IGNORECASE)
+
+
+def make_snippet(text, terms, size=SNIPPET_WORDS):
+    """
+    Фрагмент текста вокруг первого найденного слова.
+
+    Заметки бывают огромными, поэтому первое совпадение ищется одним
+    регулярным выражением, а на слова разбирается только окно
+    вокруг него.
+    """
+    match = term_pattern(terms).search(text)
+    start = match.start() if match else 0
+    lead = size // 4
+    scan_from = max(start - lead * LOOKBEHIND_CHARS, 0)
+    before = list(WORD.finditer(text, scan_from, start))
+    if scan_from and before and WORD.match(text, scan_from - 1):
+        # Первое слово окна могло оказаться обрезанным.
+        before = before[1:]
+    before = before[len(before) - lead:] if lead else []
+    window = before + list(
+        islice(WORD.finditer(text, start), size - len(before))
+    )
+    if not window:
+        return ''
+    parts = ['…'] if WORD.search(text, 0, window[0].start()) else []
+    position = window[0].start()
+    for word in window:
+        parts.append(escape(text[position:word.start()]))
+        if is_term(word.group(), terms):
+            parts.append(f'<mark>{escape(word.group())}</mark>')
+        else:
+            parts.append(escape(word.group()))
+        position = word.end()
+    if WORD.search(text, position):
+        parts.append('…')
+    return mark_safe(''.join(parts))
+
+
+class SearchResults:
+    """
+    Страница заметок автора, найденных по запросу, в порядке bm25.
+
+    Следующая страница ищется по курсору (score, id) последнего
+    результата. Заметки загружаются из queryset, поэтому в выдачу
+    не попадёт ничего, что пользователю не видно.
+    """
+
+    def __init__(self, queryset, author_id, query, per_page, cursor=None):
+        self.query = query
+        self.per_page = per_page
+        self.results = []
+        self.next_cursor = None
+        self.terms, match = parse_query(query, author_id)
+        if match and is_supported():
+            self._fetch(queryset, match, self._after(cursor))
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @staticmethod
+    def _after(cursor):
+        if not cursor:
+            return float('-inf'), 0
+        try:
+            score, pk = unpack_cursor(cursor)
+            return float(score), int(pk)
+        except (ValueError, TypeError):
+            raise Http404('Некорректный курсор страницы.')
+
+    def _fetch(self, queryset, match, after):
+        score, pk = after
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SEARCH_SQL, [match, score, score, pk, self.per_page + 1]
+            )
+            rows = cursor.fetchall()
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            last_pk, last_score = rows[-1]
+            self.next_cursor = pack_cursor([last_score, last_pk])
+        ids = [row[0] for row in rows]
+        notes = queryset.in_bulk(ids)
+        for pk in ids:
+            if pk in notes:
+                notes[pk].snippet = make_snippet(notes[pk].text, self.terms)
+                self.results.append(notes[pk])
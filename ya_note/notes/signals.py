@@ -0,0 +1,76 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import search
+from .cache import bump_versions
+from .models import Note, NoteTombstone
+from .sync import reserve_changes
+
+
+@receiver(pre_save, sender=Note)
+def load_indexed(sender, instance, raw=False, **kwargs):
+    """
+    Прежние значения заметки нужны, чтобы убрать её из индекса.
+
+    Обычно они запомнены при загрузке, а для заметки, собранной
+    вручную по существующему id, читаются из базы.
+    """
+    if instance._state.adding or instance.indexed is not None:
+        return
+    instance.indexed = Note.objects.filter(pk=instance.pk).values_list(
+        *Note.INDEXED_FIELDS
+    ).first()
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, **kwargs):
+    """Переиндексируем заметку, только если изменился её текст."""
+    current = instance.indexed_values()
+    if current == instance.indexed:
+        return
+    rows = [(None, instance.pk, *current)]
+    if instance.indexed is not None:
+        rows.insert(0, ('delete', instance.pk, *instance.indexed))
+    search.write(rows)
+    instance.indexed = current
+
+
+@receiver(pre_delete, sender=Note)
+def load_deleted(sender, instance, **kwargs):
+    """
+    Дочитывает отложенные поля, пока строка заметки ещё есть в базе.
+
+    После удаления обращение к отложенному полю вызвало бы
+    refresh_from_db() и DoesNotExist, а поля индекса, slug и автор
+    нужны обработчикам post_delete.
+    """
+    deferred = instance.get_deferred_fields() & {
+        'slug', *Note.INDEXED_FIELDS
+    }
+    if deferred:
+        instance.refresh_from_db(fields=deferred)
+    if instance.indexed is None:
+        instance.indexed = instance.indexed_values()
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted(sender, instance, **kwargs):
+    search.write([('delete', instance.pk, *instance.indexed)])
+
+
+@receiver(post_delete, sender=Note)
+def leave_tombstone(sender, instance, **kwargs):
+    NoteTombstone.objects.create(
+        note_id=instance.pk,
+        slug=instance.slug,
+        author_id=instance.author_id,
+        change_seq=reserve_changes(),
+    )
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def note_changed(sender, instance, **kwargs):
+    bump_versions([instance.author_id])
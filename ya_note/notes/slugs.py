@@ -0,0 +1,154 @@
+"""
+Выбор свободного slug для заметки.
+
+Slug строится из заголовка, а если он занят — к нему добавляется
+наименьший свободный номер: zametka, zametka-1, zametka-2...
+Занятые номера читаются одним запросом по диапазону уникального
+индекса slug, без перебора вариантов в цикле.
+"""
+from collections import Counter
+
+from django.db import connections
+
+from .translit import slugify
+
+# Место под суффикс «-номер» у длинных заголовков.
+SUFFIX_ROOM = 8
+# Основа slug для заголовков, в которых нет ни одной буквы или цифры.
+FALLBACK = 'note'
+# Сколько диапазонов slug проверять одним запросом: у старых SQLite
+# не больше 999 параметров на запрос.
+STEMS_PER_QUERY = 400
+# Диапазоны «основа-»…«основа.» соединяются с таблицей, и каждый
+# читается своим поиском по уникальному индексу slug.
+NUMBERED_SQL = (
+    'SELECT note.slug FROM (VALUES {ranges}) AS ranges '
+    'JOIN {table} AS note '
+    'ON note.slug > ranges.column1 AND note.slug < ranges.column2'
+)
+
+
+def slug_base(title, max_length):
+    """Slug заголовка без номера."""
+    return slugify(title)[:max_length] or FALLBACK
+
+
+def slug_stem(base, max_length):
+    """Основа для slug с номером, укороченная, чтобы номер поместился."""
+    if len(base) + SUFFIX_ROOM <= max_length:
+        return base
+    return base[:max_length - SUFFIX_ROOM].rstrip('-')
+
+
+def lowest_free(stem, taken):
+    """Slug «основа-номер» с наименьшим номером, которого нет в taken."""
+    number = 1
+    while f'{stem}-{number}' in taken:
+        number += 1
+    return f'{stem}-{number}'
+
+
+def allocate_slug(queryset, title, exclude_pk=None):
+    """
+    Свободный slug для заголовка среди slug из queryset.
+
+    Номера ищутся в диапазоне slug от «основа-» до «основа.»
+    (точка идёт в ASCII сразу за дефисом), поэтому запрос читает
+    только подходящий отрезок индекса.
+    """
+    max_length = queryset.model._meta.get_field('slug').max_length
+    base = slug_base(title, max_length)
+    stem = slug_stem(base, max_length)
+    candidates = queryset.filter(
+        slug__gt=f'{stem}-', slug__lt=f'{stem}.'
+    ) | queryset.filter(slug=base)
+    if exclude_pk is not None:
+        candidates = candidates.exclude(pk=exclude_pk)
+    taken = set(candidates.values_list('slug', flat=True))
+    if base not in taken:
+        return base
+    return lowest_free(stem, taken)
+
+
+def slug_number(slug):
+    """Основа и номер slug вида «основа-номер» или None."""
+    stem, _, suffix = slug.rpartition('-')
+    if stem and suffix.isdecimal() and suffix.isascii() and (
+            suffix == '0' or not suffix.startswith('0')):
+        return stem, int(suffix)
+    return None
+
+
+def read_numbers(queryset, stems):
+    """
+    Занятые номера основ stems: основа -> [1, множество номеров].
+
+    Диапазоны slug «основа-…» читаются по STEMS_PER_QUERY за запрос.
+    """
+    stems = sorted(stems)
+    numbers = {stem: [1, set()] for stem in stems}
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(stems), STEMS_PER_QUERY):
+            chunk = stems[start:start + STEMS_PER_QUERY]
+            cursor.execute(
+                NUMBERED_SQL.format(
+                    ranges=', '.join(['(%s, %s)'] * len(chunk)), table=table
+                ),
+                [bound for stem in chunk for bound in (f'{stem}-', f'{stem}.')]
+            )
+            for slug, in cursor.fetchall():
+                numbered = slug_number(slug)
+                if numbered and numbered[0] in numbers:
+                    numbers[numbered[0]][1].add(numbered[1])
+    return numbers
+
+
+def next_free(stem, state, taken):
+    """
+    Slug основы с наименьшим свободным номером.
+
+    state — [номер, с которого искать; занятые номера не меньше него]:
+    номера ниже уже заняты, поэтому множество не растёт с числом
+    выданных slug.
+    """
+    number, above = state
+    while number in above or f'{stem}-{number}' in taken:
+        above.discard(number)
+        number += 1
+    state[0] = number + 1
+    return f'{stem}-{number}'
+
+
+def allocate_slugs(queryset, bases, numbers=None):
+    """
+    Разные свободные slug для списка желаемых slug bases.
+
+    Свободные основы отсекаются одним запросом по уникальному индексу;
+    номера читаются только для занятых и повторяющихся основ.
+    В словаре numbers номера запоминаются между вызовами, так что
+    при загрузке тысяч одинаковых заголовков диапазон основы читается
+    один раз, а не в каждой порции. Если его данные устарели, словарь
+    нужно очистить.
+    """
+    max_length = queryset.model._meta.get_field('slug').max_length
+    numbers = {} if numbers is None else numbers
+    counts = Counter(bases)
+    taken = set(
+        queryset.filter(slug__in=list(counts)).values_list('slug', flat=True)
+    )
+    stems = {
+        slug_stem(base, max_length) for base, count in counts.items()
+        if count > 1 or base in taken
+    }
+    numbers.update(read_numbers(queryset, stems - numbers.keys()))
+    slugs = []
+    for base in bases:
+        slug = base
+        if base in taken:
+            stem = slug_stem(base, max_length)
+            slug = next_free(stem, numbers[stem], taken)
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
@@ -0,0 +1,163 @@
+"""
+Синхронизация клиентов по номерам изменений.
+
+Каждая запись заметки получает следующий номер из счётчика
+ChangeCounter (Note.change_seq), а удаление оставляет след
+NoteTombstone со своим номером. Клиент присылает последний номер,
+который он видел, и получает только более поздние изменения: заметки
+и следы читаются одним запросом по индексам (автор, change_seq),
+поэтому синхронизация без изменений — один пустой поиск по индексу,
+а объём ответа зависит от числа изменений, а не заметок.
+
+Номер берётся в той же транзакции, что и запись. SQLite пускает
+писать только одну транзакцию за раз, поэтому изменения фиксируются
+в порядке номеров и клиент не пропустит изменение, которое
+закоммитили позже, но с меньшим номером.
+
+Номера, индекс поиска и кеш страниц обновляет Note.save() со своими
+сигналами. QuerySet.update(), bulk_create() и bulk_update() их
+обходят: код, пишущий заметки пакетно, сам резервирует номера через
+reserve_changes(), индексирует заметки через search.index_notes()
+или search.write() и сбрасывает кеш через cache.bump_versions(),
+как transfer.write_batch и команда seed. Иначе клиенты синхронизации
+не увидят эти изменения.
+
+Следы удалений копятся, пока их не удалит команда prune_tombstones.
+Она запоминает номер, до которого следы удалены; клиент, который
+отстал сильнее, получает ответ с reset и должен синхронизироваться
+заново с нуля.
+"""
+from django.db import connection, transaction
+from django.http import Http404
+
+from .fields import decompress
+
+COUNTER = 'notes'
+# Номер, до которого включительно удалены следы удалений.
+PRUNED_COUNTER = 'tombstones-pruned'
+INCREMENT_SQL = (
+    'UPDATE notes_changecounter SET value = value + %s WHERE name = %s'
+)
+VALUE_SQL = 'SELECT value FROM notes_changecounter WHERE name = %s'
+# RETURNING есть в SQLite с 3.35.
+RETURNING_SQLITE_VERSION = (3, 35, 0)
+# Строка счётчика создаётся миграцией 0004, но manage.py flush её
+# удаляет: тогда reserve_changes создаёт её заново.
+CREATE_SQL = (
+    'INSERT INTO notes_changecounter (name, value) VALUES (%s, 0) '
+    'ON CONFLICT (name) DO NOTHING'
+)
+# Первая часть отдаёт строку-метку с kind = 2, если следы, нужные
+# клиенту, уже удалены: так проверка обходится без отдельного запроса.
+CHANGES_SQL = """
+    SELECT value, NULL, NULL, NULL, NULL, 2
+    FROM notes_changecounter
+    WHERE name = %s AND value > %s AND %s > 0
+    UNION ALL
+    SELECT * FROM (
+        SELECT change_seq, id, slug, title, text, 0 AS kind
+        FROM notes_note
+        WHERE author_id = %s AND change_seq > %s
+        UNION ALL
+        SELECT change_seq, note_id, slug, NULL, NULL, 1
+        FROM notes_notetombstone
+        WHERE author_id = %s AND change_seq > %s
+        ORDER BY change_seq
+        LIMIT %s
+    ) AS changes
+    ORDER BY 1
+"""
+DELETED = 1
+RESET = 2
+
+
+def supports_returning(using_connection=connection):
+    if using_connection.vendor == 'postgresql':
+        return True
+    return (
+        using_connection.vendor == 'sqlite'
+        and using_connection.Database.sqlite_version_info
+        >= RETURNING_SQLITE_VERSION
+    )
+
+
+def increment(count):
+    """Сдвигает счётчик на count и возвращает новое значение или None."""
+    if supports_returning():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                INCREMENT_SQL + ' RETURNING value', [count, COUNTER]
+            )
+            row = cursor.fetchone()
+    else:
+        with transaction.atomic(savepoint=False), \
+                connection.cursor() as cursor:
+            cursor.execute(INCREMENT_SQL, [count, COUNTER])
+            if not cursor.rowcount:
+                return None
+            cursor.execute(VALUE_SQL, [COUNTER])
+            row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def reserve_changes(count=1):
+    """
+    Резервирует count номеров подряд и возвращает первый из них.
+
+    Без RETURNING счётчик читается отдельным запросом в той же
+    транзакции: строку уже заблокировал UPDATE. Если строки счётчика
+    нет, она создаётся, и счёт начинается заново.
+    """
+    value = increment(count)
+    if value is None:
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_SQL, [COUNTER])
+        value = increment(count)
+    return value - count + 1
+
+
+def parse_since(value):
+    if not value:
+        return 0
+    try:
+        since = int(value)
+    except ValueError:
+        raise Http404('Некорректный номер изменения.')
+    if since < 0:
+        raise Http404('Некорректный номер изменения.')
+    return since
+
+
+def read_changes(author_id, since, limit):
+    """
+    Изменения заметок автора после номера since в порядке номеров.
+
+    Удалённая заметка приходит записью с deleted и без заголовка
+    и текста. Заметка, изменённая несколько раз, приходит один раз,
+    с последним номером. Ответ содержит номер, с которого продолжать,
+    и has_more, если изменения не уместились в limit. Сжатые тексты
+    распаковываются здесь: запрос читает столбец мимо поля модели.
+    Если нужные клиенту следы уже удалены, ответ пуст и содержит
+    reset: клиент должен забыть свои заметки и начать с нуля.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(CHANGES_SQL, [
+            PRUNED_COUNTER, since, since,
+            author_id, since, author_id, since, limit + 1,
+        ])
+        rows = cursor.fetchall()
+    if any(row[5] == RESET for row in rows):
+        return {'changes': [], 'since': 0, 'has_more': True, 'reset': True}
+    changes = []
+    for seq, pk, slug, title, text, kind in rows[:limit]:
+        change = {'seq': seq, 'id': pk, 'slug': slug}
+        if kind == DELETED:
+            change['deleted'] = True
+        else:
+            change.update(title=title, text=decompress(text))
+        changes.append(change)
+    return {
+        'changes': changes,
+        'since': changes[-1]['seq'] if changes else since,
+        'has_more': len(rows) > limit,
+    }
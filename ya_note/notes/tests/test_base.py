@@ -1,14 +1,22 @@
+from pathlib import Path
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from pytils.translit import slugify
 
 from notes.models import Note
+from yanote.benchmarking import Baseline, Timing, run_timed
+from yanote.middleware import enforce_query_budgets
 
 
 User = get_user_model()
 
 
+@enforce_query_budgets()
+# Замеры Server-Timing не пишут в лог тестов; их тест включает их сам.
+@override_settings(SERVER_TIMING_SAMPLE_RATE=0)
 class TestBase(TestCase):
     """Базовый класс тестирования."""
     NOTES_HOME_URL = reverse('notes:home')
@@ -18,6 +26,10 @@ class TestBase(TestCase):
     NOTES_LIST_URL = reverse('notes:list')
     NOTES_ADD_URL = reverse('notes:add')
     NOTES_SUCCESS_URL = reverse('notes:success')
+    NOTES_SEARCH_URL = reverse('notes:search')
+    NOTES_EXPORT_URL = reverse('notes:export')
+    NOTES_IMPORT_URL = reverse('notes:import')
+    NOTES_SYNC_URL = reverse('notes:sync')
     NOTE_TITLE = 'Тестовая заметка'
     NOTE_TEXT = 'Просто текст.'
     NOTE_SLUG = slugify(NOTE_TITLE)
@@ -27,6 +39,9 @@ class TestBase(TestCase):
     NOTES_DETAIL_URL = reverse('notes:detail', args=(NOTE_SLUG,))
     NOTES_EDIT_URL = reverse('notes:edit', args=(NOTE_SLUG,))
     NOTES_DELETE_URL = reverse('notes:delete', args=(NOTE_SLUG,))
+    BENCHMARK_BASELINE = Baseline(
+        Path(__file__).resolve().parent / 'benchmarks.json'
+    )
 
     @classmethod
     def setUpTestData(cls):
@@ -42,3 +57,20 @@ class TestBase(TestCase):
             text=cls.NOTE_TEXT,
             author=cls.author
         )
+
+    def setUp(self):
+        """Страницы в кеше не должны переживать откат данных теста."""
+        cache.clear()
+
+    def benchmark(self, name, func, **kwargs):
+        """
+        Замеряет func и сравнивает с базовым замером.
+
+        Тест падает, если func стала медленнее базового замера
+        больше чем на допуск из BENCHMARK_TOLERANCE.
+        """
+        timing = Timing(name, run_timed(func, **kwargs))
+        message = self.BENCHMARK_BASELINE.check(timing)
+        if message:
+            self.fail(message)
+        return timing
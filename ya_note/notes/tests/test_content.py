@@ -1,7 +1,15 @@
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
 
 from notes.forms import NoteForm
-from notes.models import Note
+from notes.models import ChangeCounter, Note, NoteTombstone
+from notes.sync import COUNTER, reserve_changes
+from notes.views import NoteDetail
 
 from .test_base import TestBase
 
@@ -34,6 +42,30 @@ class TestDetailPage(TestBase):
         sorted_notes_id = sorted(all_notes_id)
         self.assertEqual(all_notes_id, sorted_notes_id)
 
+    @override_settings(NOTES_COUNT_ON_PAGE=7)
+    def test_notes_list_pages(self):
+        """Тест: список заметок выводится страницами по курсору
+        без пропусков и повторов и без загрузки текста заметок.
+        """
+        seen = []
+        url = self.NOTES_LIST_URL
+        while url:
+            response = self.author_client.get(url)
+            page = response.context['page']
+            self.assertLessEqual(len(page), 7)
+            for note in page:
+                self.assertIn('text', note.get_deferred_fields())
+            seen.extend(note.id for note in page)
+            url = page.has_next and (
+                f'{self.NOTES_LIST_URL}?cursor={page.next_cursor}'
+            )
+        self.assertEqual(
+            seen,
+            list(Note.objects.filter(
+                author=self.author
+            ).order_by('id').values_list('id', flat=True)),
+        )
+
     def test_notes_list_for_different_users(self):
         """Тест: отдельная заметка передаётся на страницу со списком заметок
         в списке object_list в словаре contextв и список заметок
@@ -62,3 +94,281 @@ class TestDetailPage(TestBase):
             with self.subTest():
                 self.assertIn('form', response.context)
                 self.assertIsInstance(response.context['form'], NoteForm)
+
+
+class TestSearch(TestBase):
+    """Тестирование поиска по заметкам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Подготовка фиксур"""
+        super(TestSearch, cls).setUpTestData()
+        cls.reader_note = Note.objects.create(
+            title='Чужая заметка',
+            text='Сенсация из чужих заметок.',
+            author=cls.reader,
+        )
+
+    def search(self, query, **params):
+        response = self.author_client.get(
+            self.NOTES_SEARCH_URL, {'q': query, **params}
+        )
+        return response.context['results']
+
+    def test_search_finds_only_own_notes(self):
+        """Тест: поиск находит заметки автора по заголовку и тексту
+        с фрагментом текста, но не находит чужие заметки.
+        """
+        note = Note.objects.create(
+            title='Сенсация', text='Тут есть сенсация и прочее.',
+            author=self.author,
+        )
+        self.assertEqual(list(self.search('сенсац*')), [note])
+        self.assertEqual(list(self.search('просто')), [self.note])
+        self.assertIn('<mark>сенсация</mark>', self.search('сенсация')
+                      .results[0].snippet)
+
+    def test_search_index_follows_edits_and_deletes(self):
+        """Тест: после правки заметка ищется по новому тексту, а после
+        удаления не находится совсем.
+        """
+        response = self.author_client.post(self.NOTES_EDIT_URL, {
+            'title': self.note.title, 'text': 'Новый текст',
+            'slug': self.note.slug,
+        })
+        self.assertRedirects(response, self.NOTES_SUCCESS_URL)
+        self.assertEqual(len(self.search('просто')), 0)
+        self.assertEqual(list(self.search('новый')), [self.note])
+        self.author_client.post(self.NOTES_DELETE_URL)
+        self.assertEqual(len(self.search('новый')), 0)
+
+    def test_deferred_note_deleted(self):
+        """Тест: заметка, загруженная без полей индекса, удаляется
+        и пропадает из поиска, а после неё остаётся след.
+        """
+        Note.objects.only('id').get(pk=self.note.pk).delete()
+        self.assertFalse(Note.objects.filter(pk=self.note.pk).exists())
+        self.assertEqual(len(self.search('просто')), 0)
+        self.assertTrue(
+            NoteTombstone.objects.filter(
+                note_id=self.note.pk, slug=self.note.slug
+            ).exists()
+        )
+
+    def test_search_ranks_all_matches(self):
+        """Тест: лучшее совпадение идёт первым, даже если это самая
+        старая из найденных заметок.
+        """
+        best = Note.objects.create(
+            title='Отчёт', text='Отчёт за год.', slug='best',
+            author=self.author,
+        )
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {index}',
+                text=f'Длинный текст номер {index}, где отчёт упомянут.',
+                slug=f'report-{index}', author=self.author,
+            )
+            for index in range(30)
+        )
+        call_command('rebuild_search_index')
+        self.assertEqual(self.search('отчёт').results[0], best)
+
+    def test_search_next_page(self):
+        """Тест: вторая страница результатов продолжает первую."""
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {index}', text='Повтор повтор.',
+                slug=f'povtor-{index}', author=self.author,
+            )
+            for index in range(25)
+        )
+        call_command('rebuild_search_index')
+        first = self.search('повтор')
+        self.assertEqual(len(first), 20)
+        self.assertTrue(first.has_next)
+        second = self.search('повтор', cursor=first.next_cursor)
+        self.assertEqual(len(second), 5)
+        self.assertFalse(set(first) & set(second))
+
+
+class TestSync(TestBase):
+    """Тестирование синхронизации заметок."""
+
+    def sync(self, since=None):
+        params = {} if since is None else {'since': since}
+        return self.author_client.get(self.NOTES_SYNC_URL, params).json()
+
+    def test_sync_returns_only_new_changes(self):
+        """Тест: синхронизация отдаёт заметки автора, затем только
+        изменённые после курсора, а удалённые — следами.
+        """
+        Note.objects.create(
+            title='Чужая', text='Текст', author=self.reader
+        )
+        first = self.sync()
+        self.assertEqual(first['changes'], [{
+            'seq': self.note.change_seq, 'id': self.note.pk,
+            'slug': self.note.slug, 'title': self.note.title,
+            'text': self.note.text,
+        }])
+        self.assertEqual(self.sync(first['since'])['changes'], [])
+        self.author_client.post(self.NOTES_EDIT_URL, {
+            'title': self.note.title, 'text': 'Новый текст',
+            'slug': self.note.slug,
+        })
+        changed = self.sync(first['since'])['changes']
+        self.assertEqual(
+            [(change['id'], change['text']) for change in changed],
+            [(self.note.pk, 'Новый текст')],
+        )
+        self.author_client.post(self.NOTES_DELETE_URL)
+        deleted = self.sync(changed[0]['seq'])['changes']
+        self.assertEqual(
+            [(change['id'], change.get('deleted')) for change in deleted],
+            [(self.note.pk, True)],
+        )
+        self.assertGreater(deleted[0]['seq'], changed[0]['seq'])
+
+    @override_settings(NOTES_SYNC_PAGE_SIZE=2)
+    def test_sync_pages(self):
+        """Тест: изменения, не уместившиеся в страницу, отдаются
+        со следующего запроса, а синхронизация без изменений стоит
+        одного запроса к заметкам.
+        """
+        for index in range(2):
+            Note.objects.create(
+                title=f'Заметка {index}', text='Текст', author=self.author
+            )
+        first = self.sync()
+        self.assertTrue(first['has_more'])
+        second = self.sync(first['since'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(
+            len(first['changes']) + len(second['changes']), 3
+        )
+        # Сессия, пользователь и один запрос изменений вместе
+        # с проверкой удалённых следов.
+        with self.assertNumQueries(3):
+            self.assertEqual(self.sync(second['since'])['changes'], [])
+
+    def test_pruned_tombstones_reset_lagging_clients(self):
+        """Тест: после удаления старых следов отставший клиент
+        получает reset, а догнавший — обычные изменения.
+        """
+        since = self.sync()['since']
+        self.author_client.post(self.NOTES_DELETE_URL)
+        latest = self.sync()['since']
+        call_command('prune_tombstones', keep=0, stdout=StringIO())
+        self.assertFalse(NoteTombstone.objects.exists())
+        self.assertEqual(self.sync(since), {
+            'changes': [], 'since': 0, 'has_more': True, 'reset': True,
+        })
+        with self.assertNumQueries(3):
+            self.assertNotIn('reset', self.sync(latest))
+
+    def test_reserve_changes_without_returning(self):
+        """Тест: без RETURNING номера резервируются подряд."""
+        first = reserve_changes(3)
+        with mock.patch('notes.sync.supports_returning', return_value=False):
+            self.assertEqual(reserve_changes(2), first + 3)
+        self.assertEqual(reserve_changes(), first + 5)
+
+    def test_counter_recreated_after_flush(self):
+        """Тест: после удаления строки счётчика (manage.py flush)
+        заметки снова сохраняются, а номера идут с начала.
+        """
+        for returning in (True, False):
+            with self.subTest(returning=returning), mock.patch(
+                    'notes.sync.supports_returning', return_value=returning
+            ):
+                ChangeCounter.objects.filter(name=COUNTER).delete()
+                note = Note.objects.create(
+                    title='После flush', text='Текст', author=self.author
+                )
+                self.assertEqual(note.change_seq, 1)
+
+
+class TestPageCache(TestBase):
+    """Тестирование кеша страниц заметок."""
+
+    @staticmethod
+    def headers(response):
+        """Заголовки ответа, кроме разбивки времени обработки."""
+        return {
+            header: value for header, value in response.items()
+            if header != 'Server-Timing'
+        }
+
+    def test_cached_pages_follow_changes(self):
+        """Тест: повторный запрос отдаётся из кеша с теми же
+        заголовками, а после правки заметки страница и её ETag
+        обновляются.
+        """
+        render = NoteDetail.render_to_response
+
+        def render_in_russian(view, context, **kwargs):
+            response = render(view, context, **kwargs)
+            response['Content-Language'] = 'ru'
+            return response
+
+        with mock.patch.object(
+                NoteDetail, 'render_to_response', render_in_russian
+        ):
+            first = self.author_client.get(self.NOTES_DETAIL_URL)
+            cached = self.author_client.get(self.NOTES_DETAIL_URL)
+        self.assertIsNotNone(first.context)
+        self.assertIsNone(cached.context)
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['Content-Language'], 'ru')
+        self.assertEqual(self.headers(cached), self.headers(first))
+        not_modified = self.author_client.get(
+            self.NOTES_DETAIL_URL, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        self.author_client.post(self.NOTES_EDIT_URL, {
+            'title': self.note.title, 'text': 'Новый текст',
+            'slug': self.note.slug,
+        })
+        changed = self.author_client.get(
+            self.NOTES_DETAIL_URL, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(changed.status_code, HTTPStatus.OK)
+        self.assertContains(changed, 'Новый текст')
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_missing_note_not_revalidated(self):
+        """Тест: ответ 404 не получает ETag, а повторная проверка
+        страницы удалённой заметки её прежним ETag даёт 404, а не 304.
+        """
+        response = self.reader_client.get(self.NOTES_DETAIL_URL)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertNotIn('ETag', response)
+        etag = self.author_client.get(self.NOTES_DETAIL_URL)['ETag']
+        self.author_client.post(self.NOTES_DELETE_URL)
+        response = self.author_client.get(self.NOTES_DETAIL_URL)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertNotIn('ETag', response)
+        for if_none_match in (etag, '*'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.author_client.get(
+                    self.NOTES_DETAIL_URL, HTTP_IF_NONE_MATCH=if_none_match
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_FOUND
+                )
+
+    def test_cache_is_per_user(self):
+        """Тест: страница из кеша одного пользователя не достаётся
+        другому, а список обновляется после удаления заметки.
+        """
+        self.author_client.get(self.NOTES_LIST_URL)
+        response = self.reader_client.get(self.NOTES_DETAIL_URL)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertNotContains(
+            self.reader_client.get(self.NOTES_LIST_URL), self.NOTE_TITLE
+        )
+        self.author_client.post(self.NOTES_DELETE_URL)
+        self.assertNotContains(
+            self.author_client.get(self.NOTES_LIST_URL), self.NOTE_TITLE
+        )
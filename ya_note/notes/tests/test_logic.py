@@ -1,11 +1,29 @@
+import csv
+import importlib
+import json
+import random
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import SimpleTestCase
+from django.urls import reverse
+from pytils import translit as pytils_translit
 from pytils.translit import slugify
 
 from .test_base import TestBase
-from notes.forms import WARNING
+from notes import fields
+from notes.forms import WARNING, NoteForm
 from notes.models import Note
+from notes.search import SearchResults
+from notes.sync import read_changes
+from notes.transfer import TransferError, import_notes, read_json_lines
+from notes.translit import TABLE, slugify_many
 
 User = get_user_model()
 
@@ -57,6 +75,24 @@ class TestNoteCreation(TestBase):
         )
         self.assertEqual(Note.objects.count(), 1)
 
+    def test_slug_taken_after_validation(self):
+        """Тест: Если явный slug занят уже после проверки формы,
+        пользователь видит ошибку формы, а не ошибку сервера.
+        """
+        self.form_data['slug'] = self.note.slug
+        with mock.patch.object(
+                NoteForm, 'clean_slug',
+                lambda form: form.cleaned_data['slug'],
+        ):
+            response = self.author_client.post(
+                self.NOTES_ADD_URL,
+                data=self.form_data
+            )
+        self.assertFormError(
+            response, 'form', 'slug', errors=(self.note.slug + WARNING)
+        )
+        self.assertEqual(Note.objects.count(), 1)
+
     def test_empty_slug(self):
         """Тест: Если при создании заметки не заполнен slug,
         то он формируется автоматически,
@@ -74,6 +110,41 @@ class TestNoteCreation(TestBase):
         expected_slug = slugify(self.form_data['title'])
         self.assertEqual(new_note.slug, expected_slug)
 
+    def test_same_title_gets_lowest_free_suffix(self):
+        """Тест: Заметки с одинаковым заголовком получают slug
+        с наименьшим свободным номером.
+        """
+        self.form_data.pop('slug')
+        for _ in range(3):
+            self.author_client.post(self.NOTES_ADD_URL, data=self.form_data)
+        Note.objects.filter(slug=f'{self.NEW_NOTE_SLUG}-1').delete()
+        note = Note.objects.create(
+            title=self.NEW_NOTE_TITLE, text='Текст', author=self.author
+        )
+        self.assertEqual(note.slug, f'{self.NEW_NOTE_SLUG}-1')
+        self.assertCountEqual(
+            Note.objects.filter(
+                title=self.NEW_NOTE_TITLE
+            ).values_list('slug', flat=True),
+            [self.NEW_NOTE_SLUG, *(
+                f'{self.NEW_NOTE_SLUG}-{number}' for number in (1, 2)
+            )],
+        )
+
+    def test_slug_allocation_retries_after_race(self):
+        """Тест: Если подобранный slug успел занять другой запрос,
+        slug подбирается заново.
+        """
+        with mock.patch(
+                'notes.models.allocate_slug',
+                side_effect=[self.note.slug, self.NEW_NOTE_SLUG],
+        ):
+            note = Note.objects.create(
+                title=self.NEW_NOTE_TITLE, text='Текст', author=self.author
+            )
+        self.assertEqual(note.slug, self.NEW_NOTE_SLUG)
+        self.assertEqual(Note.objects.count(), 2)
+
 
 class TestNoteEditDelete(TestBase):
     """Тестирование логики редактирования и удаления заметок."""
@@ -129,3 +200,281 @@ class TestNoteEditDelete(TestBase):
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         new_notes_count = Note.objects.count()
         self.assertEqual(new_notes_count, notes_count)
+
+
+class TestSeed(TestBase):
+    """Тестирование команды наполнения базы."""
+
+    def test_seed_creates_skewed_notes(self):
+        """Тест: Команда seed создаёт заметки с корректными slug,
+        распределяя их по авторам неравномерно.
+        """
+        call_command('seed', users=3, notes=60, stdout=StringIO())
+        notes = Note.objects.filter(author__username__startswith='seed-0-')
+        self.assertEqual(notes.count(), 60)
+        counts = sorted(
+            notes.values('author').annotate(
+                total=Count('pk')
+            ).values_list('total', flat=True)
+        )
+        self.assertEqual(counts, [10, 17, 33])
+        for note in notes:
+            self.assertTrue(note.slug.startswith(slugify(note.title)))
+
+    def test_seed_can_run_twice(self):
+        """Тест: Повторный запуск seed с тем же зерном добавляет
+        заметки тем же пользователям, не повторяя slug.
+        """
+        for _ in range(2):
+            call_command('seed', users=3, notes=30, stdout=StringIO())
+        notes = Note.objects.filter(author__username__startswith='seed-0-')
+        self.assertEqual(notes.count(), 60)
+        self.assertEqual(notes.values('author').distinct().count(), 3)
+
+
+class TestTransfer(TestBase):
+    """Тестирование выгрузки и загрузки заметок."""
+
+    def upload(self, client, name, content):
+        return client.post(self.NOTES_IMPORT_URL, {
+            'file': SimpleUploadedFile(name, content.encode()),
+        })
+
+    def test_export_and_import_between_users(self):
+        """Тест: Выгрузку автора можно загрузить другому пользователю;
+        занятые slug заменяются свободными, а заметки попадают в поиск.
+        """
+        response = self.author_client.get(self.NOTES_EXPORT_URL)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(
+            [json.loads(line) for line in content.splitlines()],
+            [{'title': self.NOTE_TITLE, 'text': self.NOTE_TEXT,
+              'slug': self.NOTE_SLUG}],
+        )
+        response = self.upload(self.reader_client, 'notes.jsonl', content)
+        self.assertEqual(response.context['stats']['created'], 1)
+        self.assertEqual(response.context['stats']['renamed'], 1)
+        imported = Note.objects.get(author=self.reader)
+        self.assertEqual(imported.slug, f'{self.NOTE_SLUG}-1')
+        self.assertEqual(imported.text, self.NOTE_TEXT)
+        self.assertEqual(
+            list(SearchResults(Note.objects.all(), self.reader.pk,
+                               'просто', 10)),
+            [imported],
+        )
+
+    def test_csv_import_skips_invalid_records(self):
+        """Тест: Загрузка CSV пропускает негодные записи и подбирает
+        разные slug одинаковым заголовкам внутри файла.
+        """
+        rows = [
+            ('title', 'text', 'slug'),
+            (self.NOTE_TITLE, 'Первая', ''),
+            (self.NOTE_TITLE, 'Вторая', ''),
+            ('', 'Без заголовка', ''),
+            ('Плохой slug', 'Текст', 'не slug'),
+            ('Своя', 'Текст', 'svoya'),
+        ]
+        buffer = StringIO()
+        csv.writer(buffer).writerows(rows)
+        response = self.upload(
+            self.author_client, 'notes.csv', buffer.getvalue()
+        )
+        stats = response.context['stats']
+        self.assertEqual(
+            (stats['read'], stats['created'], stats['invalid']), (5, 3, 2)
+        )
+        self.assertEqual(
+            set(Note.objects.values_list('slug', flat=True)),
+            {self.NOTE_SLUG, f'{self.NOTE_SLUG}-1', f'{self.NOTE_SLUG}-2',
+             'svoya'},
+        )
+        response = self.author_client.get(
+            self.NOTES_EXPORT_URL, {'format': 'csv'}
+        )
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(list(csv.DictReader(StringIO(content)))), 4)
+
+    def test_import_numbers_slugs_across_batches(self):
+        """Тест: Одинаковые заголовки из разных порций получают
+        подряд идущие свободные номера.
+        """
+        Note.objects.create(
+            title='Другая', text='Текст', slug=f'{self.NOTE_SLUG}-2',
+            author=self.author,
+        )
+        stats = import_notes(
+            [{'title': self.NOTE_TITLE, 'text': 'Текст'}] * 5,
+            self.reader, batch_size=2,
+        )
+        self.assertEqual(stats['created'], 5)
+        self.assertEqual(
+            sorted(Note.objects.filter(author=self.reader).values_list(
+                'slug', flat=True
+            )),
+            [f'{self.NOTE_SLUG}-{number}' for number in (1, 3, 4, 5, 6)],
+        )
+
+    def test_csv_round_trip_of_large_note(self):
+        """Тест: Заметку длиннее 128 КБ из выгрузки CSV можно загрузить
+        обратно.
+        """
+        text = 'длинный текст ' * 15_000
+        Note.objects.filter(pk=self.note.pk).update(text=text)
+        response = self.author_client.get(
+            self.NOTES_EXPORT_URL, {'format': 'csv'}
+        )
+        content = b''.join(response.streaming_content).decode()
+        response = self.upload(self.reader_client, 'notes.csv', content)
+        self.assertEqual(response.context['stats']['created'], 1)
+        self.assertEqual(Note.objects.get(author=self.reader).text, text)
+
+    def test_import_saves_nothing_when_file_breaks(self):
+        """Тест: Ошибка в конце файла откатывает уже записанные порции."""
+        lines = [
+            json.dumps({'title': f'Заметка {index}', 'text': 'Текст'})
+            for index in range(5)
+        ]
+        with self.assertRaises(TransferError):
+            import_notes(
+                read_json_lines([*lines, '{"title": ']), self.reader,
+                batch_size=2,
+            )
+        self.assertFalse(Note.objects.filter(author=self.reader).exists())
+
+    def test_import_rejects_unreadable_file(self):
+        """Тест: Файл неизвестного формата или с битым JSON
+        не загружается.
+        """
+        for name, content in (
+            ('notes.txt', 'текст'),
+            ('notes.jsonl', '{"title": '),
+        ):
+            with self.subTest(name=name):
+                response = self.upload(self.author_client, name, content)
+                self.assertTrue(response.context['form'].errors)
+        self.assertEqual(Note.objects.count(), 1)
+
+
+class TestCompressedText(TestBase):
+    """Тестирование сжатого хранения текста заметок."""
+    LARGE_TEXT = ''.join(
+        f'2026-10-18 12:00:{index % 60:02d} INFO worker-{index % 8} '
+        f'обработан запрос {index}\n'
+        for index in range(200)
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        """Подготовка фиксур"""
+        super(TestCompressedText, cls).setUpTestData()
+        cls.large = Note.objects.create(
+            title='Журнал', text=cls.LARGE_TEXT, slug='log',
+            author=cls.author,
+        )
+
+    def stored(self, note):
+        """Класс хранения и размер текста заметки в базе."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT typeof(text), length(CAST(text AS BLOB)) '
+                'FROM notes_note WHERE id = %s', [note.pk]
+            )
+            return cursor.fetchone()
+
+    def test_large_text_is_stored_compressed(self):
+        """Тест: Длинный текст хранится сжатым, короткий — как есть,
+        а читается одинаково.
+        """
+        storage, size = self.stored(self.large)
+        self.assertEqual(storage, 'blob')
+        self.assertLess(size * 4, len(self.LARGE_TEXT.encode()))
+        self.assertEqual(self.stored(self.note)[0], 'text')
+        self.assertEqual(
+            Note.objects.get(pk=self.large.pk).text, self.LARGE_TEXT
+        )
+        self.assertEqual(
+            read_changes(self.author.pk, 0, 10)['changes'][-1]['text'],
+            self.LARGE_TEXT,
+        )
+        self.assertEqual(
+            list(SearchResults(Note.objects.all(), self.author.pk,
+                               'обработан', 10)),
+            [self.large],
+        )
+
+    def test_text_is_decompressed_only_when_read(self):
+        """Тест: Список заметок и сохранение полей вне поискового
+        индекса не распаковывают текст, а страница заметки показывает его.
+        """
+        with mock.patch.object(
+            fields, 'decompress', wraps=fields.decompress
+        ) as decompress:
+            self.author_client.get(self.NOTES_LIST_URL)
+            note = Note.objects.get(pk=self.large.pk)
+            note.slug = 'new-log'
+            note.save(update_fields=['slug'])
+            self.assertEqual(decompress.call_count, 0)
+            response = self.author_client.get(
+                reverse('notes:detail', args=(note.slug,))
+            )
+            self.assertEqual(decompress.call_count, 1)
+        self.assertContains(response, 'worker-7')
+        self.assertEqual(self.stored(self.large)[0], 'blob')
+
+    def test_migration_converts_existing_texts(self):
+        """Тест: Миграция сжимает длинные тексты, записанные как есть,
+        и распаковывает их обратно при откате.
+        """
+        migration = importlib.import_module(
+            'notes.migrations.0005_note_text_compressed'
+        )
+        schema_editor = mock.Mock(connection=connection)
+        migration.decompress_texts(None, schema_editor)
+        self.assertEqual(self.stored(self.large)[0], 'text')
+        migration.compress_texts(None, schema_editor)
+        self.assertEqual(self.stored(self.large)[0], 'blob')
+        self.assertEqual(self.stored(self.note)[0], 'text')
+        self.assertEqual(
+            Note.objects.get(pk=self.large.pk).text, self.LARGE_TEXT
+        )
+
+
+class TestTranslit(SimpleTestCase):
+    """Сравнение быстрого slugify с pytils."""
+    CORPUS_SIZE = 30_000
+    CHARS = (
+        'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+        'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+        'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+        ' \t\n\xa0\u2009-_.,!?;:&\'"`#№…–—‒−«»“”‘’()/\\ßİΣéǅ😀\u0301'
+    )
+
+    def test_slugify_matches_pytils(self):
+        """Тест: slug совпадают с pytils на случайных строках
+        и на каждом символе первых 12 тысяч кодовых точек.
+        """
+        rng = random.Random(0)
+        corpus = [
+            ''.join(rng.choices(self.CHARS, k=rng.randint(0, 40)))
+            for _ in range(self.CORPUS_SIZE)
+        ]
+        corpus += ['&amp;' + text for text in corpus[:1000]]
+        corpus += [f'а{chr(code)}б' for code in range(0x3000)]
+        mismatches = [
+            (text, expected, actual)
+            for text, expected, actual in zip(
+                corpus,
+                map(pytils_translit.slugify, corpus),
+                slugify_many(corpus),
+            )
+            if expected != actual
+        ]
+        self.assertEqual(mismatches[:10], [])
+
+    def test_table_does_not_grow(self):
+        """Тест: символы не из алфавита не добавляются в таблицу."""
+        size = len(TABLE)
+        slugify_many([''.join(map(chr, range(0x4e00, 0x5e00)))])
+        self.assertEqual(len(TABLE), size)
@@ -0,0 +1,331 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.urls import reverse
+
+from .test_base import TestBase
+from notes import translit
+from notes.cache import bump_versions
+from notes.models import Note
+from notes.pagination import AFTER, KeysetPaginator
+from notes.search import index_notes
+from notes.transfer import import_notes
+from notes.slugs import allocate_slug
+
+
+class TestPerformance(TestBase):
+    """Замеры скорости основных страниц."""
+    NOTES_COUNT = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        """Подготовка фиксур"""
+        super(TestPerformance, cls).setUpTestData()
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {index}',
+                text='Просто текст.',
+                slug=f'note-{index}',
+                author=cls.author,
+            )
+            for index in range(cls.NOTES_COUNT)
+        )
+
+    def test_notes_list_speed(self):
+        """Тест: Список заметок не медленнее базового замера."""
+        def get_list():
+            response = self.author_client.get(self.NOTES_LIST_URL)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        self.benchmark('NotesList', get_list)
+
+    def test_note_detail_speed(self):
+        """Тест: Страница заметки не медленнее базового замера."""
+        def get_detail():
+            response = self.author_client.get(self.NOTES_DETAIL_URL)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        self.benchmark('NoteDetail', get_detail)
+
+
+class TestSlugPerformance(TestBase):
+    """Замер подбора slug среди заметок с одинаковым заголовком."""
+    NOTES_COUNT = 10_000
+
+    @classmethod
+    def setUpTestData(cls):
+        """Подготовка фиксур"""
+        super(TestSlugPerformance, cls).setUpTestData()
+        Note.objects.bulk_create((
+            Note(
+                title=cls.NOTE_TITLE,
+                text='Просто текст.',
+                slug=f'{cls.NOTE_SLUG}-{index}',
+                author=cls.author,
+            )
+            for index in range(1, cls.NOTES_COUNT)
+        ), batch_size=1000)
+
+    def test_slug_allocation_speed(self):
+        """Тест: Подбор slug среди 10 000 одноимённых заметок
+        не медленнее базового замера.
+        """
+        expected = f'{self.NOTE_SLUG}-{self.NOTES_COUNT}'
+
+        def allocate():
+            self.assertEqual(
+                allocate_slug(Note.objects.all(), self.NOTE_TITLE), expected
+            )
+
+        self.benchmark('SlugAllocation10k', allocate)
+
+
+class TestSlugifyPerformance(TestBase):
+    """Замер транслитерации заголовков без кеша."""
+    TITLES = [
+        f'Заметка номер {index} — «черновик» & итоги'
+        for index in range(10_000)
+    ]
+
+    def test_slugify_many_speed(self):
+        """Тест: slug 10 000 разных заголовков считаются
+        не медленнее базового замера.
+        """
+        def slugify_titles():
+            translit.slugify.cache_clear()
+            translit.slugify_many(self.TITLES)
+
+        self.benchmark('Slugify10k', slugify_titles)
+
+
+class TestNotesListPerformance(TestBase):
+    """Замер списка заметок у пользователя с 20 000 заметок."""
+    NOTES_COUNT = 20_000
+
+    @classmethod
+    def setUpTestData(cls):
+        """Подготовка фиксур"""
+        super(TestNotesListPerformance, cls).setUpTestData()
+        Note.objects.bulk_create((
+            Note(
+                title=f'Заметка {index}',
+                text='Просто текст. ' * 50,
+                slug=f'note-{index}',
+                author=cls.author,
+            )
+            for index in range(cls.NOTES_COUNT)
+        ), batch_size=1000)
+
+    def test_notes_list_speed_with_many_notes(self):
+        """Тест: первая и последняя страницы списка из 20 000 заметок
+        не медленнее базового замера.
+        """
+        last_ids = Note.objects.filter(author=self.author).order_by(
+            '-id'
+        ).values_list('id', flat=True)[:settings.NOTES_COUNT_ON_PAGE + 1]
+        cursor = KeysetPaginator(
+            Note.objects.all(), ('id',), settings.NOTES_COUNT_ON_PAGE
+        ).encode(AFTER, Note(id=last_ids[len(last_ids) - 1]))
+        for name, url in (
+            ('NotesList20kFirstPage', self.NOTES_LIST_URL),
+            ('NotesList20kLastPage', f'{self.NOTES_LIST_URL}?cursor={cursor}'),
+        ):
+            def get_list():
+                bump_versions([self.author.pk])
+                response = self.author_client.get(url)
+                self.assertEqual(
+                    len(response.context['page']),
+                    settings.NOTES_COUNT_ON_PAGE,
+                )
+
+            with self.subTest(name=name):
+                self.benchmark(name, get_list)
+
+    def test_notes_list_speed_from_cache(self):
+        """Тест: первая страница списка из 20 000 заметок из кеша
+        и ответ 304 по ETag не медленнее базового замера.
+        """
+        etag = self.author_client.get(self.NOTES_LIST_URL)['ETag']
+
+        def get_cached():
+            response = self.author_client.get(self.NOTES_LIST_URL)
+            self.assertIsNone(response.context)
+
+        def get_not_modified():
+            response = self.author_client.get(
+                self.NOTES_LIST_URL, HTTP_IF_NONE_MATCH=etag
+            )
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        for name, func in (
+            ('NotesList20kWarm', get_cached),
+            ('NotesList20kNotModified', get_not_modified),
+        ):
+            with self.subTest(name=name):
+                self.benchmark(name, func)
+
+    def test_sync_speed_without_changes(self):
+        """Тест: синхронизация без изменений у пользователя
+        с 20 000 заметок не медленнее базового замера.
+        """
+        since = Note.objects.order_by('-change_seq').first().change_seq
+
+        def sync():
+            response = self.author_client.get(
+                self.NOTES_SYNC_URL, {'since': since}
+            )
+            self.assertEqual(response.json()['changes'], [])
+
+        self.benchmark('NoteSync20kNoChanges', sync)
+
+
+class TestSearchPerformance(TestBase):
+    """Замер поиска у двух пользователей по 20 000 заметок."""
+    NOTES_COUNT = 20_000
+
+    @classmethod
+    def setUpTestData(cls):
+        """Подготовка фиксур"""
+        super(TestSearchPerformance, cls).setUpTestData()
+        Note.objects.bulk_create((
+            Note(
+                title=f'Заметка {index}',
+                text=f'Общее слово и редкое{index % 500}. ' * 20,
+                slug=f'note-{author.pk}-{index}',
+                author=author,
+            )
+            for author in (cls.author, cls.reader)
+            for index in range(cls.NOTES_COUNT)
+        ), batch_size=1000)
+        index_notes(Note.objects.values_list(
+            'id', 'title', 'text', 'author_id'
+        ).iterator())
+
+    def test_search_speed(self):
+        """Тест: поиск по частому и редкому слову не медленнее
+        базового замера.
+        """
+        for name, query in (
+            ('NoteSearch20kCommon', 'общее'),
+            ('NoteSearch20kRare', 'редкое7'),
+        ):
+            def search():
+                response = self.author_client.get(
+                    self.NOTES_SEARCH_URL, {'q': query}
+                )
+                self.assertEqual(
+                    len(response.context['results']),
+                    settings.NOTES_SEARCH_RESULTS_ON_PAGE,
+                )
+
+            with self.subTest(name=name):
+                self.benchmark(name, search)
+
+
+class TestTransferPerformance(TestBase):
+    """Замер выгрузки и загрузки заметок."""
+    NOTES_COUNT = 20_000
+    IMPORT_COUNT = 5_000
+
+    @classmethod
+    def setUpTestData(cls):
+        """Подготовка фиксур"""
+        super(TestTransferPerformance, cls).setUpTestData()
+        Note.objects.bulk_create((
+            Note(
+                title=f'Заметка {index}',
+                text='Просто текст. ' * 20,
+                slug=f'zametka-{index}',
+                author=cls.author,
+            )
+            for index in range(cls.NOTES_COUNT)
+        ), batch_size=1000)
+
+    def test_export_speed(self):
+        """Тест: Выгрузка 20 000 заметок не медленнее базового замера."""
+        def export():
+            response = self.author_client.get(self.NOTES_EXPORT_URL)
+            self.assertTrue(b''.join(response.streaming_content))
+
+        self.benchmark('NotesExport20k', export)
+
+    def test_import_speed(self):
+        """Тест: Загрузка 5 000 заметок, заголовки которых совпадают
+        с уже существующими, не медленнее базового замера.
+        """
+        records = [
+            {'title': f'Заметка {index % 500}', 'text': 'Новый текст.'}
+            for index in range(self.IMPORT_COUNT)
+        ]
+
+        def load():
+            with transaction.atomic():
+                stats = import_notes(records, self.reader)
+                transaction.set_rollback(True)
+            self.assertEqual(stats['created'], self.IMPORT_COUNT)
+
+        self.benchmark('NotesImport5k', load)
+
+
+class TestCompressionPerformance(TestBase):
+    """Замер хранения и чтения 2 000 длинных заметок-журналов."""
+    NOTES_COUNT = 2_000
+    LOG_TEXT = ''.join(
+        f'2026-10-18 12:{index // 60 % 60:02d}:{index % 60:02d} '
+        f'INFO worker-{index % 8} обработан запрос {index} '
+        f'за {index % 97} мс\n'
+        for index in range(300)
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        """Подготовка фиксур"""
+        super(TestCompressionPerformance, cls).setUpTestData()
+        Note.objects.bulk_create((
+            Note(
+                title=f'Журнал {index}',
+                text=f'Запуск {index}\n{cls.LOG_TEXT}',
+                slug=f'log-{index}',
+                author=cls.author,
+            )
+            for index in range(cls.NOTES_COUNT)
+        ), batch_size=500)
+
+    def test_compressed_storage_size(self):
+        """Тест: тексты журналов занимают в базе меньше четверти
+        исходного размера.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT sum(length(CAST(text AS BLOB))) FROM notes_note '
+                "WHERE slug LIKE 'log-%%'"
+            )
+            stored = cursor.fetchone()[0]
+        original = sum(
+            len(f'Запуск {index}\n{self.LOG_TEXT}'.encode())
+            for index in range(self.NOTES_COUNT)
+        )
+        self.assertLess(stored * 4, original)
+
+    def test_compressed_read_speed(self):
+        """Тест: страница длинной заметки и выгрузка 2 000 сжатых
+        заметок не медленнее базового замера.
+        """
+        detail_url = reverse('notes:detail', args=('log-0',))
+
+        def get_detail():
+            bump_versions([self.author.pk])
+            response = self.author_client.get(detail_url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        def export():
+            response = self.author_client.get(self.NOTES_EXPORT_URL)
+            self.assertTrue(b''.join(response.streaming_content))
+
+        for name, func in (
+            ('NoteDetailCompressed', get_detail),
+            ('NotesExportCompressed2k', export),
+        ):
+            with self.subTest(name=name):
+                self.benchmark(name, func)
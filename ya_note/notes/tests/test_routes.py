@@ -1,8 +1,16 @@
+import json
+import os
+import pstats
 from http import HTTPStatus
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
 from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
 
 from .test_base import TestBase
+from yanote.middleware import MemoryBudgetExceeded, QueryBudgetExceeded
 
 User = get_user_model()
 
@@ -31,6 +39,10 @@ class TestRoutes(TestBase):
             (self.NOTES_LIST_URL, self.author_client, HTTPStatus.OK),
             (self.NOTES_ADD_URL, self.author_client, HTTPStatus.OK),
             (self.NOTES_SUCCESS_URL, self.author_client, HTTPStatus.OK),
+            (self.NOTES_SEARCH_URL, self.author_client, HTTPStatus.OK),
+            (self.NOTES_EXPORT_URL, self.author_client, HTTPStatus.OK),
+            (self.NOTES_IMPORT_URL, self.author_client, HTTPStatus.OK),
+            (self.NOTES_SYNC_URL, self.author_client, HTTPStatus.OK),
             (self.NOTES_DETAIL_URL, self.author_client, HTTPStatus.OK),
             (self.NOTES_EDIT_URL, self.author_client, HTTPStatus.OK),
             (self.NOTES_DELETE_URL, self.author_client, HTTPStatus.OK),
@@ -60,10 +72,107 @@ class TestRoutes(TestBase):
             self.NOTES_DELETE_URL,
             self.NOTES_ADD_URL,
             self.NOTES_LIST_URL,
-            self.NOTES_SUCCESS_URL
+            self.NOTES_SUCCESS_URL,
+            self.NOTES_SEARCH_URL,
+            self.NOTES_EXPORT_URL,
+            self.NOTES_IMPORT_URL,
+            self.NOTES_SYNC_URL,
         )
         for url in urls:
             with self.subTest(url=url):
                 redirect_url = f'{self.USERS_LOGIN_URL}?next={url}'
                 response = self.client.get(url)
                 self.assertRedirects(response, redirect_url)
+
+    @override_settings(QUERY_BUDGETS={'notes:list': 1})
+    def test_query_budget_exceeded(self):
+        """Тест: Превышение бюджета SQL-запросов страницы
+        приводит к ошибке в тестах.
+        """
+        with self.assertRaises(QueryBudgetExceeded):
+            self.author_client.get(self.NOTES_LIST_URL)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+    def test_server_timing_header(self):
+        """Тест: Ответ содержит разбивку времени по БД, представлению
+        и шаблону; при нулевой доле замеров заголовка нет.
+        """
+        response = self.author_client.get(self.NOTES_LIST_URL)
+        for metric in ('db;dur=', 'view;dur=', 'tpl;dur=', 'total;dur='):
+            self.assertIn(metric, response['Server-Timing'])
+        with override_settings(SERVER_TIMING_SAMPLE_RATE=0):
+            response = self.author_client.get(self.NOTES_LIST_URL)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_profiler_dumps_view_profiles(self):
+        """Тест: Профили запросов сохраняются по имени представления."""
+        with TemporaryDirectory() as directory, override_settings(
+                PROFILER_SAMPLE_RATE=1,
+                PROFILER_DIR=directory,
+                PROFILER_DUMP_INTERVAL=0,
+        ):
+            self.author_client.get(self.NOTES_LIST_URL)
+            base = Path(directory) / f'notes.list.{os.getpid()}'
+            stats = pstats.Stats(f'{base}.prof')
+            self.assertTrue(stats.total_calls)
+            collapsed = Path(f'{base}.collapsed').read_text()
+            self.assertIn('views.py', collapsed)
+
+    def test_memory_report_and_budget(self):
+        """Тест: Пик памяти запроса пишется в отчёт и сверяется с бюджетом."""
+        with TemporaryDirectory() as directory, override_settings(
+                MEMORY_SAMPLE_RATE=1,
+                MEMORY_REPORT_DIR=directory,
+                MEMORY_DUMP_INTERVAL=0,
+        ):
+            self.author_client.get(self.NOTES_LIST_URL)
+            report = json.loads(
+                (Path(directory) / f'memory.{os.getpid()}.json').read_text()
+            )
+            self.assertGreater(report['notes:list']['peak_max_bytes'], 0)
+            with override_settings(
+                    MEMORY_BUDGETS={'notes:list': 1},
+                    MEMORY_BUDGET_RAISE=True,
+            ):
+                with self.assertRaises(MemoryBudgetExceeded):
+                    self.author_client.get(self.NOTES_LIST_URL)
+
+    def test_metrics_endpoint(self):
+        """Тест: /metrics считает записи заметок, коллизии slug
+        и обращения к кешу страниц и пропускает посторонние файлы.
+        """
+        with TemporaryDirectory() as directory, override_settings(
+                METRICS_DIR=directory,
+        ):
+            before = self.metric_values()
+            self.author_client.post(self.NOTES_ADD_URL, data={
+                'title': self.NEW_NOTE_TITLE, 'text': self.NEW_NOTE_TEXT,
+            })
+            self.author_client.post(self.NOTES_ADD_URL, data={
+                'title': self.NEW_NOTE_TITLE, 'text': self.NEW_NOTE_TEXT,
+                'slug': self.note.slug,
+            })
+            for _ in range(2):
+                self.author_client.get(self.NOTES_LIST_URL)
+            (Path(directory) / 'metrics.backup.json').write_text('{}')
+            after = self.metric_values()
+        for key, expected in (
+            ('notes_written_total{action="created"}', 1),
+            ('cache_requests_total{cache="notes_pages",result="miss"}', 1),
+            ('cache_requests_total{cache="notes_pages",result="hit"}', 1),
+            ('form_validation_failures_total'
+             '{form="NoteForm",reason="slug_collision"}', 1),
+            ('http_request_queries_count{view="notes:add"}', 2),
+        ):
+            with self.subTest(key=key):
+                self.assertEqual(
+                    float(after[key]) - float(before.get(key, 0)), expected
+                )
+
+    def metric_values(self):
+        response = self.client.get(reverse('metrics'))
+        return dict(
+            line.rsplit(' ', 1)
+            for line in response.content.decode().splitlines()
+            if not line.startswith('#')
+        )
@@ -0,0 +1,217 @@
+"""
+Выгрузка заметок пользователя и загрузка их из файла.
+
+Выгрузка идёт потоком: заметки читаются из базы порциями через
+iterator() и сразу уходят клиенту строками JSON Lines или CSV
+с колонками title, text, slug. Загрузка читает файл тех же форматов
+по одной записи и пишет заметки порциями через bulk_create. Slug для
+всей порции подбираются несколькими запросами по уникальному индексу
+(см. slugs.allocate_slugs), а не запросом на каждую заметку. Память
+в обе стороны не зависит от числа заметок.
+"""
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
+from django.db import IntegrityError, transaction
+
+from .cache import bump_versions
+from .models import SLUG_ATTEMPTS, Note
+from .search import index_notes
+from .slugs import allocate_slugs, slug_base
+from .sync import reserve_changes
+
+JSON_LINES = 'jsonl'
+CSV = 'csv'
+FORMATS = (JSON_LINES, CSV)
+EXTENSIONS = {
+    '.jsonl': JSON_LINES,
+    '.ndjson': JSON_LINES,
+    '.csv': CSV,
+}
+CONTENT_TYPES = {
+    JSON_LINES: 'application/x-ndjson; charset=utf-8',
+    CSV: 'text/csv; charset=utf-8',
+}
+FIELDS = ('title', 'text', 'slug')
+# Заметок на один запрос к базе и на один кусок ответа при выгрузке.
+CHUNK_SIZE = 2000
+# Длина текста заметки не ограничена, а модуль csv по умолчанию
+# не читает поля длиннее 128 КБ; больше 2**31 - 1 он не принимает.
+CSV_FIELD_SIZE_LIMIT = 2 ** 31 - 1
+TITLE_MAX_LENGTH = Note._meta.get_field('title').max_length
+SLUG_MAX_LENGTH = Note._meta.get_field('slug').max_length
+
+
+class TransferError(Exception):
+    """Файл с заметками невозможно прочитать."""
+
+
+class Echo:
+    """Буфер для csv.writer, который отдаёт записанное, не копя его."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(rows, export_format):
+    if export_format == CSV:
+        writer = csv.writer(Echo())
+        yield writer.writerow(FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    for row in rows:
+        yield json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n'
+
+
+def decompressed(rows):
+    """Строки выгрузки с распакованным текстом, см. fields.py."""
+    for title, text, slug in rows:
+        yield title, str(text), slug
+
+
+def export_notes(queryset, export_format, chunk_size=CHUNK_SIZE):
+    """Выгрузка заметок из queryset кусками по chunk_size строк."""
+    rows = queryset.order_by('id').values_list(*FIELDS).iterator(
+        chunk_size=chunk_size
+    )
+    lines = export_lines(decompressed(rows), export_format)
+    while chunk := list(islice(lines, chunk_size)):
+        yield ''.join(chunk)
+
+
+def read_json_lines(file):
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise TransferError(f'Строка {number}: {error}') from error
+
+
+def read_csv(file):
+    """
+    Записи CSV. Предел длины поля в модуле csv общий для процесса,
+    поэтому он поднимается перед чтением: иначе не загрузить обратно
+    длинную заметку, которую отдала выгрузка.
+    """
+    csv.field_size_limit(CSV_FIELD_SIZE_LIMIT)
+    try:
+        yield from csv.DictReader(file)
+    except csv.Error as error:
+        raise TransferError(f'Некорректный CSV: {error}') from error
+
+
+READERS = {
+    JSON_LINES: read_json_lines,
+    CSV: read_csv,
+}
+
+
+def clean_record(record, author):
+    """Заметка из записи файла или None, если запись негодна."""
+    if not isinstance(record, dict):
+        return None
+    title = record.get('title')
+    text = record.get('text')
+    slug = record.get('slug') or ''
+    if not all(isinstance(value, str) for value in (title, text, slug)):
+        return None
+    title = title.strip()
+    if not title or len(title) > TITLE_MAX_LENGTH or not text.strip():
+        return None
+    if slug:
+        try:
+            validate_slug(slug)
+        except ValidationError:
+            return None
+        if len(slug) > SLUG_MAX_LENGTH:
+            return None
+    return Note(title=title, text=text, slug=slug, author=author)
+
+
+def write_batch(notes, numbers):
+    """
+    Сохраняет порцию заметок и возвращает, сколько slug пришлось сменить.
+
+    Занятый slug из файла, как и пустой, заменяется свободным с
+    наименьшим номером. Если параллельный запрос занял выбранный slug
+    раньше, порция откатывается до точки сохранения и slug подбираются
+    заново по свежим номерам из базы. bulk_create обходит сигналы
+    модели, поэтому заметки индексируются для поиска здесь же; их id
+    читаются по slug.
+    """
+    requested = [note.slug for note in notes]
+    wanted = [
+        slug or slug_base(note.title, SLUG_MAX_LENGTH)
+        for note, slug in zip(notes, requested)
+    ]
+    for attempt in range(SLUG_ATTEMPTS):
+        slugs = allocate_slugs(Note.objects.all(), wanted, numbers)
+        for note, slug in zip(notes, slugs):
+            note.slug = slug
+        try:
+            with transaction.atomic():
+                first = reserve_changes(len(notes))
+                for offset, note in enumerate(notes):
+                    note.change_seq = first + offset
+                Note.objects.bulk_create(notes)
+                ids = dict(
+                    Note.objects.filter(slug__in=slugs)
+                    .values_list('slug', 'id')
+                )
+                index_notes(
+                    (ids[note.slug], note.title, note.text, note.author_id)
+                    for note in notes
+                )
+        except IntegrityError:
+            if attempt == SLUG_ATTEMPTS - 1:
+                raise
+            numbers.clear()
+            continue
+        return sum(
+            bool(slug) and note.slug != slug
+            for note, slug in zip(notes, requested)
+        )
+
+
+def iter_batches(records, author, batch_size, stats):
+    """Порции годных заметок; негодные записи только считаются."""
+    batch = []
+    for record in records:
+        stats['read'] += 1
+        note = clean_record(record, author)
+        if note is None:
+            stats['invalid'] += 1
+            continue
+        batch.append(note)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_notes(records, author, batch_size=1000):
+    """
+    Загружает записи заметками автора и возвращает Counter со статистикой.
+
+    Весь файл загружается одной транзакцией, а каждая порция
+    по batch_size записей — в своей точке сохранения. Если файл
+    оборвался ошибкой на середине, не сохраняется ничего, и его можно
+    загрузить снова, не получив дубликатов. bulk_create не отправляет
+    сигналов, поэтому кеш страниц автора сбрасывается здесь же.
+    """
+    stats = Counter()
+    numbers = {}
+    with transaction.atomic():
+        for batch in iter_batches(records, author, batch_size, stats):
+            stats['renamed'] += write_batch(batch, numbers)
+            stats['created'] += len(batch)
+        bump_versions([author.pk])
+    return stats
@@ -1,9 +1,23 @@
+import io
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import IntegrityError
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
 
-from .forms import NoteForm
+from .cache import cached_page
+from .forms import ImportForm, NoteForm
 from .models import Note
+from .pagination import KeysetPaginator
+from .search import SearchResults
+from .sync import parse_since, read_changes
+from .transfer import (
+    CONTENT_TYPES, FORMATS, JSON_LINES, READERS, TransferError, export_notes,
+    import_notes,
+)
 
 
 class Home(generic.TemplateView):
@@ -26,22 +40,37 @@ class NoteBase(LoginRequiredMixin):
         return self.model.objects.filter(author=self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+class NoteFormMixin:
+    """Общее для создания и редактирования заметки."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        """
+        Явный slug мог занять параллельный запрос уже после проверки
+        формы: тогда показываем ту же ошибку, что и при проверке.
+        """
+        try:
+            return super().form_valid(form)
+        except IntegrityError:
+            slug = form.cleaned_data.get('slug')
+            if not slug:
+                raise
+            form.add_error('slug', form.slug_taken(slug))
+            return self.form_invalid(form)
+
+
+class NoteCreate(NoteBase, NoteFormMixin, generic.CreateView):
+    """Добавление заметки."""
+
+    def form_valid(self, form):
+        """Автор задаётся до сохранения, чтобы заметка писалась один раз."""
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
+class NoteUpdate(NoteBase, NoteFormMixin, generic.UpdateView):
     """Редактирование заметки."""
-    template_name = 'notes/form.html'
-    form_class = NoteForm
 
 
 class NoteDelete(NoteBase, generic.DeleteView):
@@ -49,11 +78,109 @@ class NoteDelete(NoteBase, generic.DeleteView):
     template_name = 'notes/delete.html'
 
 
+@method_decorator(cached_page, name='get')
 class NotesList(NoteBase, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
 
-
+    def get_queryset(self):
+        """
+        Страница заметок пользователя по курсору из параметра cursor.
+
+        Заметки идут по id и ищутся по индексу (author, id), поэтому
+        любая страница стоит одинаково при любом числе заметок. Текст
+        заметки в списке не выводится и не загружается.
+        """
+        paginator = KeysetPaginator(
+            super().get_queryset().only('id', 'slug', 'title'),
+            ('id',),
+            settings.NOTES_COUNT_ON_PAGE,
+        )
+        self.page = paginator.page(self.request.GET.get('cursor'))
+        return self.page.object_list
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page'] = self.page
+        return context
+
+
+class NoteSearch(NoteBase, generic.TemplateView):
+    """Поиск по заголовкам и текстам заметок пользователя."""
+    template_name = 'notes/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        context['query'] = query
+        context['results'] = SearchResults(
+            self.get_queryset(),
+            self.request.user.pk,
+            query,
+            settings.NOTES_SEARCH_RESULTS_ON_PAGE,
+            self.request.GET.get('cursor'),
+        )
+        return context
+
+
+@method_decorator(cached_page, name='get')
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+
+class NoteExport(NoteBase, generic.View):
+    """Выгрузка всех заметок пользователя в JSON Lines или CSV."""
+
+    def get(self, request):
+        """
+        Заметки отдаются потоком, по мере чтения из базы.
+
+        Их запросы выполняются уже после выхода из представления,
+        пока сервер отправляет ответ.
+        """
+        export_format = request.GET.get('format', JSON_LINES)
+        if export_format not in FORMATS:
+            raise Http404('Неизвестный формат выгрузки.')
+        response = StreamingHttpResponse(
+            export_notes(self.get_queryset(), export_format),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="notes.{export_format}"'
+        )
+        return response
+
+
+class NoteImport(NoteBase, generic.FormView):
+    """Загрузка заметок пользователя из файла."""
+    template_name = 'notes/import.html'
+    form_class = ImportForm
+
+    def form_valid(self, form):
+        """Файл читается по одной записи, не целиком."""
+        upload = form.cleaned_data['file']
+        file = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        try:
+            stats = import_notes(
+                READERS[form.file_format](file), self.request.user
+            )
+        except (TransferError, UnicodeDecodeError) as error:
+            form.add_error('file', str(error))
+            return self.form_invalid(form)
+        finally:
+            file.detach()
+        return self.render_to_response(
+            self.get_context_data(form=form, stats=stats)
+        )
+
+
+class NoteSync(NoteBase, generic.View):
+    """Изменения заметок пользователя после номера из параметра since."""
+
+    def get(self, request):
+        return JsonResponse(read_changes(
+            request.user.pk,
+            parse_since(request.GET.get('since')),
+            settings.NOTES_SYNC_PAGE_SIZE,
+        ))
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    """Метрики процесса, см. metrics.py."""
+    name = 'yanote'
+    verbose_name = 'Метрики'
+
+    def ready(self):
+        from .metrics import connect_signals
+
+        connect_signals()
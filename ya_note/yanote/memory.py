@@ -0,0 +1,110 @@
+"""
+Учёт памяти, выделенной при обработке запросов, через tracemalloc.
+
+Для каждого имени URL копятся число отслеженных запросов, наибольший
+и средний пик выделенной памяти и места выделения самого тяжёлого
+запроса. Отчёт пишется в settings.MEMORY_REPORT_DIR файлом
+memory.<pid>.json не чаще раза в settings.MEMORY_DUMP_INTERVAL секунд
+и ещё раз при выходе процесса.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+TOP_SITES = 10
+
+
+def top_sites(before, after, limit=TOP_SITES):
+    """Строки кода, где за запрос прибавилось больше всего памяти."""
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    stats = after.filter_traces(ignore).compare_to(
+        before.filter_traces(ignore), 'lineno'
+    )
+    return [
+        {
+            'site': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+            'size_bytes': stat.size_diff,
+            'count': stat.count_diff,
+        }
+        for stat in stats[:limit]
+        if stat.size_diff > 0
+    ]
+
+
+class MemoryStore:
+    """
+    Сводка пиков памяти процесса по имени URL с периодической выгрузкой.
+
+    Как и в profiling.ProfileStore, под блокировкой сводка только
+    пополняется и копируется, а файл пишется уже без неё.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dump_lock = threading.Lock()
+        self._views = {}
+        self._dumped = time.monotonic()
+        self._directory = None
+
+    def add(self, view_name, peak, sites, directory=None, interval=0):
+        with self._lock:
+            row = self._views.setdefault(view_name, {
+                'requests': 0, 'peak_total': 0, 'peak_max': 0, 'sites': [],
+            })
+            row['requests'] += 1
+            row['peak_total'] += peak
+            if peak >= row['peak_max']:
+                row['peak_max'] = peak
+                row['sites'] = sites
+            if not directory:
+                return
+            self._directory = directory
+            if time.monotonic() - self._dumped < interval:
+                return
+            self._dumped = time.monotonic()
+            report = self._report()
+        self.dump(directory, report)
+
+    def _report(self):
+        return {
+            view_name: {
+                'requests': row['requests'],
+                'peak_max_bytes': row['peak_max'],
+                'peak_mean_bytes': row['peak_total'] // row['requests'],
+                'top_sites': row['sites'],
+            }
+            for view_name, row in sorted(self._views.items())
+        }
+
+    def report(self):
+        with self._lock:
+            return self._report()
+
+    def flush(self):
+        """Выгружает сводку в последний каталог; для atexit."""
+        with self._lock:
+            directory = self._directory
+            report = self._report()
+        if directory is not None and report:
+            self.dump(directory, report)
+
+    def dump(self, directory, report):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'memory.{os.getpid()}.json'
+        temporary = path.with_name(
+            f'.{path.name}.{threading.get_ident()}.tmp'
+        )
+        with self._dump_lock:
+            temporary.write_text(
+                json.dumps(report, indent=2), encoding='utf-8'
+            )
+            os.replace(temporary, path)
+
+
+store = MemoryStore()
+atexit.register(store.flush)
@@ -0,0 +1,391 @@
+import cProfile
+import json
+import logging
+import random
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from . import memory, metrics, profiling
+
+logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger(f'{__name__}.timing')
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL-запросов, чем разрешено."""
+
+
+class MemoryBudgetExceeded(Exception):
+    """Представление выделило больше памяти, чем разрешено."""
+
+
+def enforce_query_budgets():
+    """
+    Включает проверку бюджетов запросов в тестах.
+
+    Работает как декоратор тестового класса или функции и как
+    контекстный менеджер: при превышении бюджета запрос к тестовому
+    клиенту завершается исключением QueryBudgetExceeded.
+    """
+    return override_settings(QUERY_BUDGET_RAISE=True)
+
+
+class QueryRecorder:
+    """Обёртка выполнения запросов, собирающая SQL и место вызова."""
+
+    def __init__(self, capture_origin):
+        self.capture_origin = capture_origin
+        self.count = 0
+        self.queries = defaultdict(list)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        origin = self._origin() if self.capture_origin else None
+        self.queries[sql].append(origin)
+        return execute(sql, params, many, context)
+
+    @staticmethod
+    def _origin():
+        """Ближайший к запросу кадр стека из кода проекта."""
+        base_dir = str(settings.BASE_DIR)
+        for frame in reversed(traceback.extract_stack()[:-2]):
+            if frame.filename.startswith(base_dir) and (
+                Path(frame.filename) != Path(__file__)
+            ):
+                return f'{frame.filename}:{frame.lineno} in {frame.name}'
+        return None
+
+    def report(self, view_name, budget):
+        lines = [
+            f'{view_name}: {self.count} SQL-запросов при бюджете {budget}'
+        ]
+        for sql, origins in sorted(
+                self.queries.items(), key=lambda item: -len(item[1])
+        ):
+            lines.append(f'  x{len(origins)} {sql}')
+            for origin in sorted({origin for origin in origins if origin}):
+                lines.append(f'      {origin}')
+        return '\n'.join(lines)
+
+
+class QueryBudgetMiddleware:
+    """
+    Следит за количеством SQL-запросов на каждый URL.
+
+    Бюджеты задаются в settings.QUERY_BUDGETS по имени URL
+    ('notes:detail': 3). При DEBUG превышения пишутся в лог вместе
+    со сгруппированным SQL и местом вызова, а при QUERY_BUDGET_RAISE
+    запрос завершается исключением.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        enforce = getattr(settings, 'QUERY_BUDGET_RAISE', False)
+        if not budgets or not (settings.DEBUG or enforce):
+            return self.get_response(request)
+        recorder = QueryRecorder(capture_origin=True)
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        match = request.resolver_match
+        budget = budgets.get(match.view_name) if match else None
+        if budget is not None and recorder.count > budget:
+            report = recorder.report(match.view_name, budget)
+            if enforce:
+                raise QueryBudgetExceeded(report)
+            logger.warning(report)
+        return response
+
+
+class RequestTimer:
+    """
+    Разбивка времени запроса на БД, представление, шаблон и остальное.
+
+    Время SQL собирает обёртка выполнения запросов и вычитает его из
+    того участка, где запрос был выполнен: ленивый QuerySet, вычисленный
+    в шаблоне, попадает в db, а не в tpl.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.view = 0.0
+        self.template = 0.0
+        self._mark = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def start(self):
+        self._mark = (time.perf_counter(), self.db)
+
+    def stop(self):
+        """Время без SQL с последнего start(); 0, если замер не шёл."""
+        if self._mark is None:
+            return 0.0
+        started, db = self._mark
+        self._mark = None
+        return time.perf_counter() - started - (self.db - db)
+
+    def header(self, total):
+        other = max(total - self.db - self.view - self.template, 0.0)
+        parts = [
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} SQL"',
+            f'view;dur={self.view * 1000:.2f}',
+            f'tpl;dur={self.template * 1000:.2f}',
+            f'mw;dur={other * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]
+        return ', '.join(parts)
+
+
+class ServerTimingMiddleware:
+    """
+    Заголовок Server-Timing и строка лога с разбивкой времени запроса.
+
+    Замеряется доля запросов из settings.SERVER_TIMING_SAMPLE_RATE;
+    остальные проходят без обёрток, так что при 0 накладных расходов
+    почти нет. Состояние хранится в самом запросе, поэтому middleware
+    работает одинаково под WSGI и ASGI. Представление считается
+    до начала рендеринга TemplateResponse, а для обычных ответов —
+    до возврата ответа в middleware. Лог пишется в JSON одной строкой:
+    {"view": "notes:list", "status": 200, "db_ms": ..., ...}.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 0)
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+        timer = request.server_timer = RequestTimer()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(timer)
+                )
+            response = self.get_response(request)
+        timer.view += timer.stop()
+        total = time.perf_counter() - timer.started
+        response['Server-Timing'] = timer.header(total)
+        match = request.resolver_match
+        timing_logger.info(json.dumps({
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': timer.queries,
+            'db_ms': round(timer.db * 1000, 2),
+            'view_ms': round(timer.view * 1000, 2),
+            'tpl_ms': round(timer.template * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = getattr(request, 'server_timer', None)
+        if timer is not None:
+            timer.start()
+
+    def process_template_response(self, request, response):
+        timer = getattr(request, 'server_timer', None)
+        if timer is not None:
+            timer.view += timer.stop()
+            timer.start()
+
+            def finish_render(rendered):
+                timer.template += timer.stop()
+
+            response.add_post_render_callback(finish_render)
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Профилирует cProfile часть запросов и копит профили по имени URL.
+
+    Профилируется доля запросов settings.PROFILER_SAMPLE_RATE, а также
+    запросы с заголовком settings.PROFILER_HEADER, если его значение
+    совпадает с PROFILER_TOKEN (без токена заголовок принимается
+    только при DEBUG). Профили выгружаются в PROFILER_DIR не чаще раза
+    в PROFILER_DUMP_INTERVAL секунд, см. profiling.ProfileStore.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.wanted(request):
+            return self.get_response(request)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+        match = request.resolver_match
+        profiling.store.add(
+            match.view_name if match else 'unresolved',
+            profile,
+            settings.PROFILER_DIR,
+            getattr(settings, 'PROFILER_DUMP_INTERVAL', 60),
+        )
+        return response
+
+    @staticmethod
+    def wanted(request):
+        header = getattr(settings, 'PROFILER_HEADER', None)
+        value = request.headers.get(header) if header else None
+        if value is not None:
+            token = getattr(settings, 'PROFILER_TOKEN', None)
+            if (token and value == token) or (not token and settings.DEBUG):
+                return True
+        rate = getattr(settings, 'PROFILER_SAMPLE_RATE', 0)
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+class MemoryMiddleware:
+    """
+    Пик памяти и места выделения для доли запросов через tracemalloc.
+
+    Отслеживается доля запросов settings.MEMORY_SAMPLE_RATE (по умолчанию
+    ни одного). tracemalloc общий для процесса: reset_peak, пик и
+    stop действуют на все потоки. Поэтому одновременно отслеживается
+    только один запрос (остальные в это время идут без учёта),
+    а трассировку выключает только тот запрос, который её включил.
+    Пик при этом включает выделения всех потоков процесса: точные
+    цифры дают только однопоточные воркеры (gunicorn с sync-воркерами,
+    uwsgi без --threads). Под многопоточным сервером пик — оценка
+    сверху, и бюджеты памяти там лучше не включать в режим исключений.
+    Сводка по имени URL пишется в
+    MEMORY_REPORT_DIR не чаще раза в MEMORY_DUMP_INTERVAL секунд
+    (см. memory.MemoryStore). Пик сверяется
+    с settings.MEMORY_BUDGETS в байтах ('notes:list': 8 * 1024 * 1024):
+    превышение пишется в лог, а при MEMORY_BUDGET_RAISE вызывает
+    исключение.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'MEMORY_SAMPLE_RATE', 0)
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+        # Запрос, пришедший во время чужого замера, не отслеживается:
+        # reset_peak сбросил бы пик отслеживаемого запроса.
+        if not self._lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            response, peak, sites = self.trace(request)
+        finally:
+            self._lock.release()
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        try:
+            memory.store.add(
+                view_name,
+                peak,
+                sites,
+                getattr(settings, 'MEMORY_REPORT_DIR', None),
+                getattr(settings, 'MEMORY_DUMP_INTERVAL', 60),
+            )
+        except OSError:
+            # Отчёт вспомогательный: ошибка записи не должна ронять запрос.
+            logger.exception('Не удалось записать отчёт о памяти.')
+        self.check_budget(view_name, peak, sites)
+        return response
+
+    def trace(self, request):
+        # Трассировку, включённую до запроса (PYTHONTRACEMALLOC),
+        # запрос не выключает.
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(getattr(settings, 'MEMORY_TRACE_FRAMES', 1))
+        try:
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            response = self.get_response(request)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            sites = memory.top_sites(before, tracemalloc.take_snapshot())
+        finally:
+            if started:
+                tracemalloc.stop()
+        return response, peak, sites
+
+    @staticmethod
+    def check_budget(view_name, peak, sites):
+        budget = getattr(settings, 'MEMORY_BUDGETS', {}).get(view_name)
+        if budget is None or peak <= budget:
+            return
+        lines = [f'{view_name}: пик {peak} байт при бюджете {budget}']
+        lines += [
+            f'  {site["size_bytes"]} байт в {site["site"]}'
+            for site in sites
+        ]
+        if getattr(settings, 'MEMORY_BUDGET_RAISE', False):
+            raise MemoryBudgetExceeded('\n'.join(lines))
+        logger.warning('\n'.join(lines))
+
+
+class QueryCounter:
+    """Обёртка выполнения запросов, которая только считает их."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Время ответа и число SQL-запросов по имени URL для /metrics.
+
+    Стоит первым в MIDDLEWARE, чтобы время включало все остальные
+    middleware. Гистограммы копятся в metrics.store.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(counter)
+                )
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        labels = {'view': match.view_name if match else 'unresolved'}
+        metrics.store.observe('http_request_queries', labels, counter.count)
+        metrics.store.observe(
+            'http_request_duration_seconds',
+            {**labels, 'status': str(response.status_code)},
+            duration,
+        )
+        return response
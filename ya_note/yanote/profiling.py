@@ -0,0 +1,168 @@
+"""
+Накопление профилей cProfile по представлениям и их выгрузка.
+
+Профили запросов одного представления складываются в общий
+pstats.Stats процесса и периодически пишутся в каталог
+settings.PROFILER_DIR двумя файлами на представление:
+<view>.<pid>.prof — для pstats и snakeviz;
+<view>.<pid>.collapsed — свёрнутые стеки для flamegraph.pl и speedscope.
+При выходе процесса профили выгружаются ещё раз.
+"""
+import atexit
+import os
+import pstats
+import threading
+import time
+from pathlib import Path
+
+MAX_DEPTH = 100
+# Ветви, на которые приходится меньшая доля времени, не выводятся.
+MIN_SHARE = 1e-4
+
+
+def frame_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name.replace(';', ':')
+    return f'{Path(filename).name}:{line}({name})'.replace(';', ':')
+
+
+def find_roots(stats):
+    """
+    Функции, с которых начинаются стеки.
+
+    Это функции, вызванные из кадров, начавшихся ещё до включения
+    профилировщика: их вызывающих в статистике нет. Цепочка middleware
+    рекурсивна (inner -> __call__ -> inner), и у первой её функции
+    вызывающий есть, поэтому корнем считается и функция с наибольшим
+    общим временем.
+    """
+    roots = [
+        func for func, row in stats.stats.items()
+        if not any(caller in stats.stats for caller in row[4])
+    ]
+    if stats.stats:
+        top = max(stats.stats, key=lambda func: stats.stats[func][3])
+        if top not in roots:
+            roots.append(top)
+    return roots
+
+
+def collapsed_stacks(stats):
+    """
+    Свёрнутые стеки «a;b;c микросекунды» из статистики cProfile.
+
+    cProfile хранит не стеки, а пары «вызывающий — вызываемый»,
+    поэтому стеки восстанавливаются обходом графа вызовов от корней:
+    собственное время функции делится между путями к ней пропорционально
+    времени, проведённому в ней по каждому ребру.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = find_roots(stats)
+    total = sum(stats.stats[func][3] for func in roots) or 1
+    lines = {}
+    stack = [((func,), 1.0) for func in roots]
+    while stack:
+        path, share = stack.pop()
+        _, _, own, cumulative, _ = stats.stats[path[-1]]
+        if own * share >= 1e-6:
+            key = ';'.join(frame_name(frame) for frame in path)
+            lines[key] = lines.get(key, 0) + own * share * 1_000_000
+        if len(path) >= MAX_DEPTH or not cumulative:
+            continue
+        for child, edge_time in callees.get(path[-1], ()):
+            child_cumulative = stats.stats[child][3]
+            if child in path or not child_cumulative:
+                continue
+            child_share = share * edge_time / child_cumulative
+            if child_share * child_cumulative / total >= MIN_SHARE:
+                stack.append((path + (child,), child_share))
+    return [f'{key} {round(value)}' for key, value in sorted(lines.items())]
+
+
+def write_atomic(path, write):
+    temporary = path.with_name(f'.{path.name}.tmp')
+    write(temporary)
+    os.replace(temporary, path)
+
+
+def copy_stats(stats):
+    """
+    Снимок статистики для выгрузки.
+
+    pstats.Stats.add заменяет записи словаря stats новыми кортежами,
+    а не меняет их, поэтому снимку хватает поверхностной копии.
+    """
+    snapshot = pstats.Stats()
+    snapshot.stats = dict(stats.stats)
+    return snapshot
+
+
+class ProfileStore:
+    """
+    Профили процесса по имени представления с периодической выгрузкой.
+
+    Под блокировкой профиль только складывается с накопленным, а для
+    выгрузки снимаются копии; файлы пишутся уже без неё, чтобы запросы
+    не ждали записи на диск. При выходе процесса накопленное
+    выгружается ещё раз, см. flush.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dump_lock = threading.Lock()
+        self._stats = {}
+        self._dumped = time.monotonic()
+        self._directory = None
+
+    def add(self, view_name, profile, directory, interval):
+        with self._lock:
+            stats = self._stats.get(view_name)
+            if stats is None:
+                self._stats[view_name] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self._directory = directory
+            if time.monotonic() - self._dumped < interval:
+                return
+            self._dumped = time.monotonic()
+            snapshot = self.snapshot()
+        self.dump(directory, snapshot)
+
+    def snapshot(self):
+        return {
+            view_name: copy_stats(stats)
+            for view_name, stats in self._stats.items()
+        }
+
+    def flush(self):
+        """Выгружает накопленное в последний каталог; для atexit."""
+        with self._lock:
+            directory = self._directory
+            snapshot = self.snapshot()
+        if directory is not None and snapshot:
+            self.dump(directory, snapshot)
+
+    def dump(self, directory, snapshot):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        # Две выгрузки подряд пишут одни и те же временные файлы.
+        with self._dump_lock:
+            for view_name, stats in snapshot.items():
+                base = view_name.replace(':', '.')
+                write_atomic(
+                    directory / f'{base}.{pid}.prof', stats.dump_stats
+                )
+                lines = collapsed_stacks(stats)
+                write_atomic(
+                    directory / f'{base}.{pid}.collapsed',
+                    lambda path: path.write_text('\n'.join(lines) + '\n'),
+                )
+
+
+store = ProfileStore()
+atexit.register(store.flush)
@@ -18,10 +18,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'notes.apps.NotesConfig'
+    'notes.apps.NotesConfig',
+    'yanote.apps.MetricsConfig',
 ]
 
 MIDDLEWARE = [
+    'yanote.middleware.MetricsMiddleware',
+    'yanote.middleware.QueryBudgetMiddleware',
+    'yanote.middleware.ServerTimingMiddleware',
+    'yanote.middleware.ProfilerMiddleware',
+    'yanote.middleware.MemoryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,3 +93,94 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_COUNT_ON_PAGE = 100
+
+NOTES_SEARCH_RESULTS_ON_PAGE = 20
+
+# Сколько изменений отдаётся за один запрос синхронизации.
+NOTES_SYNC_PAGE_SIZE = 500
+
+# Сколько секунд хранить отрендеренные список и страницу заметки.
+# Версии авторов, которые сбрасывают эти страницы, лежат в кеше
+# по умолчанию: при нескольких процессах он должен быть общим
+# для всех, иначе сброс увидит только процесс, записавший заметку.
+NOTES_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Допустимое количество SQL-запросов на один запрос к странице, с учётом
+# загрузки сессии и пользователя. При DEBUG превышения пишутся в лог,
+# а при QUERY_BUDGET_RAISE = True (включается в тестах) вызывают ошибку.
+# Выгрузка читает заметки уже после выхода из представления, а число
+# запросов загрузки растёт с размером файла, поэтому у notes:import
+# бюджета нет.
+QUERY_BUDGETS = {
+    'notes:home': 2,
+    'notes:list': 5,
+    'notes:detail': 3,
+    'notes:add': 8,
+    'notes:edit': 9,
+    'notes:delete': 7,
+    'notes:success': 2,
+    'notes:search': 4,
+    'notes:export': 2,
+    'notes:sync': 3,
+}
+QUERY_BUDGET_RAISE = False
+
+# Доля запросов, для которых в ответ добавляется заголовок Server-Timing
+# с разбивкой времени на БД, представление и шаблон, а в лог
+# yanote.middleware.timing пишется та же разбивка одной строкой JSON.
+# 0 выключает замеры. Каждый замер — строка лога уровня INFO, поэтому
+# по умолчанию замеряется 1 % запросов; 1.0 удобно при отладке.
+SERVER_TIMING_SAMPLE_RATE = 0.01
+
+# Профилирование cProfile: доля запросов и заголовок, по которому
+# профилируется отдельный запрос. Значение заголовка должно совпасть
+# с PROFILER_TOKEN; без токена заголовок принимается только при DEBUG.
+# Профили по имени URL выгружаются в PROFILER_DIR не чаще раза
+# в PROFILER_DUMP_INTERVAL секунд.
+PROFILER_SAMPLE_RATE = 0
+PROFILER_HEADER = 'X-Profile'
+PROFILER_TOKEN = None
+PROFILER_DIR = BASE_DIR / 'profiles'
+PROFILER_DUMP_INTERVAL = 60
+
+# Учёт памяти через tracemalloc: доля отслеживаемых запросов (0 — выкл.),
+# глубина сохраняемых стеков и каталог для отчёта memory.<pid>.json
+# с пиком памяти и местами выделения по имени URL. Отчёт пишется
+# не чаще раза в MEMORY_DUMP_INTERVAL секунд. Пик сверяется
+# с MEMORY_BUDGETS в байтах; при MEMORY_BUDGET_RAISE превышение
+# вызывает исключение, иначе пишется в лог. Пик точен только
+# в однопоточных воркерах: tracemalloc считает выделения всех потоков.
+MEMORY_SAMPLE_RATE = 0
+MEMORY_TRACE_FRAMES = 1
+MEMORY_REPORT_DIR = BASE_DIR / 'profiles'
+MEMORY_DUMP_INTERVAL = 60
+MEMORY_BUDGETS = {
+    'notes:list': 8 * 1024 * 1024,
+    'notes:detail': 4 * 1024 * 1024,
+}
+MEMORY_BUDGET_RAISE = False
+
+# Метрики Prometheus на странице /metrics. Каждый процесс не чаще раза
+# в METRICS_FLUSH_INTERVAL секунд пишет свои метрики в METRICS_DIR,
+# а страница складывает метрики всех живых процессов. Если задан
+# METRICS_TOKEN, страница требует Authorization: Bearer <токен>.
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yanote.middleware.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}